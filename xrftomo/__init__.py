@@ -44,44 +44,133 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-from xrftomo.file_io.reader import *
-from xrftomo.file_io.writer import *
-
-from xrftomo.reco import *
-from xrftomo.elements import *
-from xrftomo.widgets.custom_view_box import *
-from xrftomo.widgets.difference_view import *
-from xrftomo.widgets.scatter_view import *
-from xrftomo.widgets.mini_recon_view import *
-
-from xrftomo.models.element_table import *
-from xrftomo.models.file_table import *
-from xrftomo.widgets.file_loader import *
-
-from xrftomo.widgets.image_process import *
-from xrftomo.widgets.image_process_controls import *
-from xrftomo.widgets.image_view import *
-from xrftomo.widgets.image_process_actions import *
-
-from xrftomo.widgets.reconstruction import *
-from xrftomo.widgets.reconstruction_controls import *
-from xrftomo.widgets.reconstruction_view import *
-from xrftomo.widgets.reconstruction_actions import *
-
-from xrftomo.widgets.sinogram import *
-from xrftomo.widgets.sinogram_controls import *
-from xrftomo.widgets.sinogram_view import *
-from xrftomo.widgets.sinogram_actions import *
-
-from xrftomo.widgets.lami import *
-from xrftomo.widgets.lami_controls import *
-from xrftomo.widgets.lami_view import *
-from xrftomo.widgets.lami_actions import *
-
-from xrftomo.menu_installer import *
+import importlib
+import importlib.util
+import sys
+
+# Submodules are star-exported into the package namespace on first attribute
+# access rather than at import, so importing a submodule (a process pool worker,
+# xrftomo rec on a compute node) does not pull in Qt, pyqtgraph or tomopy.
+# The compute modules do not need Qt.
+_COMPUTE_MODULES = ('xrftomo.file_io.storage',
+                    'xrftomo.file_io.metadata',
+                    'xrftomo.prep.shift',
+                    'xrftomo.prep.register',
+                    'xrftomo.prep.reproject',
+                    'xrftomo.prep.sinusoid',
+                    'xrftomo.prep.centroid',
+                    'xrftomo.prep.hotspot',
+                    'xrftomo.file_io.reader',
+                    'xrftomo.file_io.writer',
+                    'xrftomo.reco',
+                    'xrftomo.oplog',
+                    'xrftomo.batch',
+                    'xrftomo.elements')
+
+# The gui modules need PyQt5 and pyqtgraph, they are only loaded when a name
+# the compute modules do not define is looked up.
+_WIDGET_MODULES = ('xrftomo.widgets.custom_view_box',
+                   'xrftomo.widgets.difference_view',
+                   'xrftomo.widgets.scatter_view',
+                   'xrftomo.widgets.mini_recon_view',
+                   'xrftomo.models.element_table',
+                   'xrftomo.models.file_table',
+                   'xrftomo.widgets.file_loader',
+                   'xrftomo.widgets.save_options',
+                   'xrftomo.widgets.image_process',
+                   'xrftomo.widgets.image_process_controls',
+                   'xrftomo.widgets.image_view',
+                   'xrftomo.widgets.image_process_actions',
+                   'xrftomo.widgets.reconstruction',
+                   'xrftomo.widgets.reconstruction_controls',
+                   'xrftomo.widgets.reconstruction_view',
+                   'xrftomo.widgets.reconstruction_actions',
+                   'xrftomo.widgets.sinogram',
+                   'xrftomo.widgets.sinogram_controls',
+                   'xrftomo.widgets.sinogram_view',
+                   'xrftomo.widgets.sinogram_actions',
+                   'xrftomo.widgets.lami',
+                   'xrftomo.widgets.lami_controls',
+                   'xrftomo.widgets.lami_view',
+                   'xrftomo.widgets.lami_actions',
+                   'xrftomo.menu_installer')
+
+_started = []
+_done = []
+
+
+def _public_names(module):
+    names = getattr(module, '__all__', None)
+    if names is None:
+        names = [name for name in vars(module) if not name.startswith('_')]
+    return [name for name in names if hasattr(module, name)]
+
+
+def _is_submodule(name):
+    if not name.isidentifier():
+        return False
+    return (__name__ + '.' + name) in sys.modules or importlib.util.find_spec(__name__ + '.' + name) is not None
+
+
+def _export(modules):
+    """
+    Same as 'from <module> import *' for each module, in order, except that a
+    name never hides a submodule of the package (xrftomo.batch is the module)
+    """
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        for key in _public_names(module):
+            if not _is_submodule(key):
+                globals()[key] = getattr(module, key)
+
+
+def _load(modules):
+    """
+    Exports modules once, returns False while they are still being imported
+    """
+    if modules not in _started:
+        _started.append(modules)
+        try:
+            _export(modules)
+        except ImportError:
+            _started.remove(modules)
+            raise
+        _done.append(modules)
+    return modules in _done
+
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError("module 'xrftomo' has no attribute '{}'".format(name))
+    # 'from xrftomo import config' must not load the rest of the package
+    if _is_submodule(name):
+        return importlib.import_module(__name__ + '.' + name)
+    loaded = _load(_COMPUTE_MODULES)
+    if name not in globals() and loaded:
+        try:
+            _load(_WIDGET_MODULES)
+        except ImportError as error:
+            raise AttributeError("module 'xrftomo' has no attribute '{}', "
+                                 "the gui modules cannot be imported: {}".format(name, error))
+    if name in globals():
+        return globals()[name]
+    # looked up while a module is importing, after its names were exported
+    for module_name in reversed(_COMPUTE_MODULES + _WIDGET_MODULES):
+        module = sys.modules.get(module_name)
+        if module is not None and name in _public_names(module):
+            globals()[name] = getattr(module, name)
+            return globals()[name]
+    raise AttributeError("module 'xrftomo' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    _load(_COMPUTE_MODULES)
+    return sorted(globals())
+
 
 try:
-    import pkg_resources
-    __version__ = pkg_resources.working_set.require("xrftomo")[0].version
-except:
+    from importlib.metadata import version
+    __version__ = version("xrftomo")
+    del version
+except Exception:
     pass
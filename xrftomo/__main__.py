@@ -62,6 +62,14 @@ def rec(args):
     from xrftomo import reco
     reco.tomo(args)
 
+def replay(args):
+    from xrftomo import reco
+    reco.replay(args)
+
+def batch(args):
+    from xrftomo import batch
+    batch.batch(args)
+
 def gui(args):
     try:
         from xrftomo import gui
@@ -81,10 +89,13 @@ def main():
     parser.add_argument('--config', **config.SECTIONS['general']['config'])
     tomo_params = config.TOMO_PARAMS 
     gui_params = tomo_params + ('gui', )
+    batch_params = tomo_params + ('batch', )
 
     cmd_parsers = [
         ('init',        init,           (),                             "Create configuration file"),
         ('rec',         rec,            tomo_params,                    "Run tomographic reconstruction using the parameters selected with the GUI"),
+        ('replay',      replay,         tomo_params,                    "Apply an operation log saved from the GUI to another dataset"),
+        ('batch',       batch,          batch_params,                   "Run rec, or replay when operation-log is set, on a list of datasets in parallel"),
         ('gui',         gui,            gui_params,                     "GUI for xrftomo tomographic reconstruction"),
         ('menu',        instMenu,       (),                             "installs desktop shortcut for XRFtomo software")
     ]
@@ -98,16 +109,7 @@ def main():
         cmd_parser.set_defaults(_func=func)
 
     args = config.parse_known_args(parser, subparser=True)
-    log_level = logging.DEBUG if args.verbose else logging.INFO
-    LOG.setLevel(log_level)
-
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
-    LOG.addHandler(stream_handler)
-    if args.log:
-        file_handler = logging.FileHandler(args.log)
-        file_handler.setFormatter(logging.Formatter('%(name)s:%(levelname)s: %(message)s'))
-        LOG.addHandler(file_handler)
+    config.setup_logging(args)
 
     try:
         config.log_values(args)
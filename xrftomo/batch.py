@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+###########################################################################
+
+"""
+Batch runner behind xrftomo batch: runs the xrftomo rec (or xrftomo replay)
+pipeline on a list of dataset directories, one dataset per worker process.
+Progress is kept in a ledger file so an interrupted batch resumes where it
+stopped.
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from xrftomo.file_io.storage import available_memory
+from xrftomo.file_io.metadata import save_metadata_indexes
+from xrftomo.file_io.reader import read_channel_names, read_projection_shape
+
+__author__ = "Fabricio Marin"
+__copyright__ = "Copyright (c) 2020, UChicago Argonne, LLC."
+__version__ = "0.0.1"
+__docformat__ = 'restructuredtext en'
+__all__ = ['LEDGER_NAME',
+           'BatchLedger',
+           'batch',
+           'estimate_job_memory']
+
+LOG = logging.getLogger(__name__)
+
+LEDGER_NAME = "xrftomo_batch.json"
+LEDGER_VERSION = 1
+
+#options that do not change the result of a job
+PER_JOB_OPTIONS = ('config', 'verbose', 'log', 'input_path', 'output_path',
+                   'batch_paths', 'batch_workers', 'job_memory', 'batch_ledger')
+
+
+class BatchLedger(object):
+    """
+    Status of every job of a batch, saved after each job finishes.
+
+    Jobs are keyed by their absolute input directory and hold status (done,
+    failed or skipped), output, seconds, peak_mb, error and the digest of the
+    options they ran with.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.jobs = {}
+        try:
+            with open(fname) as fid:
+                content = json.load(fid)
+            if content.get("version") == LEDGER_VERSION:
+                self.jobs = content.get("jobs", {})
+        except (IOError, OSError, ValueError):
+            pass
+
+    def is_done(self, path, digest):
+        job = self.jobs.get(path)
+        return job is not None and job["status"] == "done" and job["digest"] == digest
+
+    def set(self, path, **entry):
+        self.jobs[path] = entry
+        self.save()
+
+    def save(self):
+        tmp_fname = self.fname + ".tmp"
+        with open(tmp_fname, "w") as fid:
+            json.dump({"version": LEDGER_VERSION, "jobs": self.jobs}, fid, indent=1)
+        os.replace(tmp_fname, self.fname)
+
+
+def batch(params):
+    """
+    Runs every directory of params.batch_paths through the rec pipeline, or
+    through replay when params.operation_log is set, on a pool of processes.
+
+    Each job gets tomopy threads and memory in proportion to the pool: a
+    dataset whose estimated footprint exceeds job-memory is skipped rather than
+    started. Datasets already done with the same options are not run again.
+
+    Parameters
+    ----------
+    params : argparse.Namespace
+        file-io, reconstruction and batch options, see xrftomo.config
+    """
+    paths = [os.path.abspath(path) for path in params.batch_paths or []]
+    if len(paths) == 0:
+        raise RuntimeError("batch-paths is not set")
+    if len(set(os.path.basename(path) for path in paths)) != len(paths) and params.output_path:
+        raise RuntimeError("batch-paths must have distinct directory names to share output-path")
+    num_cores = os.cpu_count() or 1
+    workers = min(params.batch_workers or num_cores, len(paths))
+    ncore = max(1, num_cores // workers)
+    budget = params.job_memory * 2**30 if params.job_memory > 0 else (available_memory() or float('inf')) / workers
+
+    options = {key: value for key, value in vars(params).items() if not key.startswith('_')}
+    digest = hashlib.sha1(json.dumps({key: value for key, value in options.items() if key not in PER_JOB_OPTIONS},
+                                     sort_keys=True, default=str).encode()).hexdigest()
+    ledger_fname = params.batch_ledger or os.path.join(params.output_path or os.getcwd(), LEDGER_NAME)
+    os.makedirs(os.path.dirname(os.path.abspath(ledger_fname)), exist_ok=True)
+    ledger = BatchLedger(ledger_fname)
+
+    start = time.time()
+    futures = {}
+    attempted = []
+    pool_options = dict(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    if sys.version_info >= (3, 11):
+        # one process per job, so the peak memory a worker reports is that job's alone
+        pool_options['max_tasks_per_child'] = 1
+    with concurrent.futures.ProcessPoolExecutor(**pool_options) as executor:
+        for path in paths:
+            if ledger.is_done(path, digest):
+                LOG.info("already done: %s", path)
+                continue
+            attempted.append(path)
+            output_path = os.path.join(params.output_path, os.path.basename(path)) if params.output_path else ""
+            try:
+                footprint = estimate_job_memory(params, path)
+            except Exception as error:
+                ledger.set(path, status="failed", output=output_path, seconds=0, peak_mb=0, error=str(error), digest=digest)
+                LOG.error("%s: %s", path, error)
+                continue
+            if footprint > budget:
+                error = "needs about {:.1f} GB, job-memory is {:.1f} GB".format(footprint/2**30, budget/2**30)
+                ledger.set(path, status="skipped", output=output_path, seconds=0, peak_mb=0, error=error, digest=digest)
+                LOG.warning("skipped %s: %s", path, error)
+                continue
+            job_options = dict(options, input_path=path, output_path=output_path, load_workers=1)
+            futures[executor.submit(run_job, job_options, ncore)] = path
+        LOG.info("%d datasets on %d workers, %d tomopy threads each", len(futures), workers, ncore)
+
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                result = dict(status="failed", output="", seconds=0, peak_mb=0, error=str(error))
+            ledger.set(path, digest=digest, **result)
+            LOG.info("%s %s in %.0f s", result["status"], path, result["seconds"])
+    report(ledger, attempted, time.time() - start)
+    return ledger
+
+
+def run_job(options, ncore):
+    """
+    Runs one dataset in a worker process, returns its ledger entry
+
+    peak_mb is the peak resident size of the worker process. Each job has a
+    process of its own on Python 3.11 and later; on older versions a worker
+    runs several jobs and peak_mb is an upper bound, the largest peak of the
+    jobs it has run so far.
+    """
+    from xrftomo import config, reco
+    import resource
+    params = argparse.Namespace(**options)
+    config.setup_logging(params)
+    start = time.time()
+    status, error = "done", ""
+    try:
+        if params.operation_log:
+            reco.replay(params, ncore=ncore)
+        else:
+            reco.tomo(params, ncore=ncore)
+        save_metadata_indexes()
+    except (RuntimeError, ValueError, KeyError, OSError, MemoryError) as exception:
+        status, error = "failed", "{}: {}".format(type(exception).__name__, exception)
+    #ru_maxrss is in kB on linux, in bytes on macOS
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    output_path = params.output_path or os.path.join(params.input_path, "xrftomo_rec")
+    return dict(status=status, output=output_path, seconds=time.time() - start, peak_mb=peak_mb, error=error)
+
+
+def estimate_job_memory(params, path):
+    """
+    Bytes a dataset needs in the rec pipeline: the loaded cube, its binned copy
+    and two batches of reconstructed slices
+
+    Parameters
+    ----------
+    params : argparse.Namespace
+        file-io and reconstruction options
+    path : str
+        dataset directory
+
+    Returns
+    -------
+    nbytes : int
+    """
+    from xrftomo import reco
+    ext = params.file_extension.split(".")[-1]
+    fnames = sorted(os.path.join(path, fname) for fname in os.listdir(path)
+                    if fname.split(".")[-1] == ext and not fname.startswith("."))
+    if len(fnames) == 0:
+        raise RuntimeError("no {} files in {}".format(ext, path))
+    shape = read_projection_shape(fnames[0], params.data_tag, params.element_tag)
+    if shape is None:
+        raise RuntimeError("{} has no channels".format(fnames[0]))
+    num_channels = len(reco.read_selection(params.selected_elements, read_channel_names(fnames[0], params.element_tag)))
+    try:
+        num_channels += len(reco.read_selection(params.selected_scalers, read_channel_names(fnames[0], params.scaler_tag)))
+    except (KeyError, OSError):
+        pass
+    itemsize = 8 if params.data_dtype == 'float64' else 4
+    factor = 2**int(params.binning)
+    cube = num_channels * len(fnames) * shape[0] * shape[1] * itemsize
+    binned = cube // factor**2 if factor > 1 else 0
+    slices = 2 * params.recon_chunk * (shape[1] // factor)**2 * 4
+    return cube + binned + slices
+
+
+def report(ledger, paths, wall_time):
+    """
+    Logs one line per dataset run in this batch and the totals
+    """
+    jobs = [(path, ledger.jobs[path]) for path in paths if path in ledger.jobs]
+    LOG.info("%-8s %10s %10s  %s", "status", "seconds", "peak MB", "dataset")
+    for path, job in jobs:
+        LOG.info("%-8s %10.0f %10.0f  %s", job["status"], job["seconds"], job["peak_mb"], path)
+        if job["error"]:
+            LOG.info("%-8s %s", "", job["error"])
+    counts = {status: sum(job["status"] == status for path, job in jobs) for status in ("done", "failed", "skipped")}
+    job_time = sum(job["seconds"] for path, job in jobs)
+    LOG.info("%d done, %d failed, %d skipped; %.0f s of work in %.0f s wall time (x%.1f)",
+             counts["done"], counts["failed"], counts["skipped"], job_time, wall_time, job_time / max(wall_time, 1e-6))
+    LOG.info("ledger: %s", ledger.fname)
@@ -101,6 +101,48 @@ SECTIONS['file-io'] = {
         'default': '[0,1]',
         'type': str,
         'help': "list of selected scaler indexes"},
+    'load-workers': {
+        'default': 4,
+        'type': int,
+        'help': "number of processes reading hdf files concurrently, 1 reads files one after another"},
+    'watch-interval': {
+        'default': 5.0,
+        'type': float,
+        'help': "seconds between checks for new files when watching the data directory"},
+    'data-backend': {
+        'default': 'memory',
+        'type': str,
+        'help': "where the loaded dataset and its undo history are kept: in RAM or in memory-mapped scratch files",
+        'choices': ['memory', 'memmap']},
+    'scratch-path': {
+        'default': '',
+        'type': str,
+        'help': "directory for memory-mapped scratch files, empty uses the system temp directory",
+        'metavar': 'PATH'},
+    'alignment-file': {
+        'default': '',
+        'type': str,
+        'help': "alignment saved from the gui (.txt or .npy) applied before reconstructing with xrftomo rec",
+        'metavar': 'PATH'},
+    'operation-log': {
+        'default': '',
+        'type': str,
+        'help': "operations saved from the gui (.json) that xrftomo replay applies to input-path",
+        'metavar': 'PATH'},
+    'replay-scale': {
+        'default': 1.0,
+        'type': float,
+        'help': "pixel size of the dataset the operation log was recorded on divided by that of input-path"},
+    'output-path': {
+        'default': '',
+        'type': str,
+        'help': "directory xrftomo rec and replay write results to, empty uses <input-path>/xrftomo_rec",
+        'metavar': 'PATH'},
+    'data-dtype': {
+        'default': 'float32',
+        'type': str,
+        'help': "floating point type of the loaded dataset and reconstructions",
+        'choices': ['float32', 'float64']},
         }
 
 SECTIONS['reconstruction'] = {
@@ -118,6 +160,10 @@ SECTIONS['reconstruction'] = {
         'default': 1024.0,
         'type': float,
         'help': "Rotation axis position"},
+    'recon-chunk': {
+        'default': 16,
+        'type': int,
+        'help': "number of slices reconstructed at a time by xrftomo rec, each batch is written while the next one is computed"},
     'reconstruction-algorithm': {
         'default': 'gridrec',
         'type': str,
@@ -146,6 +192,27 @@ SECTIONS['sirtfbp'] = {
         'type': float,
         'help': "mu (sirtfbp)"}}
 
+SECTIONS['batch'] = {
+    'batch-paths': {
+        'default': None,
+        'type': str,
+        'nargs': '+',
+        'help': "dataset directories processed by xrftomo batch",
+        'metavar': 'PATH'},
+    'batch-workers': {
+        'default': 0,
+        'type': int,
+        'help': "datasets processed at the same time by xrftomo batch, 0 uses one per core"},
+    'job-memory': {
+        'default': 0.0,
+        'type': float,
+        'help': "GB a single dataset may use, larger datasets are skipped; 0 divides the available memory between the workers"},
+    'batch-ledger': {
+        'default': '',
+        'type': str,
+        'help': "file recording finished datasets so an interrupted batch resumes, empty uses <output-path>/xrftomo_batch.json",
+        'metavar': 'FILE'}}
+
 
 TOMO_PARAMS = ('file-io', 'reconstruction', 'ir', 'sirt', 'sirtfbp')
 
@@ -153,7 +220,8 @@ NICE_NAMES = ('General', 'Input',
               'General reconstruction', 'Tomographic reconstruction',
               'Filtered backprojection',
               'Direct Fourier Inversion', 'Iterative reconstruction',
-              'SIRT', 'SBTV', 'GUI settings', 'Estimation', 'Performance')
+              'SIRT', 'SBTV', 'GUI settings', 'Estimation', 'Performance',
+              'Batch')
 
 def get_config_name():
     """Get the command line --config option."""
@@ -284,3 +352,21 @@ def log_values(args):
             for entry in entries:
                 value = args[entry] if args[entry] is not None else "-"
                 LOG.debug("  {:<16} {}".format(entry, value))
+
+
+def setup_logging(args):
+    """Send the xrftomo log to stdout and, when --log is set, to that file.
+
+    Called once per process: by the command line entry point and by every
+    batch worker, whose spawned processes start with no logging configured.
+    """
+    logger = logging.getLogger('xrftomo')
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logger.addHandler(stream_handler)
+    if args.log:
+        file_handler = logging.FileHandler(args.log)
+        file_handler.setFormatter(logging.Formatter('%(name)s:%(levelname)s: %(message)s'))
+        logger.addHandler(file_handler)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+###########################################################################
+
+"""
+Module for a per-directory sidecar index caching values read from raw data
+files (channel names, dataset shapes, theta PVs) so reopening a directory
+only rescans files that are new or have changed since the last visit.
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['INDEX_NAME',
+           'MetadataIndex',
+           'get_metadata_index',
+           'lookup_metadata',
+           'read_metadata',
+           'save_metadata_indexes']
+
+INDEX_NAME = ".xrftomo_index.json"
+INDEX_VERSION = 1
+
+# files with fewer values to read than this are read on the calling thread,
+# starting worker processes would take longer than the reads themselves
+POOL_MIN_FILES = 64
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_missing = object()
+
+
+class MetadataIndex(object):
+    """
+    Cache of values read from the files of one directory, persisted as a json
+    sidecar file. Each file entry is keyed by name and holds the file's mtime
+    and size; a value is reread whenever either of them changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fname = os.path.join(path, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        self.writable = True
+        self.lock = threading.Lock()
+        try:
+            with open(self.fname, "r") as fid:
+                index = json.load(fid)
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index["files"]
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            self.entries = {}
+
+    def get(self, fname, key, default=None):
+        """
+        Returns a cached value for a file, or default if it is missing or stale
+
+        Parameters
+        ----------
+        fname : str
+            File in this index's directory
+        key : str
+            Name of the cached value (ex. "shape:MAPS/XRF_roi")
+        default :
+            returned when the value has to be read from the file
+        """
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            return default
+        with self.lock:
+            entry = self.entries.get(os.path.basename(fname))
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                return default
+            return entry["values"].get(key, default)
+
+    def set(self, fname, key, value):
+        """
+        Stores a value read from a file, it must be json serializable
+        """
+        name = os.path.basename(fname)
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            return
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                entry = {"mtime": stat.st_mtime, "size": stat.st_size, "values": {}}
+                self.entries[name] = entry
+            entry["values"][key] = value
+            self.dirty = True
+
+    def lookup(self, fname, key, read, *args):
+        """
+        Returns a cached value for a file, reading it on a miss
+
+        Parameters
+        ----------
+        fname : str
+            File in this index's directory
+        key : str
+            Name of the cached value (ex. "shape:MAPS/XRF_roi")
+        read : callable
+            Called as read(fname, *args) when the value is missing or stale
+
+        Returns
+        -------
+        value :
+            the cached or freshly read value
+        """
+        value = self.get(fname, key, _missing)
+        if value is _missing:
+            value = read(fname, *args)
+            self.set(fname, key, value)
+        return value
+
+    def save(self):
+        """
+        Writes the index next to the data files, dropping entries of files that
+        no longer exist. Read-only directories keep the index in memory only.
+        """
+        with self.lock:
+            if not self.dirty or not self.writable:
+                return
+            try:
+                existing = set(os.listdir(self.path))
+                for name in [name for name in self.entries if name not in existing]:
+                    del self.entries[name]
+                tmp_fname = self.fname + ".tmp"
+                with open(tmp_fname, "w") as fid:
+                    json.dump({"version": INDEX_VERSION, "files": self.entries}, fid)
+                os.replace(tmp_fname, self.fname)
+                self.dirty = False
+            except (IOError, OSError) as error:
+                self.writable = False
+                print("metadata index not saved, {}".format(error))
+
+
+def get_metadata_index(path):
+    """
+    Returns the index of a directory, loading its sidecar file on first use
+
+    Parameters
+    ----------
+    path : str
+        Directory containing the raw data files
+
+    Returns
+    -------
+    index : MetadataIndex
+    """
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = MetadataIndex(path)
+        return _indexes[path]
+
+
+def save_metadata_indexes():
+    """
+    Saves every index that has new values
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.save()
+
+
+def lookup_metadata(fname, key, read, *args):
+    """
+    Returns a value for a file from the index of its directory, reading it on a miss
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    key : str
+        Name of the cached value
+    read : callable
+        Called as read(fname, *args) when the value is missing or stale
+
+    Returns
+    -------
+    value :
+        the cached or freshly read value
+    """
+    index = get_metadata_index(os.path.dirname(os.path.abspath(fname)))
+    return index.lookup(fname, key, read, *args)
+
+
+def read_metadata(path_files, key, read, *args, **kwargs):
+    """
+    Returns a value for every file in a list, reading only the files whose
+    value is not in the index of their directory. Each missing file is opened
+    once; large batches are spread over a pool of worker processes since h5py
+    serializes all reads within a process.
+
+    Parameters
+    ----------
+    path_files : list
+        List of (path + filenames)
+    key : str
+        Name of the cached value
+    read : callable
+        Module level function called as read(fname, *args) for each missing file
+    workers : int
+        Number of worker processes, 1 reads every file on the calling thread
+
+    Returns
+    -------
+    values : list
+        One value per file, in the order of path_files
+    """
+    workers = kwargs.get("workers", 1)
+    indexes = [get_metadata_index(os.path.dirname(os.path.abspath(fname))) for fname in path_files]
+    values = [index.get(fname, key, _missing) for index, fname in zip(indexes, path_files)]
+    todo = [j for j in range(len(path_files)) if values[j] is _missing]
+    if todo:
+        fnames = [path_files[j] for j in todo]
+        if workers <= 1 or len(todo) < POOL_MIN_FILES:
+            results = [read(fname, *args) for fname in fnames]
+        else:
+            # spawn, not fork: the parent holds Qt and h5py state that must not be copied
+            context = multiprocessing.get_context("spawn")
+            chunksize = max(1, len(fnames)//(workers*4))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                arg_lists = [[arg]*len(fnames) for arg in args]
+                results = list(executor.map(read, fnames, *arg_lists, chunksize=chunksize))
+        for j, value in zip(todo, results):
+            values[j] = value
+            indexes[j].set(path_files[j], key, value)
+        save_metadata_indexes()
+    return values
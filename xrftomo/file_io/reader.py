@@ -51,11 +51,16 @@ from __future__ import (absolute_import, division, print_function,
 import numpy as np
 import xrftomo
 import h5py
-import matplotlib.pyplot as plt
-from skimage import io
 import csv
 import os
 import sys
+import concurrent.futures
+import itertools
+import tifffile
+import multiprocessing
+from xrftomo.elements import ELEMENTS
+from xrftomo.file_io.metadata import lookup_metadata, read_metadata, save_metadata_indexes
+from xrftomo.file_io.storage import allocate_data, bin_data, get_data_dtype
 
 __author__ = "Francesco De Carlo, Fabricio S. Marin"
 __copyright__ = "Copyright (c) 2018, UChicago Argonne, LLC."
@@ -87,7 +92,7 @@ class ReadOptions(object):
 
         elements = []
         for i in range(1, 110, 1):
-             elements.append(str(xrftomo.ELEMENTS[i].symbol))
+             elements.append(str(ELEMENTS[i].symbol))
 
         elements = sorted(set(channel_names) & set(elements), key = channel_names.index)
 
@@ -95,25 +100,7 @@ class ReadOptions(object):
 
 
     def read_channel_names(self, fname, element_tag):
-        """
-        Read the channel names
-
-        Parameters
-        ----------
-        fname : str
-            String defining the file name
-        element_tag : str
-            String defining the hdf5 channel tag name (ex. MAPS/channel_names)
-        Returns
-        -------
-        channel_names : list
-            List of channel names
-
-        """
-        img = h5py.File(fname, "r")
-        element_list = list(img[element_tag])
-        element_list = [x.decode("utf-8") for x in element_list]
-        return(element_list)
+        return read_channel_names(fname, element_tag)
 
     def read_projection(self, fname, element, data_tag, element_tag):
         """
@@ -137,198 +124,788 @@ class ReadOptions(object):
 
         """
         print(element, fname)
-        elements = self.read_channel_names(fname, element_tag)
-        if elements == []:
+        with h5py.File(fname, "r") as img:
+            projections = read_channels(img, [element], data_tag, element_tag)
+        if projections is None:
             return
-        img = h5py.File(fname, "r")
-        idx = elements.index(element)
-        projection = img[data_tag][idx]
-        return projection
-
-    def load_thetas(self, files, theta_tag, idx=None):
-        thetas = []
-        img = h5py.File(files[0], 'r')
-        if idx is None:
-            pv = theta_tag.split("/")[-1]
-            pvs = img["/".join(theta_tag.split("/")[:-1])]
-            idx = [i for i, s in enumerate(pvs) if pv in s.decode("utf8")][0]
-            img.close()
-
-        for file in files:
-            try:
-                img = h5py.File(file, 'r')
-                theta = float(img["MAPS/Scan/Extra_PVs/Values"][591].decode("utf-8"))
-            except:
-                try:
-                    theta = float(img["MAPS/extra_pvs_as_csv/"][idx].decode("utf-8").split(",")[1])
-                except:
-                    print("error reading thetas position for file: {}".format(file))
-                    return []
-            thetas.append(theta)
+        return projections[0]
 
-        return thetas
+    def load_thetas(self, files, theta_tag, idx=None, workers=1):
+        return load_thetas(files, theta_tag, idx=idx, workers=workers)
 
     def load_thetas_file(self, path_file):
+        return load_thetas_file(path_file)
+
+    def read_mic_xrf(self, path_files, elements, data_tag, element_tag, scalers, scaler_tag, workers=1, progress=None, cancelled=None, binning=0):
+        return read_mic_xrf(path_files, elements, data_tag, element_tag, scalers, scaler_tag, workers=workers, progress=progress, cancelled=cancelled, binning=binning)
 
-        name, ext = os.path.splitext(path_file)
-        fnames = []
-        thetas = []
-        if ext == ".txt":
-            text_file = open(path_file, "r")
+    def read_tiffs(self, fnames):
+        return read_tiffs(fnames)
+
+def read_channel_names(fname, element_tag):
+    """
+    Read the channel names
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    element_tag : str
+        String defining the hdf5 channel tag name (ex. MAPS/channel_names)
+    Returns
+    -------
+    channel_names : list
+        List of channel names
+
+    """
+    element_list = lookup_metadata(fname, "names:"+element_tag, read_names, element_tag)
+    return(element_list)
+
+
+def load_thetas(files, theta_tag, idx=None, workers=1):
+    """
+    Reads the rotation angle of every file, opening each file at most once
+
+    Parameters
+    ----------
+    files : list
+        List of (path + filenames)
+    theta_tag : str
+        PV names dataset followed by the theta PV name
+        (ex. MAPS/Scan/Extra_PVs/Names/2xfm:m58.VAL). The PV index is
+        resolved once from the first file.
+    idx : int or list
+        Index of the theta PV in MAPS/extra_pvs_as_csv, overrides theta_tag.
+        Given a list of candidate indexes, every candidate is read in the
+        same pass and one angle list per candidate is returned.
+    workers : int
+        Number of processes reading files concurrently
+
+    Returns
+    -------
+    thetas : list
+        angles in degrees, [] if any file could not be read
+    """
+    if len(files) == 0:
+        return []
+    if idx is None:
+        pv = resolve_theta_tag(files[0], theta_tag)
+        if pv is None:
+            print("theta PV not found for tag: {}".format(theta_tag))
+            return []
+        key = "theta:{}:{}".format(pv[0], pv[1])
+        thetas = read_metadata(files, key, read_theta_pv, *pv, workers=workers)
+        return check_thetas(files, thetas)
+
+    idxs = list(idx) if isinstance(idx, (list, tuple)) else [idx]
+    key = "theta:{}".format(",".join(str(i) for i in idxs))
+    values = read_metadata(files, key, read_theta, idxs, workers=workers)
+    candidates = [check_thetas(files, [value[k] for value in values]) for k in range(len(idxs))]
+    if isinstance(idx, (list, tuple)):
+        return candidates
+    return candidates[0]
+
+
+def load_thetas_file(path_file):
+
+    name, ext = os.path.splitext(path_file)
+    fnames = []
+    thetas = []
+    if ext == ".txt":
+        text_file = open(path_file, "r")
+        #TODO: check if fnames are present and save them to list, if not, just get thetas
+        lines = text_file.readlines()
+        text_file.close()
+        try:
+            cols = len(lines[0].split(","))
+        except IndexError:
+            print("invalid file formatting")
+            return [], []
+        if cols == 2:
+            thetas = [float(lines[1:][i].split(",")[1]) for i in range(len(lines)-1)]
+            fnames = [lines[1:][i].split(",")[0] for i in range(len(lines)-1)]
+            return fnames, thetas
+
+        elif cols ==1:
+            thetas = [float(lines[1:][i].split("\n")[0]) for i in range(len(lines)-1)]
+            return [], thetas
+
+    elif ext == ".csv" or ext == ".CSV":
+        with open('example.csv') as csvfile:
+            readCSV = csv.reader(csvfile, delimiter=',')
             #TODO: check if fnames are present and save them to list, if not, just get thetas
-            lines = text_file.readlines()
-            text_file.close()
-            try:
-                cols = len(lines[0].split(","))
-            except IndexError:
-                print("invalid file formatting")
-                return [], []
-            if cols == 2:
-                thetas = [float(lines[1:][i].split(",")[1]) for i in range(len(lines)-1)]
-                fnames = [lines[1:][i].split(",")[0] for i in range(len(lines)-1)]
-                return fnames, thetas
-
-            elif cols ==1:
-                thetas = [float(lines[1:][i].split("\n")[0]) for i in range(len(lines)-1)]
-                return [], thetas
-
-        elif ext == ".csv" or ext == ".CSV":
-            with open('example.csv') as csvfile:
-                readCSV = csv.reader(csvfile, delimiter=',')
-                #TODO: check if fnames are present and save them to list, if not, just get thetas
-                thetas = readCSV[0]
-                fnames = readCSV[1]
-                return fnames, thetas
+            thetas = readCSV[0]
+            fnames = readCSV[1]
+            return fnames, thetas
+    else:
+        return
+
+
+def read_mic_xrf(path_files, elements, data_tag, element_tag, scalers, scaler_tag, workers=1, progress=None, cancelled=None, binning=0):
+    """
+    Converts hdf files to numpy arrays for plotting and manipulation
+
+    Parameters
+    ----------
+    path_files: list
+        List of (path + filenames)
+    theta_index : int
+        Index where theta is saved under in the hdf MAPS/extra_pvs_as_csv tag
+        This is: 2-ID-E: 663; 2-ID-E (prior 2017): *657*; BNP: 8
+    data_tag: str
+        data tag for corresponding roi_tag (ex. MAPS/XRF_roi)
+    channel_tag : str
+        String defining the hdf5 channel tag name (ex. channel_names)
+    workers : int
+        Number of processes reading files concurrently, 1 reads on the calling thread
+    progress : callable
+        Called as progress(files_done, num_files, fname) after each file is read
+    cancelled : callable
+        Polled after each file, loading stops and None is returned once it returns True
+    binning : int
+        Projections are averaged over 2**binning x 2**binning pixel blocks as they are read
+
+    Returns
+    -------
+    ndarray: ndarray
+        4D array [elements, projection, y, x] in the type set with xrftomo.set_data_dtype
+    """
+
+    num_files = len(path_files)
+    num_elements = len(elements)
+    num_scalers = len(scalers)
+    max_y, max_x = read_frame_shape(path_files, data_tag, element_tag)
+    max_y, max_x = max_y >> binning, max_x >> binning
+    data = allocate_data([num_elements+num_scalers,num_files, max_y, max_x])
+    #get data, each file is opened once and all channels are read in one go
+    files = iter_mic_xrf_files(path_files, elements, data_tag, element_tag, scalers, scaler_tag, workers, data.dtype, binning)
+    for n, (j, projs, scaler_projs) in enumerate(files):
+        if projs is not None:
+            insert_projections(data, 0, j, projs, path_files[j])
+        if scaler_projs is not None:
+            insert_projections(data, num_elements, j, scaler_projs, path_files[j])
+        if progress is None:
+            print(path_files[j])
         else:
-            return
-
-    def read_mic_xrf(self, path_files, elements, data_tag, element_tag, scalers, scaler_tag):
-        """
-        Converts hdf files to numpy arrays for plotting and manipulation
-
-        Parameters
-        ----------
-        path_files: list
-            List of (path + filenames)
-        theta_index : int
-            Index where theta is saved under in the hdf MAPS/extra_pvs_as_csv tag
-            This is: 2-ID-E: 663; 2-ID-E (prior 2017): *657*; BNP: 8
-        data_tag: str
-            data tag for corresponding roi_tag (ex. MAPS/XRF_roi)
-        channel_tag : str
-            String defining the hdf5 channel tag name (ex. channel_names)
-
-        Returns
-        -------
-        ndarray: ndarray
-            4D array [elements, projection, y, x]
-        """
-
-        max_y, max_x = 0, 0
-        num_files = len(path_files)
-        num_elements = len(elements)
-        num_scalers = len(scalers)
-        #get max dimensons
-        for i in range(num_files):
-            proj = self.read_projection(path_files[i], elements[0], data_tag, element_tag)
-            if proj is None:
+            progress(n+1, num_files, path_files[j])
+        if cancelled is not None and cancelled():
+            files.close()
+            print("loading cancelled")
+            return None
+
+    # norm_scalers = np.zeros([num_files, max_y, max_x])
+    # flux = np.zeros(num_files)
+    # for j in range(num_files):
+    #     norm_scaler = self.read_projection(path_files[j], "US_IC", "MAPS/scalers", "MAPS/scaler_names")
+    #     # MAPS/scalers[32]
+    #     # MAPS/scaler_names[32]
+    #     # exchange_0/data
+    #     # exchange_0/data_names
+    #     # US_IC, DS_IC
+    #     if norm_scaler is not None:
+    #         img_y = norm_scaler.shape[0]
+    #         img_x = norm_scaler.shape[1]
+    #         dx = (max_x - img_x) // 2
+    #         dy = (max_y - img_y) // 2
+    #         norm_scalers[j, dy:img_y + dy, dx:img_x + dx] = norm_scaler
+    #         flux[j] = np.mean(norm_scaler)  # corrects for long term beam flux changes; i.e. adjacebt projection intensity
+
+
+    # norm_scalers = norm_scalers / np.max(norm_scalers)
+    # # flux = np.max(flux) / flux
+    # norm_scalers[norm_scalers == 0] = 1
+    # norm_scalers = np.roll(norm_scalers, 1, axis=2)
+    # data[num_elements] = norm_scalers
+    # # before = np.sum(data[0], axis=(1, 2))
+    # # data[:num_elements] = flux[None, :, None, None] * data[:num_elements] / norm_scalers[None, :]
+    # data[:num_elements] = data[:num_elements]/norm_scalers[None,:]
+    # # after = np.sum(data[0], axis=(1, 2))
+    # # intensity = after / before
+    # # plt.figure()
+    # # plt.plot(intensity)
+    # # plt.show()
+
+    return data
+
+
+def read_frame_shape(path_files, data_tag, element_tag):
+    """
+    Returns the [y, x] frame that holds the largest projection of a list of MAPS
+    hdf files, from the dataset headers; no pixels are read
+
+    Parameters
+    ----------
+    path_files: list
+        List of (path + filenames)
+    data_tag: str
+        data tag for corresponding roi_tag (ex. MAPS/XRF_roi)
+    element_tag : str
+        String defining the hdf5 channel tag name (ex. channel_names)
+
+    Returns
+    -------
+    shape : list
+        [max_y, max_x]
+    """
+    max_y, max_x = 0, 0
+    key = "shape:{}:{}".format(data_tag, element_tag)
+    for fname in path_files:
+        shape = lookup_metadata(fname, key, read_projection_shape, data_tag, element_tag)
+        if shape is not None:
+            max_y = max(max_y, shape[0])
+            max_x = max(max_x, shape[1])
+    save_metadata_indexes()
+    return [max_y, max_x]
+
+
+def read_alignment(fname):
+    """
+    Reads per projection shifts saved with SaveOptions.save_align_txt or save_align_npy
+
+    Parameters
+    ----------
+    fname : str
+        .txt file with a header line and "fname, x, y" or "x, y" rows,
+        or .npy file holding [fnames, x_shifts, y_shifts]
+
+    Returns
+    -------
+    fnames : list
+        projection file names, [] if the file has none
+    x_shifts : ndarray
+    y_shifts : ndarray
+    """
+    if fname.endswith(".npy"):
+        shifts = np.load(fname, allow_pickle=True)
+        fnames = [str(name).split("/")[-1] for name in shifts[0]]
+        return fnames, shifts[1].astype(float), shifts[2].astype(float)
+    with open(fname, "r") as file:
+        rows = [line.split(",") for line in file.readlines()[1:] if line.strip() != ""]
+    if len(rows) > 0 and len(rows[0]) == 2:
+        return [], np.array([float(row[0]) for row in rows]), np.array([float(row[1]) for row in rows])
+    fnames = [row[0].strip().split("/")[-1] for row in rows]
+    return fnames, np.array([float(row[1]) for row in rows]), np.array([float(row[2]) for row in rows])
+
+
+def decode_names(dataset):
+    """
+    Decodes an hdf5 list of byte strings (ex. MAPS/channel_names)
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        1D dataset of byte strings
+
+    Returns
+    -------
+    names : list
+        List of decoded strings
+    """
+    return [x.decode("utf-8") for x in dataset]
+
+
+def read_names(fname, name_tag):
+    """
+    Reads a list of names (ex. MAPS/channel_names) from a single hdf file
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    name_tag : str
+        String defining the hdf5 name tag (ex. MAPS/channel_names)
+
+    Returns
+    -------
+    names : list
+        List of names
+    """
+    with h5py.File(fname, "r") as img:
+        return decode_names(img[name_tag])
+
+
+def read_theta(fname, idxs):
+    """
+    Reads the rotation angle of a single MAPS hdf file at several candidate indexes
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    idxs : list
+        Candidate indexes of the theta PV in MAPS/extra_pvs_as_csv, used when
+        MAPS/Scan/Extra_PVs is not present
+
+    Returns
+    -------
+    thetas : list
+        angle in degrees per index, None where it could not be read
+    """
+    thetas = [None]*len(idxs)
+    try:
+        with h5py.File(fname, "r") as img:
+            try:
+                return [float(img["MAPS/Scan/Extra_PVs/Values"][591].decode("utf-8"))]*len(idxs)
+            except:
                 pass
-            else:
-                if proj.shape[0] > max_y:
-                    max_y = proj.shape[0]
-                if proj.shape[1] > max_x:
-                    max_x = proj.shape[1]
-
-        data = np.zeros([num_elements+num_scalers,num_files, max_y, max_x])
-        #get data
-        for i in range(num_elements):
-            for j in range(num_files):
-                proj = self.read_projection(path_files[j], elements[i], data_tag, element_tag)
-                if proj is not None:
-                    img_y = proj.shape[0]
-                    img_x = proj.shape[1]
-                    dx = (max_x-img_x)//2
-                    dy = (max_y-img_y)//2
-                    try:
-                        data[i, j, dy:img_y+dy, dx:img_x+dx] = proj
-                    except Exception as error:
-                        print(error)
-                        print("WARNING: possible error with file: {}. Check file integrity. ".format(path_files[j]))
-                        data[i, j] = np.zeros([max_y,max_x])
-
-        # norm_scalers = np.zeros([num_files, max_y, max_x])
-        # flux = np.zeros(num_files)
-        # for j in range(num_files):
-        #     norm_scaler = self.read_projection(path_files[j], "US_IC", "MAPS/scalers", "MAPS/scaler_names")
-        #     # MAPS/scalers[32]
-        #     # MAPS/scaler_names[32]
-        #     # exchange_0/data
-        #     # exchange_0/data_names
-        #     # US_IC, DS_IC
-        #     if norm_scaler is not None:
-        #         img_y = norm_scaler.shape[0]
-        #         img_x = norm_scaler.shape[1]
-        #         dx = (max_x - img_x) // 2
-        #         dy = (max_y - img_y) // 2
-        #         norm_scalers[j, dy:img_y + dy, dx:img_x + dx] = norm_scaler
-        #         flux[j] = np.mean(norm_scaler)  # corrects for long term beam flux changes; i.e. adjacebt projection intensity
-
-
-        for i in range(num_scalers):
-            k = i+num_elements
-            for j in range(num_files):
-                proj = self.read_projection(path_files[j], scalers[i], data_tag.split("/")[0]+"/scalers", scaler_tag)
-                proj = np.roll(proj,1, axis=1)
-                if proj is not None:
-                    img_y = proj.shape[0]
-                    img_x = proj.shape[1]
-                    dx = (max_x-img_x)//2
-                    dy = (max_y-img_y)//2
-                    try:
-                        data[k, j, dy:img_y+dy, dx:img_x+dx] = proj
-                    except Exception as error:
-                        print(error)
-                        print("WARNING: possible error with file: {}. Check file integrity. ".format(path_files[j]))
-                        data[k, j] = np.zeros([max_y,max_x])
-
-        # norm_scalers = norm_scalers / np.max(norm_scalers)
-        # # flux = np.max(flux) / flux
-        # norm_scalers[norm_scalers == 0] = 1
-        # norm_scalers = np.roll(norm_scalers, 1, axis=2)
-        # data[num_elements] = norm_scalers
-        # # before = np.sum(data[0], axis=(1, 2))
-        # # data[:num_elements] = flux[None, :, None, None] * data[:num_elements] / norm_scalers[None, :]
-        # data[:num_elements] = data[:num_elements]/norm_scalers[None,:]
-        # # after = np.sum(data[0], axis=(1, 2))
-        # # intensity = after / before
-        # # plt.figure()
-        # # plt.plot(intensity)
-        # # plt.show()
-
-        data[np.isnan(data)] = 0.0001
-        data[data == np.inf] = 0.0001
-
-        return data
-
-    def read_tiffs(self, fnames):
-
-        #TODO:check if fnames is a series of tiffs or a single tiff stack
-        max_x, max_y = 0,0
-        num_files = len(fnames)
-        for i in fnames:
-            im = io.imread(i)
-            if im.shape[0] > max_y:
-                max_y = im.shape[0]
-            if im.shape[1] > max_x:
-                max_x = im.shape[1]
-        data = np.zeros([1,num_files, max_y, max_x])
-
-        for i in range(len(fnames)):
-            im = io.imread(fnames[i])
-            img_y = im.shape[0]
-            img_x = im.shape[1]
-            dx = (max_x-img_x)//2
-            dy = (max_y-img_y)//2
-            data[0,i, dy:img_y+dy, dx:img_x+dx] = im
-
-        return data
\ No newline at end of file
+            pvs = img["MAPS/extra_pvs_as_csv"]
+            for k, idx in enumerate(idxs):
+                try:
+                    thetas[k] = float(pvs[idx].decode("utf-8").split(",")[1])
+                except:
+                    pass
+    except:
+        pass
+    return thetas
+
+
+def resolve_theta_tag(fname, theta_tag):
+    """
+    Finds where the theta PV of a theta tag is stored
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    theta_tag : str
+        PV names dataset followed by the PV name (ex. MAPS/Scan/Extra_PVs/Names/2xfm:m58.VAL
+        or MAPS/extra_pvs_as_csv/2xfm:m58.VAL)
+
+    Returns
+    -------
+    pv : tuple
+        (values_tag, idx, is_csv): dataset holding the values, index of the PV in it and
+        whether the values are "name, value" strings. None if the PV is not found.
+    """
+    names_tag = "/".join(theta_tag.split("/")[:-1])
+    pv = theta_tag.split("/")[-1].strip()
+    try:
+        with h5py.File(fname, "r") as img:
+            names = decode_names(img[names_tag])
+            idxs = [i for i, name in enumerate(names) if name.split(",")[0].strip() == pv]
+            if not idxs:
+                idxs = [i for i, name in enumerate(names) if pv in name]
+            if not idxs:
+                return None
+            values_tag = names_tag
+            if names_tag.split("/")[-1] == "Names":
+                values_tag = "/".join(names_tag.split("/")[:-1]+["Values"])
+            is_csv = "," in names[idxs[0]]
+            if values_tag not in img:
+                return None
+    except:
+        return None
+    return values_tag, idxs[0], is_csv
+
+
+def read_theta_pv(fname, values_tag, idx, is_csv):
+    """
+    Reads a single PV value from a single hdf file
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    values_tag : str
+        Dataset holding the PV values
+    idx : int
+        Index of the PV, only this element is read
+    is_csv : bool
+        True if the values are "name, value" strings
+
+    Returns
+    -------
+    theta : float
+        angle in degrees, None if it could not be read
+    """
+    try:
+        with h5py.File(fname, "r") as img:
+            value = img[values_tag][idx]
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        if is_csv:
+            value = value.split(",")[1]
+        return float(value)
+    except:
+        return None
+
+
+def check_thetas(files, thetas):
+    """
+    Returns the angles if every file has one, otherwise reports the first bad file and returns []
+    """
+    for fname, theta in zip(files, thetas):
+        if theta is None:
+            print("error reading thetas position for file: {}".format(fname))
+            return []
+    return list(thetas)
+
+
+def read_channels(img, names, data_tag, name_tag):
+    """
+    Reads several channels from an open hdf file with a single hyperslab read
+
+    Parameters
+    ----------
+    img : h5py.File
+        Open MAPS hdf file
+    names : list
+        Channel names to read, in the order they should be returned
+    data_tag : str
+        data tag for corresponding dataset (ex. MAPS/XRF_roi)
+    name_tag : str
+        String defining the hdf5 channel tag name (ex. MAPS/channel_names)
+
+    Returns
+    -------
+    ndarray: ndarray
+        3D array [names, y, x], None if the file has no channel names
+    """
+    channel_names = decode_names(img[name_tag])
+    if channel_names == []:
+        return None
+    idxs = [channel_names.index(name) for name in names]
+    # h5py fancy indexing needs increasing, unique indices
+    unique, inverse = np.unique(idxs, return_inverse=True)
+    projections = img[data_tag][unique.tolist()]
+    return projections[inverse]
+
+
+def read_projection_shape(fname, data_tag, element_tag):
+    """
+    Reads the projection dimensions of a MAPS hdf file without reading any pixels
+
+    Returns
+    -------
+    shape : list
+        [y, x], None if the file has no channel names
+    """
+    with h5py.File(fname, "r") as img:
+        if len(img[element_tag]) == 0:
+            return None
+        return list(img[data_tag].shape[-2:])
+
+
+def read_mic_xrf_file(fname, elements, data_tag, element_tag, scalers, scaler_tag, dtype=None, binning=0):
+    """
+    Reads all requested elements and scalers from a single MAPS hdf file, opening it once
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+    elements : list
+        Element names to read
+    data_tag : str
+        data tag for corresponding dataset (ex. MAPS/XRF_roi)
+    element_tag : str
+        String defining the hdf5 channel tag name (ex. MAPS/channel_names)
+    scalers : list
+        Scaler names to read
+    scaler_tag : str
+        String defining the hdf5 scaler tag name (ex. MAPS/scaler_names)
+    dtype : data-type
+        Type the projections are returned in, None keeps the file's type
+    binning : int
+        Projections are averaged over 2**binning x 2**binning pixel blocks
+
+    Returns
+    -------
+    projections : ndarray
+        3D array [elements, y, x] or None
+    scaler_projections : ndarray
+        3D array [scalers, y, x] or None
+    """
+    scaler_projections = None
+    with h5py.File(fname, "r") as img:
+        projections = read_channels(img, elements, data_tag, element_tag)
+        if len(scalers) > 0:
+            scaler_projections = read_channels(img, scalers, data_tag.split("/")[0]+"/scalers", scaler_tag)
+    if scaler_projections is not None:
+        scaler_projections = np.roll(scaler_projections, 1, axis=2)
+    # invalid values are replaced per file so the whole cube never needs a mask
+    for projs in (projections, scaler_projections):
+        if projs is not None:
+            projs[np.isnan(projs)] = 0.0001
+            projs[projs == np.inf] = 0.0001
+    if binning > 0:
+        projections = None if projections is None else bin_data(projections, binning)
+        scaler_projections = None if scaler_projections is None else bin_data(scaler_projections, binning)
+    if dtype is not None:
+        # cast in the worker so only the narrowed arrays are sent back to the parent
+        if projections is not None:
+            projections = projections.astype(dtype, copy=False)
+        if scaler_projections is not None:
+            scaler_projections = scaler_projections.astype(dtype, copy=False)
+    return projections, scaler_projections
+
+
+def iter_mic_xrf_files(path_files, elements, data_tag, element_tag, scalers, scaler_tag, workers=1, dtype=None, binning=0):
+    """
+    Reads a list of MAPS hdf files, yielding each one as soon as it is in memory
+
+    h5py serializes all reads within a process, so concurrent reads are done in
+    a pool of worker processes. Files are yielded in completion order; only
+    about two files per worker are submitted ahead of the caller, and closing
+    the generator cancels the files that have not been started yet.
+
+    Parameters
+    ----------
+    path_files: list
+        List of (path + filenames)
+    workers : int
+        Number of worker processes, 1 reads every file on the calling thread
+    dtype : data-type
+        Type the projections are returned in, None keeps the file's type
+    binning : int
+        Projections are averaged over 2**binning x 2**binning pixel blocks
+
+    Yields
+    ------
+    index : int
+        Position of the file in path_files
+    projections : ndarray
+        3D array [elements, y, x] or None
+    scaler_projections : ndarray
+        3D array [scalers, y, x] or None
+    """
+    args = (elements, data_tag, element_tag, scalers, scaler_tag, dtype, binning)
+    if workers <= 1 or len(path_files) <= 1:
+        for j, fname in enumerate(path_files):
+            yield (j,) + read_mic_xrf_file(fname, *args)
+        return
+
+    # spawn, not fork: the parent holds Qt and h5py state that must not be copied.
+    # Workers only import this module, whose imports do not include Qt or tomopy.
+    context = multiprocessing.get_context("spawn")
+    jobs = enumerate(path_files)
+    futures = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+
+        def submit(count):
+            for j, fname in itertools.islice(jobs, count):
+                futures[executor.submit(read_mic_xrf_file, fname, *args)] = j
+
+        # about two files per worker in flight: results not yet consumed are
+        # the only copies of the data held besides the cube being filled
+        submit(2*workers)
+        try:
+            while futures:
+                done, pending = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    result = future.result()
+                    submit(1)
+                    yield (index,) + result
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def insert_projections(data, start, index, projections, fname):
+    """
+    Copies a stack of projections into the 4D array, centered in the [y, x] frame
+
+    Parameters
+    ----------
+    data : ndarray
+        4D array [elements, projection, y, x]
+    start : int
+        First element row the projections are written to
+    index : int
+        Projection index
+    projections : ndarray
+        3D array [elements, y, x]
+    fname : str
+        File the projections were read from, used for warnings
+    """
+    img_y = projections.shape[1]
+    img_x = projections.shape[2]
+    dx = (data.shape[3]-img_x)//2
+    dy = (data.shape[2]-img_y)//2
+    stop = start + projections.shape[0]
+    try:
+        data[start:stop, index, dy:img_y+dy, dx:img_x+dx] = projections
+    except Exception as error:
+        print(error)
+        print("WARNING: possible error with file: {}. Check file integrity. ".format(fname))
+        data[start:stop, index] = 0
+
+
+def read_tiff_shape(fname):
+    """
+    Reads the image dimensions of a single image TIFF file from its header, no pixels are decoded
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+
+    Returns
+    -------
+    shape : tuple
+        (y, x) size of the image
+    """
+    with tifffile.TiffFile(fname) as tif:
+        series = tif.series[0]
+        y_axis, x_axis = tiff_image_axes(fname, series.axes, series.shape)
+        return series.shape[y_axis], series.shape[x_axis]
+
+
+def tiff_image_axes(fname, axes, shape):
+    """
+    Positions of the Y and X axes of a TIFF series. Any other axis must have a
+    single entry: RGB samples, several pages or channels are not guessed at.
+
+    Parameters
+    ----------
+    fname : str
+        file name, for the error message
+    axes : str
+        tifffile axes of the series, e.g. 'YX' or 'YXS'
+    shape : tuple
+        shape of the series
+
+    Returns
+    -------
+    y_axis, x_axis : int
+        positions of Y and X in axes
+    """
+    if 'Y' not in axes or 'X' not in axes or any(size > 1 for axis, size in zip(axes, shape) if axis not in 'YX'):
+        raise ValueError("{}: cannot read a TIFF with axes {} and shape {} as a single grayscale image".format(fname, axes, tuple(shape)))
+    return axes.index('Y'), axes.index('X')
+
+
+def read_tiffs(fnames, workers=None):
+    """
+    Reads a series of single image TIFF files, centering each image in the largest frame
+
+    Image sizes come from the file headers, so every file is decoded once.
+    Decoding runs on a pool of threads; tifffile releases the GIL while reading
+    and decompressing. Files whose first series is not a single grayscale
+    image raise ValueError.
+
+    Parameters
+    ----------
+    fnames : list
+        List of (path + filenames)
+    workers : int
+        Number of decoding threads, None lets concurrent.futures choose
+
+    Returns
+    -------
+    ndarray: ndarray
+        4D array [1, projection, y, x] in the type set with xrftomo.set_data_dtype
+    """
+    #TODO:check if fnames is a series of tiffs or a single tiff stack
+    shapes = [read_tiff_shape(fname) for fname in fnames]
+    max_y = max([shape[0] for shape in shapes] + [0])
+    max_x = max([shape[1] for shape in shapes] + [0])
+    data = allocate_data([1, len(fnames), max_y, max_x])
+
+    def read_slice(i):
+        with tifffile.TiffFile(fnames[i]) as tif:
+            series = tif.series[0]
+            y_axis, x_axis = tiff_image_axes(fnames[i], series.axes, series.shape)
+            im = series.asarray()
+        im = np.moveaxis(im, (y_axis, x_axis), (-2, -1)).reshape(shapes[i])
+        img_y, img_x = im.shape
+        dx = (max_x-img_x)//2
+        dy = (max_y-img_y)//2
+        data[0, i, dy:img_y+dy, dx:img_x+dx] = im
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(read_slice, range(len(fnames))))
+    return data
+
+
+def read_tiff_stack(fname):
+    """
+    Reads a multi-page TIFF stack [projection, y, x]
+
+    An uncompressed, contiguous stack already in the configured data type is
+    memory-mapped copy-on-write: pages are read from disk when they are first
+    touched and edits never reach the file. Any other stack is decoded once
+    into a new array.
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+
+    Returns
+    -------
+    ndarray: ndarray
+        4D array [1, projection, y, x]
+    """
+    with tifffile.TiffFile(fname) as tif:
+        series = tif.series[0]
+        mappable = series.dataoffset is not None and series.dtype == get_data_dtype()
+    if mappable:
+        stack = tifffile.memmap(fname, mode='c')
+    else:
+        stack = tifffile.imread(fname)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    if mappable:
+        return stack[np.newaxis]
+    data = allocate_data((1,) + stack.shape)
+    data[0] = stack
+    return data
+
+
+def read_session(fname):
+    """
+    Opens a session file written by xrftomo.write_session, or a file from
+    earlier versions holding only elements, names, thetas and data
+
+    The data cube and volumes are returned as h5py datasets: nothing but the
+    small arrays is read until they are sliced, and only the chunks touched are
+    decompressed. The file stays open until session["file"] is closed.
+
+    Parameters
+    ----------
+    fname : str
+        String defining the file name
+
+    Returns
+    -------
+    session : dict
+        file, version, elements, fnames, thetas, x_shifts, y_shifts,
+        data (h5py.Dataset [elements, projection, y, x]) and
+        recons (dict of element name: h5py.Dataset [slice, y, x])
+    """
+    img = h5py.File(fname, "r")
+    num_projections = img["data"].shape[1]
+    session = {"file": img, "version": int(img.attrs.get("version", 0))}
+    session["elements"] = decode_names(img["elements"])
+    session["fnames"] = [name.split("/")[-1] for name in decode_names(img["names"])]
+    session["thetas"] = np.array(img["thetas"], dtype=np.float64)
+    for key in ("x_shifts", "y_shifts"):
+        session[key] = np.array(img[key]) if key in img else np.zeros(num_projections, dtype="int")
+    session["data"] = img["data"]
+    session["recons"] = {key: img["recons"][key] for key in img["recons"]} if "recons" in img else {}
+    return session
+
+
+def load_dataset(dataset, dtype=None):
+    """
+    Copies an hdf5 dataset into an array of the current data backend, one
+    chunk row at a time, so memory-mapped arrays are never fully resident
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+        dataset to read
+    dtype : data-type
+        array data type, None uses the data type set with xrftomo.set_data_dtype
+
+    Returns
+    -------
+    ndarray: ndarray
+        np.ndarray or np.memmap
+    """
+    data = allocate_data(dataset.shape, dtype)
+    for i in range(dataset.shape[0]):
+        data[i] = dataset[i]
+    return data
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+###########################################################################
+
+"""
+Module for allocating the [element, theta, y, x] data cube either in memory or
+out-of-core, in a memory-mapped scratch file, for the floating point type the
+cube and the buffers derived from it are kept in, and for estimating how much
+memory a session will need before anything is loaded.
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import tempfile
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['DATA_BACKENDS',
+           'DATA_DTYPES',
+           'set_data_backend',
+           'set_data_dtype',
+           'get_data_dtype',
+           'allocate_data',
+           'copy_data',
+           'append_projections',
+           'bin_data',
+           'HISTORY_LENGTH',
+           'available_memory',
+           'estimate_session_memory',
+           'memory_options']
+
+DATA_BACKENDS = ('memory', 'memmap')
+DATA_DTYPES = ('float32', 'float64')
+
+_backend = {'mode': 'memory', 'path': None, 'dtype': np.dtype('float32')}
+
+# undo copies kept by the gui, one more is held while the oldest is dropped
+HISTORY_LENGTH = 10
+
+
+def set_data_backend(mode, path=None):
+    """
+    Selects where new data cubes are allocated
+
+    Parameters
+    ----------
+    mode : str
+        'memory' keeps arrays in RAM, 'memmap' keeps them in scratch files
+        that the OS pages in and out as they are touched
+    path : str
+        Directory for the scratch files, None or '' uses the system temp directory
+    """
+    if mode not in DATA_BACKENDS:
+        raise ValueError("unknown data backend: {}".format(mode))
+    _backend['mode'] = mode
+    _backend['path'] = path if path else None
+
+
+def set_data_dtype(dtype):
+    """
+    Selects the floating point type of new data cubes and reconstructions
+
+    Parameters
+    ----------
+    dtype : str
+        'float32' (default) or 'float64'
+    """
+    if str(dtype) not in DATA_DTYPES:
+        raise ValueError("unsupported data type: {}".format(dtype))
+    _backend['dtype'] = np.dtype(str(dtype))
+
+
+def get_data_dtype():
+    """
+    Returns
+    -------
+    dtype: np.dtype
+        floating point type of new data cubes and reconstructions
+    """
+    return _backend['dtype']
+
+
+def allocate_data(shape, dtype=None):
+    """
+    Allocates a zero filled array with the current data backend
+
+    Parameters
+    ----------
+    shape : tuple
+        array shape, typically [elements, projections, y, x]
+    dtype : data-type
+        array data type, None uses the data type set with set_data_dtype
+
+    Returns
+    -------
+    ndarray: ndarray
+        np.ndarray or np.memmap
+    """
+    shape = tuple(int(i) for i in shape)
+    if dtype is None:
+        dtype = _backend['dtype']
+    if _backend['mode'] == 'memmap' and int(np.prod(shape)) > 0:
+        # the scratch file is unlinked on creation and freed with the last view of the array
+        fid = tempfile.TemporaryFile(prefix="xrftomo_", suffix=".dat", dir=_backend['path'])
+        return np.memmap(fid, dtype=dtype, mode='w+', shape=shape)
+    return np.zeros(shape, dtype=dtype)
+
+
+def copy_data(data):
+    """
+    Copies an array with the current data backend. Out-of-core copies are made
+    one sub-array at a time so the full array is never resident in memory.
+
+    Parameters
+    ----------
+    data : ndarray
+        array to copy
+
+    Returns
+    -------
+    ndarray: ndarray
+        np.ndarray or np.memmap
+    """
+    if _backend['mode'] != 'memmap' or data.ndim == 0:
+        return np.array(data, copy=True)
+    new_data = allocate_data(data.shape, data.dtype)
+    for i in range(len(data)):
+        new_data[i] = data[i]
+    return new_data
+
+
+def append_projections(data, projections):
+    """
+    Appends projections to a data cube along the projection axis. The cube is
+    returned as a view of a buffer with spare room for more projections; the
+    buffer doubles in size when it is full, so appending one projection at a
+    time costs linear time overall.
+
+    Parameters
+    ----------
+    data : ndarray
+        4D array [elements, projection, y, x]
+    projections : ndarray
+        4D array [elements, new projections, y', x'], centered in the [y, x]
+        frame of data, cropped where it is larger
+
+    Returns
+    -------
+    ndarray: ndarray
+        4D array [elements, projection + new projections, y, x]
+    """
+    num_projections = data.shape[1]
+    total = num_projections + projections.shape[1]
+    buffer = data.base
+    reusable = (isinstance(buffer, np.ndarray) and buffer.ndim == 4
+                and buffer.shape[0] == data.shape[0] and buffer.shape[2:] == data.shape[2:]
+                and buffer.shape[1] >= total and buffer.dtype == data.dtype
+                and buffer.strides == data.strides
+                and buffer.__array_interface__['data'][0] == data.__array_interface__['data'][0])
+    if not reusable:
+        capacity = max(total, 2*num_projections)
+        buffer = allocate_data([data.shape[0], capacity, data.shape[2], data.shape[3]], data.dtype)
+        for i in range(len(data)):
+            buffer[i, :num_projections] = data[i]
+
+    frame_y, frame_x = data.shape[2:]
+    img_y, img_x = projections.shape[2:]
+    dy = (frame_y - img_y)//2
+    dx = (frame_x - img_x)//2
+    dst_y = slice(max(dy, 0), max(dy, 0) + min(img_y, frame_y))
+    dst_x = slice(max(dx, 0), max(dx, 0) + min(img_x, frame_x))
+    src_y = slice(max(-dy, 0), max(-dy, 0) + min(img_y, frame_y))
+    src_x = slice(max(-dx, 0), max(-dx, 0) + min(img_x, frame_x))
+    new = buffer[:, num_projections:total]
+    new[...] = 0
+    new[:, :, dst_y, dst_x] = projections[:, :, src_y, src_x]
+    return buffer[:, :total]
+
+
+def bin_data(data, level):
+    """
+    Averages 2**level x 2**level pixel blocks over the last two axes, dropping
+    the rows and columns left over at the far edges
+
+    Parameters
+    ----------
+    data : ndarray
+        [..., y, x] array: a [channel, y, x] stack read from one file, a
+        [projection, y, x] stack or the 4D data cube
+    level : int
+        binning level, 1 for 2x2 blocks
+
+    Returns
+    -------
+    ndarray: ndarray
+        [..., y//2**level, x//2**level]; a 4D cube is binned one element at a
+        time into a cube from allocate_data, other arrays into a new ndarray
+    """
+    factor = 2**level
+    num_y = data.shape[-2]//factor
+    num_x = data.shape[-1]//factor
+    if data.ndim == 4:
+        binned = allocate_data([data.shape[0], data.shape[1], num_y, num_x])
+        for i in range(data.shape[0]):
+            binned[i] = bin_data(data[i], level)
+        return binned
+    blocks = data[..., :num_y*factor, :num_x*factor].reshape(data.shape[:-2] + (num_y, factor, num_x, factor))
+    return blocks.mean(axis=(-3, -1))
+
+
+def available_memory():
+    """
+    Returns
+    -------
+    nbytes: int
+        memory that can be allocated without swapping, None when unknown
+    """
+    try:
+        with open("/proc/meminfo") as fid:
+            for line in fid:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])*1024
+    except (IOError, OSError, ValueError):
+        pass
+    # total physical memory is not a bound on what fits, report unknown instead
+    return None
+
+
+def estimate_session_memory(num_channels, num_projections, shape, dtype=None, backend=None, binning=0):
+    """
+    Projected peak memory of a gui session: the loaded cube, the copy kept for
+    restore, the undo history and one reconstruction volume per channel
+
+    Parameters
+    ----------
+    num_channels : int
+        selected elements plus scalers
+    num_projections : int
+        selected files
+    shape : list
+        [y, x] of the largest projection
+    dtype : str
+        'float32' or 'float64', None uses the data type set with set_data_dtype
+    backend : str
+        'memory' or 'memmap', None uses the backend set with set_data_backend
+    binning : int
+        projections are averaged over 2**binning x 2**binning pixel blocks on load
+
+    Returns
+    -------
+    estimate: dict
+        bytes of data, original, history and recons, ram (resident total)
+        and scratch (bytes in memory-mapped scratch files)
+    """
+    itemsize = np.dtype(str(dtype) if dtype is not None else _backend['dtype']).itemsize
+    backend = backend or _backend['mode']
+    factor = 2**binning
+    y, x = shape[0]//factor, shape[1]//factor
+    cube = num_channels*num_projections*y*x*itemsize
+    estimate = {'data': cube,
+                'original': cube,
+                'history': (HISTORY_LENGTH + 1)*cube,
+                'recons': num_channels*y*x*x*itemsize}
+    cubes = estimate['data'] + estimate['original'] + estimate['history']
+    if backend == 'memmap':
+        estimate['ram'] = estimate['recons']
+        estimate['scratch'] = cubes
+    else:
+        estimate['ram'] = cubes + estimate['recons']
+        estimate['scratch'] = 0
+    return estimate
+
+
+def memory_options(num_channels, num_projections, shape, available, dtype=None, backend=None):
+    """
+    Changes to the load that bring a session within available memory
+
+    Returns
+    -------
+    options: list
+        (option, value, estimate) for every change that fits on its own:
+        ('dtype', 'float32'), ('backend', 'memmap'), ('binning', level),
+        ('channels', number of channels kept) and ('projections', step between
+        the projections kept), estimate as returned by estimate_session_memory
+    """
+    dtype = str(dtype) if dtype is not None else str(_backend['dtype'])
+    backend = backend or _backend['mode']
+    options = []
+    def fits(option, value, num_channels=num_channels, num_projections=num_projections, dtype=dtype, backend=backend, binning=0):
+        estimate = estimate_session_memory(num_channels, num_projections, shape, dtype, backend, binning)
+        if estimate['ram'] <= available:
+            options.append((option, value, estimate))
+            return True
+        return False
+
+    if dtype != 'float32':
+        fits('dtype', 'float32', dtype='float32')
+    if backend != 'memmap':
+        fits('backend', 'memmap', backend='memmap')
+    for level in (1, 2, 3):
+        if fits('binning', level, binning=level):
+            break
+    for kept in range(num_channels - 1, 0, -1):
+        if fits('channels', kept, num_channels=kept):
+            break
+    for step in range(2, 9):
+        if fits('projections', step, num_projections=-(-num_projections//step)):
+            break
+    return options
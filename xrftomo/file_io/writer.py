@@ -46,456 +46,161 @@ Module for importing raw data files.
 """
 
 from __future__ import (absolute_import, division, print_function, unicode_literals)
-from PyQt5.QtWidgets import *
-import tomopy
 import os
 import numpy as np
-from skimage import io
 import h5py
-import sys
-import xrftomo
-
-
-
-class SaveOptions(object):
-
-	def __init__(self, parent):
-		super(SaveOptions, self).__init__()
-		self.parent = parent
-
-	def save_scatter_plot(self, fig):
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError	
-			if str(savedir).rfind(".png") == -1:
-				savedir = str(savedir) + ".png"
-			print(str(savedir))
-			fig.savefig(savedir)
-		except IOError:
-			print("enter file name")
-		except Exception as e:
-			print(e)
-
-	def save_proj_stack(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			for j in range(data.shape[0]):  # element index
-				img = data[j]
-				io.imsave("{}/{}_proj.tiff".format(savedir,elements[j]), np.float32(img))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_proj_indiv(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			for j in range(data.shape[0]):			#elemen t index
-				subdir = "{}/{}_proj".format(savedir,elements[j])
-				os.mkdir(subdir)
-				for i in range(data.shape[1]):		#angle index
-					indx = "0000"
-					recon_index = indx[:-len(str(i))] + str(i)
-					img = data[j, i]
-					img = img.astype(np.float32)
-					io.imsave("{}/{}_proj_{}.tiff".format(subdir,elements[j],str(recon_index)), np.float32(img))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_proj_npy(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			for j in range(data.shape[0]):  # elemen t index
-				stack = data[j]
-				np.save("{}/{}_proj.npy".format(savedir,elements[j]), np.float32(stack))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_recon_stack(self, recon_dict, savedir = None):
-		try:
-			if savedir == None:
-				savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			for key in recon_dict:  # elemen t index
-				recon = recon_dict[key]
-				io.imsave("{}/{}_recon.tiff".format(savedir,key),np.float32(recon))
-			return
-		except IOError:
-			print("type the header name")
-		except:
-			print("Something went horribly wrong.")
-		pass
-	def save_recon_indiv(self, recon, element, savedir = None, index=-1):
-		try:
-			if savedir == None:
-				savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			if index == -1:
-				subdir = "{}/{}_recon".format(savedir,element)
-				os.mkdir(subdir)
-				for i in range(recon.shape[0]):
-					# recon = tomopy.circ_mask(recon, axis=0)
-					indx = "0000"
-					recon_index = indx[:-len(str(i))] + str(i)
-					io.imsave("{}/{}_recon_{}.tiff".format(subdir, element, str(recon_index)), np.float32(recon[i]))
-
-			else:
-				subdir = "{}/{}_proj".format(savedir,element)
-				os.mkdir(subdir)
-				# recon = tomopy.circ_mask(recon, axis=0)
-				indx = "0000"
-				recon_index = indx[:-len(str(index))]+str(index)
-				io.imsave("{}/{}_recon_{}.tiff".format(subdir, element, str(recon_index)), np.float32(recon[0]))
-
-			return
-		except IOError:
-			print("type the header name")
-		except:
-			print("Something went horribly wrong.")
-		return
-
-	def save_recon_npy(self, recon_dict):
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			# recon = tomopy.circ_mask(recon, axis=0)
-			for key in recon_dict:  # elemen t index
-				recon = recon_dict[key]
-				np.save("{}/{}_recon.npy".format(savedir,key), np.float32(recon))
-			return
-		except IOError:
-			print("type the header name")
-		except:
-			print("Something went horribly wrong.")
-		pass
-	def save_sino_stack(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-
-			sino = np.zeros((data.shape[0], data.shape[2], data.shape[1], data.shape[3]))
-			for i in range(data.shape[0]):
-				for j in range(data.shape[2]):
-					sino[i,j] = data[i,:,j,:]
-			for j in range(sino.shape[0]):  # elemen t index
-				img = sino[j]
-				io.imsave("{}/{}_sino.tiff".format(savedir,elements[j]), np.float32(img))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_sino_indiv(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			sino = np.zeros((data.shape[0], data.shape[2], data.shape[1], data.shape[3]))
-			for i in range(data.shape[0]):
-				for j in range(data.shape[2]):
-					sino[i,j] = data[i,:,j,:]
-			for i in range(sino.shape[0]):  # elemen t index
-				subdir = "{}/{}_sino".format(savedir,elements[i])
-				os.mkdir(subdir)
-				for j in range(sino.shape[1]):  # angle index
-					indx = "0000"
-					recon_index = indx[:-len(str(j))] + str(j)
-					img = sino[i,j]
-					io.imsave("{}/{}_sino_{}.tiff".format(subdir, elements[i], str(recon_index)), np.float32(img))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_sino_npy(self, data, elements):
-		'''
-		save projections as tiffs
-		'''
-		try:
-			savedir = QFileDialog.getExistingDirectory()
-			if savedir == "":
-				raise IOError
-			sino = np.zeros((data.shape[0], data.shape[2], data.shape[1], data.shape[3]))
-			for i in range(data.shape[0]):
-				for j in range(data.shape[2]):
-					sino[i,j] = data[i,:,j,:]
-			for i in range(sino.shape[0]):  # elemen t index
-				stack = sino[i]
-				np.save("{}/{}_sino.npy".format(savedir,elements[i]), np.float32(stack))
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-		pass
-	def save_align_npy(self, fnames, x_shifts, y_shifts):
-		'''
-		3D array [projection, x, y]
-		fnames
-		'''
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-			if str(savedir).rfind(".npy") == -1:
-				savedir = str(savedir) + ".npy"
-			data = np.asarray([fnames, x_shifts,y_shifts])
-			np.save(savedir, data)
-			return
-		except IOError:
-			print("choose file please")
-		except Exception as e:
-			print(e)
-	def save_align_txt(self, fnames, x_shifts, y_shifts):
-		'''
-		3D array [projection, x, y]
-		fnames
-		'''
-		num_files = len(x_shifts)
-		x_shift = list(x_shifts)
-		y_shift = list(y_shifts)
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-
-			if str(savedir).rfind(".txt") == -1:
-				savedir = str(savedir) + ".txt"
-			print(str(savedir))
-			file = open(savedir, "w")
-			file.writelines("rotation axis, \n")
-			for i in range(num_files):
-				file.writelines("{}, {}, {} \n".format(fnames[i], str(x_shift[i]), str(y_shift[i])))
-			file.close()
-			return
-
-		except IOError:
-			print("choose file please")
-		except Exception as e:
-			print(e)
-	def save_thetas_npy(self, fnames, thetas):
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-
-			if str(savedir).rfind(".npy") == -1:
-				savedir = str(savedir) + ".npy"
-			data = np.asarray([fnames, thetas])
-			np.save(savedir, data)
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_thetas_txt(self, fnames, thetas):
-		num_files = len(fnames)
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-			if str(savedir).rfind(".txt") == -1:
-				savedir = str(savedir) + ".txt"
-			file = open(savedir, "w")
-			file.writelines("file names, " + "thetas" + "\n")
-			for i in range(num_files):
-				file.writelines(fnames[i] + ", " + str(thetas[i]) + "\n")
-			file.close()
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
-	def save_hdf5(self, fnames, data, thetas, elements, recon_dict):
-		""" H5
-				elements
-				[fnames,thetas]
-				data[elem,theta,img[y,x]] #
-				recons[elem, slice, img[y,x]]
-		"""
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-			if str(savedir).rfind(".h5") == -1:
-				savedir = str(savedir) + ".h5"
-			with h5py.File(savedir, 'w') as fid:
-				# frst_key = list(recon_dict.keys())[0]
-				# npy_recons = np.zeros((len(recon_dict),recon_dict[frst_key].shape[0], recon_dict[frst_key].shape[1], recon_dict[frst_key].shape[2]))
-				# for i, key in enumerate(recon_dict.keys()):
-				# 	npy_recons[i] = recon_dict[key]
-				fnames = [name.split("/")[-1] for name in fnames]
-				fid.create_dataset('elements', data=elements)
-				fid.create_dataset('names', data=fnames)
-				fid.create_dataset('thetas', data=thetas)
-				fid.create_dataset('data', data=data)
-				# fid.create_dataset('recons', data=npy_recons)
-			fid.close()
-
-		except Exception as error:
-			print(error)
-		pass
-
-	# def save_recon_2npy(self,recon, savedir=None, index=-1):
-	# 	try:
-	# 		if savedir == "":
-	# 			raise IOError
-	# 		if savedir == None:
-	# 			savedir = QFileDialog.getSaveFileName()[0]
-	# 		if index == -1:
-	# 			recon = tomopy.circ_mask(recon, axis=0)
-	# 			np.save(savedir, recon)
-	# 		return
-	# 	except IOError:
-	# 		print("type the header name")
-	# 	except Exception as e:
-	# 		print(e)
-
-	# def save_recon_array_2npy(self, recon_array, savedir=None, index=-1):
-	# 	try:
-	# 		if savedir == "":
-	# 			raise IOError
-	# 		if savedir == None:
-	# 			savedir = QFileDialog.getSaveFileName()[0]
-	# 		if index == -1:
-	# 			np.save(savedir, recon_array)
-	# 		return
-	# 	except IOError:
-	# 		print("type the header name")
-	# 	except Exception as e:
-	# 		print(e)
-
-
-	# def save_sinogram(self, sinodata):
-	# 	'''
-	# 	saves sinogram or array of sinograms for each row
-	# 	'''
-	# 	try:
-	# 		savedir = QFileDialog.getSaveFileName()[0]
-	# 		if savedir == "":
-	# 			raise IOError
-	#
-	# 		os.makedirs(savedir)
-	# 		# temp_img = Image.fromarray(sinodata.astype(np.float32))
-	# 		# temp_img.save(savedir + "/" + "sinogram.tiff")
-	# 		io.imsave(savedir + "/" + "sinogram.tiff", sinodata)
-	# 		return
-	#
-	# 	except IOError:
-	# 		print("type the header name")
-	# 	except Exception as e:
-	# 		print(e)
-
-	# def save_sinogram2(self, data, element_names):
-	# 	'''
-	# 	saves sinogram or array of sinograms for each row
-	# 	'''
-	# 	try:
-	# 		savedir = QFileDialog.getSaveFileName()[0]
-	# 		if savedir == "":
-	# 			raise IOError
-	#
-	# 		os.makedirs(savedir)
-	# 		num_elements = data.shape[0]
-	# 		num_projections = data.shape[1]
-	# 		sinogramData = np.sum(data, axis=2)
-	# 		sinogramData[np.isinf(sinogramData)] = 0.001
-	#
-	# 		for i in range(num_elements):
-	# 			element = element_names[i]
-	# 			# temp_img = Image.fromarray(sinogramData[i].astype(np.float32))
-	# 			# temp_img.save(savedir + "/"+element+"_sinogram.tiff")
-	# 			io.imsave(savedir + "/"+element+"_sinogram.tiff", sinogramData[i])
-	# 		return
-	#
-	# 	except IOError:
-	# 			print("ERROR saving sinogram stack")
-	# 	except Exception as e:
-	# 		print(e)
-	#
-	# 	except IOError:
-	# 			print("ERROR saving sinogram stack")
-	# 	except Exception as e:
-	# 		print(e)
-	#
-	# def save_center_position(self, angle, cen_pos):
-	# 	'''
-	# 	save center pixel position and possibly motor position as a 3D array
-	# 	in order to apply to raw data, first apply the shifts then apply/load
-	# 	center position
-	# 	'''
-	# 	pass
-
-	# def save_motor_position(self, angle, x_pos, y_pos):
-	# # 	'''
-	# # 	save motor positions along with corresponding angle position
-	# # 	'''
-	# 	pass
-
-	# def save_numpy_array(self, data, thetas, elements):
-	#
-	# 	try:
-	# 		savedir = QFileDialog.getSaveFileName()[0]
-	# 		if savedir == "":
-	# 			raise IOError
-	#
-	# 		np.savetxt(savedir+"_elements",elements, delimiter = ",", fmt="%s")
-	# 		np.save(savedir+"_thetas",thetas)
-	# 		np.save(savedir,data)
-	# 		return
-	#
-	# 	except IOError:
-	# 		print("type the header name")
-	# 	except Exception as e:
-	# 		print(e)
-
-	def save_correlation_analysis(self, elements, rMat):
-		num_elements = len(elements)
-		try:
-			savedir = QFileDialog.getSaveFileName()[0]
-			if savedir == "":
-				raise IOError
-
-			if str(savedir).rfind(".txt") == -1:
-				savedir = str(savedir) + ".txt"
-			print(str(savedir))
-			file = open(savedir, "w")
-			file.writelines("elements, " + (', '.join(elements))+ "\n")
-			for i in range(num_elements):
-				file.writelines(str(elements[i]) + ", " + str(list(rMat[i]))[1:-1] + "\n")
-			file.close()
-			return
-		except IOError:
-			print("type the header name")
-		except Exception as e:
-			print(e)
\ No newline at end of file
+import tifffile
+import threading
+import time
+import concurrent.futures
+
+
+SESSION_FORMAT = "xrftomo-session"
+SESSION_VERSION = 1
+
+
+def write_image(fname, image):
+	"""
+	Writes one float32 image or stack, as .npy if the name ends with .npy and TIFF otherwise
+
+	Parameters
+	----------
+	fname : str
+		output file name
+	image : ndarray
+		array or view of any layout, converted to contiguous float32 here
+
+	Returns
+	-------
+	nbytes : int
+		number of bytes written
+	"""
+	image = np.ascontiguousarray(image, dtype=np.float32)
+	if fname.endswith(".npy"):
+		np.save(fname, image)
+	else:
+		tifffile.imwrite(fname, image)
+	return image.nbytes
+
+
+def indiv_jobs(savedir, stacks, names, suffix):
+	"""
+	Yields one (file name, image view) per image of each stack, creating a
+	<savedir>/<name>_<suffix> directory per stack
+
+	Parameters
+	----------
+	stacks : ndarray
+		[stack, image, y, x], typically a transposed view of the data cube
+	names : list
+		one name per stack
+	suffix : str
+		proj, sino or recon
+	"""
+	for i in range(stacks.shape[0]):
+		subdir = "{}/{}_{}".format(savedir, names[i], suffix)
+		os.mkdir(subdir)
+		for j in range(stacks.shape[1]):
+			yield "{}/{}_{}_{}.tiff".format(subdir, names[i], suffix, str(j).zfill(4)), stacks[i, j]
+
+
+def export_images(jobs, workers=None):
+	"""
+	Writes (file name, image) pairs on a pool of threads. Jobs are pulled from
+	the iterable only while fewer than two per thread are waiting, so a lazy
+	iterable of views is never expanded into copies all at once. Conversion to
+	float32 and the writes release the GIL.
+
+	Parameters
+	----------
+	jobs : iterable
+		(file name, ndarray) pairs
+	workers : int
+		number of writer threads, None uses up to 8
+
+	Returns
+	-------
+	nbytes : int
+		number of bytes written
+	"""
+	if workers is None:
+		workers = min(8, os.cpu_count() or 1)
+	slots = threading.BoundedSemaphore(2*workers)
+	futures = []
+	failed = []
+
+	def write_done(future):
+		if future.exception() is not None:
+			failed.append(future)
+		slots.release()
+
+	start = time.time()
+	with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+		for fname, image in jobs:
+			# a failed write stops the export, its error is raised below
+			if failed:
+				break
+			slots.acquire()
+			future = executor.submit(write_image, fname, image)
+			future.add_done_callback(write_done)
+			futures.append(future)
+	nbytes = sum(future.result() for future in futures)
+	seconds = max(time.time() - start, 1e-6)
+	print("exported {} files, {:.1f} MB in {:.1f} s ({:.1f} MB/s)".format(len(futures), nbytes/1e6, seconds, nbytes/1e6/seconds))
+	return nbytes
+
+
+def write_session(fname, fnames, data, thetas, elements, recon_dict=None, x_shifts=None, y_shifts=None):
+	"""
+	Writes a session file. The data cube is chunked per (element, projection)
+	and the volumes per slice, all compressed with lzf, so any single image can
+	be read back without decompressing the rest of the file.
+
+	Layout (version 1):
+		attrs: format, version
+		elements, names, thetas, x_shifts, y_shifts
+		data[element, theta, y, x]
+		recons/<element>[slice, y, x]
+
+	Parameters
+	----------
+	fname : str
+		output file name
+	fnames : list
+		projection file names, only the base names are stored
+	data : ndarray
+		4D array [elements, projection, y, x]
+	thetas : ndarray
+		projection angles
+	elements : list
+		element names
+	recon_dict : dict
+		element name: 3D reconstruction, empty volumes are not written
+	x_shifts, y_shifts : ndarray
+		alignment shifts per projection
+	"""
+	num_projections = data.shape[1]
+	if x_shifts is None:
+		x_shifts = np.zeros(num_projections)
+	if y_shifts is None:
+		y_shifts = np.zeros(num_projections)
+	with h5py.File(fname, 'w') as fid:
+		fid.attrs["format"] = SESSION_FORMAT
+		fid.attrs["version"] = SESSION_VERSION
+		fnames = [name.split("/")[-1] for name in fnames]
+		fid.create_dataset('elements', data=[element.encode("utf-8") for element in elements])
+		fid.create_dataset('names', data=[name.encode("utf-8") for name in fnames])
+		fid.create_dataset('thetas', data=np.asarray(thetas, dtype=np.float64))
+		fid.create_dataset('x_shifts', data=np.asarray(x_shifts))
+		fid.create_dataset('y_shifts', data=np.asarray(y_shifts))
+		dset = fid.create_dataset('data', shape=data.shape, dtype=data.dtype,
+								  chunks=(1, 1) + tuple(data.shape[2:]), compression="lzf")
+		# one element at a time, memory-mapped cubes are never fully resident
+		for i in range(data.shape[0]):
+			dset[i] = data[i]
+		recons = fid.create_group('recons')
+		for key, recon in (recon_dict or {}).items():
+			recon = np.asarray(recon)
+			if recon.ndim != 3 or not recon.any():
+				continue
+			recons.create_dataset(key, data=recon, chunks=(1,) + recon.shape[1:], compression="lzf")
@@ -38,7 +38,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.    #
 ###########################################################################
 import numpy as np
-from PyQt5 import QtGui, QtWidgets, QtCore
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import *
 
 
@@ -51,8 +51,6 @@ from skimage import measure
 from matplotlib.pyplot import *
 from scipy import ndimage as ndi
 from skimage.morphology import remove_small_objects
-from skimage import io
-import h5py
 import os
 import subprocess
 
@@ -71,6 +69,10 @@ class xrftomoGui(QMainWindow):
         self.params = params
         self.param_list = {}
         self.app = app
+        xrftomo.set_data_backend(params.data_backend, params.scratch_path)
+        xrftomo.set_data_dtype(params.data_dtype)
+        self.oplog = xrftomo.OperationLog()
+        self.oplog_history = []
         # self.get_values_from_params()
         self.initUI()
         sys.stdout = Stream(newText=self.onUpdateText)
@@ -219,9 +221,10 @@ class xrftomoGui(QMainWindow):
         self.tab_widget.setTabEnabled(4,False)
 
         # self.tab_widget.currentChanged.connect(self.onTabChanged)
-        #TODO: Run in separate thread
-        # change save data to memory to "click to cancel" while thread is running.
+        # files are read on a worker thread, clicking again while loading cancels it.
         self.fileTableWidget.saveDataBtn.clicked.connect(self.updateImages)
+        self.fileTableWidget.dataLoadedSig.connect(self.onDataLoaded)
+        self.fileTableWidget.dataAppendedSig.connect(self.onDataAppended)
 
         self.vl.addWidget(self.tab_widget)
         self.vl.addWidget(self.message_window)
@@ -374,6 +377,12 @@ class xrftomoGui(QMainWindow):
         h5_save.addAction(self.all_hdf5)
         self.all_hdf5.triggered.connect(self.save_hdf5)
 
+        oplog_save = QMenu("operations", self)
+        ag = QActionGroup(oplog_save)
+        self.oplog_json = ag.addAction(QAction('operations.json', oplog_save))
+        oplog_save.addAction(self.oplog_json)
+        self.oplog_json.triggered.connect(self.save_oplog)
+
         self.afterConversionMenu = menubar.addMenu(' &Save')
         self.afterConversionMenu.addMenu(projections_save)
         self.afterConversionMenu.addMenu(recon_save)
@@ -381,6 +390,7 @@ class xrftomoGui(QMainWindow):
         self.afterConversionMenu.addMenu(align_save)
         self.afterConversionMenu.addMenu(thetas_save)
         self.afterConversionMenu.addMenu(h5_save)
+        self.afterConversionMenu.addMenu(oplog_save)
         # self.afterConversionMenu.addAction(self.saveThetasAction)
         # self.afterConversionMenu.addAction(self.saveToNumpyAction)
         # self.afterConversionMenu.addAction(self.saveCorrAnalysisAction)
@@ -1844,17 +1854,18 @@ class xrftomoGui(QMainWindow):
         if file == []:
             print("check file extension")
             return
-        img = h5py.File(file, 'r')
-        fnames = img["names"]
-        data = img["data"]
-        elements = img["elements"]
-        thetas = [float(theta) for theta in list(img["thetas"])]
-        # recons = img["recons"]
-
-        self.fnames = [fname.decode("utf-8").split("/")[-1] for fname in list(fnames)]
-        self.data = np.array(data)
-        self.elements = [element.decode("utf-8") for element in list(elements)]
-        self.thetas = np.array(thetas)
+        try:
+            session = xrftomo.read_session(file)
+        except Exception as error:
+            print(error)
+            print("not a session file")
+            return
+        self.fnames = session["fnames"]
+        self.elements = session["elements"]
+        self.thetas = session["thetas"]
+        thetas = list(self.thetas)
+        #the cube and volumes are decompressed into the data backend chunk by chunk
+        self.data = xrftomo.load_dataset(session["data"])
 
         self.tab_widget.setTabEnabled(1, False)
         self.tab_widget.setTabEnabled(2, False)
@@ -1865,15 +1876,18 @@ class xrftomoGui(QMainWindow):
         self.toolsMenu.setDisabled(True)
 
         self.update_data(self.data)
-        # self.recon_dict = {}
-        # for i, element in enumerate(self.elements):
-        #     self.recon_dict[element] = recons[i]
+        self.recon_dict = {}
+        for element in self.elements:
+            if element in session["recons"]:
+                self.recon_dict[element] = xrftomo.load_dataset(session["recons"][element])
+            else:
+                self.recon_dict[element] = np.zeros((self.data.shape[2],self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
+        x_shifts, y_shifts = session["x_shifts"], session["y_shifts"]
+        session["file"].close()
 
         self.updateImages(True)
-        # self.reconstructionWidget.recon_dict = self.recon_dict
-        # self.reconstructionWidget.recon = recons[0]
-        # self.laminographyWidget.recon_dict = self.recon_dict
-        # self.laminographyWidget.recon = recons[0]
+        self.update_alignment(x_shifts, y_shifts)
+        self.update_recon_dict(self.recon_dict)
         self.fileTableWidget.fileTableModel.update_fnames(self.fnames)
         self.fileTableWidget.fileTableModel.update_thetas(thetas)
         self.fileTableWidget.fileTableView.sortByColumn(1, 0)
@@ -1914,10 +1928,7 @@ class xrftomoGui(QMainWindow):
         file = QFileDialog.getOpenFileName(self, "Open Theta.txt", QtCore.QDir.currentPath(), "tiff (*.tiff)" )
         if file[0] == '':
             return
-        im = io.imread(file[0])
-        data = np.zeros([1, im.shape[0], im.shape[1], im.shape[2]])
-        data[0] = im
-        self.data = data
+        self.data = xrftomo.read_tiff_stack(file[0])
         self.fnames = ["file_{}".format(i) for i in range(self.data.shape[1])]
         self.tab_widget.setTabEnabled(1, False)
         self.tab_widget.setTabEnabled(2, False)
@@ -2119,7 +2130,10 @@ class xrftomoGui(QMainWindow):
         self.writer.save_thetas_txt(self.fnames, self.thetas)
 
     def save_hdf5(self):
-        self.writer.save_hdf5(self.fnames, self.data, self.thetas, self.elements, self.recon_dict)
+        self.writer.save_hdf5(self.fnames, self.data, self.thetas, self.elements, self.recon_dict, self.x_shifts, self.y_shifts)
+
+    def save_oplog(self):
+        self.writer.save_oplog(self.oplog)
 
     def saveCorrAlsys(self):
         try:
@@ -2216,6 +2230,11 @@ class xrftomoGui(QMainWindow):
     # def reset_widgets(self):
 
     def updateImages(self, from_open=False):
+        if not from_open:
+            # data is read on a worker thread, onDataLoaded comes back here once it is in memory
+            self.fileTableWidget.onSaveDataInMemory()
+            return
+
         self.prevTab = self.tab_widget.currentIndex()
         self.data_history = []
         self.x_shifts_history = []
@@ -2223,33 +2242,15 @@ class xrftomoGui(QMainWindow):
         self.theta_history = []
         self.fname_history = []
         # self.centers_history = []
-
-        if not from_open:
-            self.app.setOverrideCursor(QtGui.QCursor(QtCore.Qt.WaitCursor))
-            self.data, self.elements, self.thetas, self.fnames = self.fileTableWidget.onSaveDataInMemory()
-            #create empty recon_dict here
-            self.recon_dict = {}
-            for element in self.elements:
-                self.recon_dict[element] = np.zeros((self.data.shape[2],self.data.shape[3],self.data.shape[3]))
-            #populate scatter plot combo box windows
-            self.first_run = True
-
-            self.app.restoreOverrideCursor()
-
-            if len(self.data) == 0:
-                return
-            if len(self.elements) == 0:
-                return
-            if len(self.thetas) == 0:
-                return
-            if len(self.fnames) == 0:
-                return
-            self.updateScatter()
+        self.oplog_history = []
+        self.oplog.clear({"input_path": self.params.input_path,
+                          "elements": list(self.elements),
+                          "shape": list(self.data.shape)})
 
         self.centers = [100,100,self.data.shape[3]//2]
         self.x_shifts = np.zeros(self.data.shape[1], dtype="int")
         self.y_shifts = np.zeros(self.data.shape[1], dtype="int")
-        self.original_data = self.data.copy()
+        self.original_data = xrftomo.copy_data(self.data)
         self.original_fnames = self.fnames.copy()
         self.original_thetas = self.thetas.copy()
 
@@ -2277,6 +2278,44 @@ class xrftomoGui(QMainWindow):
         self.update_alignment(self.x_shifts, self.y_shifts)
         self.refreshUI()
 
+    def onDataLoaded(self, data, elements, thetas, fnames):
+        self.data, self.elements, self.thetas, self.fnames = data, elements, thetas, fnames
+        #create empty recon_dict here
+        self.recon_dict = {}
+        for element in self.elements:
+            self.recon_dict[element] = np.zeros((self.data.shape[2],self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
+        #populate scatter plot combo box windows
+        self.first_run = True
+
+        if len(self.data) == 0:
+            return
+        if len(self.elements) == 0:
+            return
+        if len(self.thetas) == 0:
+            return
+        if len(self.fnames) == 0:
+            return
+        self.updateScatter()
+        self.updateImages(True)
+
+    def onDataAppended(self, data, thetas, fnames):
+        #projections written since the last load, from the file table's watch mode
+        if self.data is None or len(self.data.shape) != 4 or data.shape[0] != self.data.shape[0]:
+            print("new files do not match the loaded data, reload to include them")
+            return
+        num_new = data.shape[1]
+        index = self.imageProcessWidget.sld.value()
+        self.original_data = xrftomo.append_projections(self.original_data, data)
+        self.original_thetas = np.append(self.original_thetas, thetas)
+        self.original_fnames = list(self.original_fnames) + list(fnames)
+        self.update_data(xrftomo.append_projections(self.data, data))
+        self.update_theta(index, np.append(self.thetas, thetas))
+        self.update_filenames(list(self.fnames) + list(fnames), index)
+        self.update_alignment(np.append(self.x_shifts, np.zeros(num_new, dtype="int")),
+                              np.append(self.y_shifts, np.zeros(num_new, dtype="int")))
+        self.update_slider_range(self.thetas)
+        print("{} new projections appended, {} in total".format(num_new, self.data.shape[1]))
+
     def refreshUI(self):
         # try:
         #     self.tab_widget.currentChanged.disconnect()
@@ -2352,12 +2391,13 @@ class xrftomoGui(QMainWindow):
         self.update_filenames(self.fnames, index)
         self.update_alignment(self.x_shifts, self.y_shifts)
 
-        self.data_history.append(data.copy())
+        self.data_history.append(xrftomo.copy_data(data))
         self.theta_history.append(self.thetas.copy())
         self.x_shifts_history.append(self.x_shifts.copy())
         self.y_shifts_history.append(self.y_shifts.copy())
         # self.centers_history.append(self.centers.copy())
         self.fname_history.append(self.fnames.copy())
+        self.oplog_history.append(len(self.oplog))
         print('history save event: ', len(self.data_history))
 
         if len(self.data_history) > 10:
@@ -2367,6 +2407,7 @@ class xrftomoGui(QMainWindow):
             del self.y_shifts_history[0]
             # del self.centers[0]
             del self.fname_history[0]
+            del self.oplog_history[0]
         return
 
     def update_recon(self, recon):
@@ -2485,8 +2526,10 @@ class xrftomoGui(QMainWindow):
                 del self.y_shifts_history[-1]
                 del self.theta_history[-1]
                 del self.fname_history[-1]
+                del self.oplog_history[-1]
                 # del self.centers_history[-1]
-                self.data = self.data_history[-1].copy()
+                self.oplog.truncate(self.oplog_history[-1])
+                self.data = xrftomo.copy_data(self.data_history[-1])
                 self.x_shifts = self.x_shifts_history[-1].copy()
                 self.y_shifts = self.y_shifts_history[-1].copy()
                 self.thetas = self.theta_history[-1].copy()
@@ -2511,7 +2554,7 @@ class xrftomoGui(QMainWindow):
     def restore(self):
         try:
             num_projections = self.original_data.shape[1]
-            self.data = self.original_data.copy()
+            self.data = xrftomo.copy_data(self.original_data)
             self.thetas = self.original_thetas.copy()
             self.fnames = self.original_fnames.copy()
             self.x_shifts = np.zeros(self.data.shape[1], dtype="int")
@@ -2523,6 +2566,7 @@ class xrftomoGui(QMainWindow):
             # TODO: reset tomography/lami/recon data
             self.sinogramWidget.x_padding_hist = [0]
             self.sinogramWidget.y_padding_hist = [0]
+            self.oplog.clear(self.oplog.source)
             self.update_history(self.data)
             self.sinogramWidget.ySizeChanged(self.data.shape[2])
             self.reconstructionWidget.reset_recons()
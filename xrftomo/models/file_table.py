@@ -155,6 +155,17 @@ class FileTableModel(QtCore.QAbstractTableModel):
         self.layoutChanged.emit()
         self.dataChanged.emit(topLeft, bottomRight)
 
+    def append_fnames(self, fnames, thetas, use=True):
+        for i in range(len(fnames)):
+            item = TableArrayItem(fnames[i])
+            item.theta = thetas[i]
+            item.use = use
+            self.arrayData += [item]
+        topLeft = self.index(0, 0)
+        bottomRight = self.index(len(self.arrayData), len(self.columns))
+        self.layoutChanged.emit()
+        self.dataChanged.emit(topLeft, bottomRight)
+
     def update_thetas(self, thetas):
         topLeft = self.index(0, 1)
         bottomRight = self.index(len(self.arrayData), 1)
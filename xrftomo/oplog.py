@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+###########################################################################
+
+"""
+Record of the operations applied to a dataset in the gui and the engine that
+replays them headlessly. Every entry keeps the parameters the action was run
+with, so a session tuned on one sample can be applied to another dataset or to
+the full resolution original.
+"""
+
+import json
+import numpy as np
+import tomopy
+from xrftomo.file_io.storage import allocate_data
+from xrftomo.prep.shift import shift_projection, shift_projections
+
+__author__ = "Fabricio Marin"
+__copyright__ = "Copyright (c) 2020, UChicago Argonne, LLC."
+__version__ = "0.0.1"
+__docformat__ = 'restructuredtext en'
+__all__ = ['OPLOG_FORMAT',
+           'OPLOG_VERSION',
+           'OPERATIONS',
+           'OperationLog',
+           'replay_operations',
+           'reconstruct_slices']
+
+OPLOG_FORMAT = "xrftomo-oplog"
+OPLOG_VERSION = 1
+
+#tomopy algorithm and keyword arguments for each entry of the reconstruction method combo box
+RECON_METHODS = {0: ('mlem', ('center', 'num_iter')),
+                 1: ('gridrec', ('center',)),
+                 2: ('art', ('num_iter',)),
+                 3: ('pml_hybrid', ('center', 'reg_par', 'num_iter')),
+                 4: ('pml_quad', ('center', 'reg_par', 'num_iter')),
+                 5: ('fbp', ()),
+                 6: ('sirt', ('num_iter',)),
+                 7: ('tv', ('center', 'reg_par', 'num_iter'))}
+
+
+class OperationLog(object):
+    """
+    Ordered list of operations, serialisable to JSON.
+
+    Each operation is a dict {"op": name, "params": {...}} where name is a key
+    of OPERATIONS and params are the keyword arguments it is replayed with.
+    """
+
+    def __init__(self, source=None, operations=None):
+        self.source = source or {}
+        self.operations = operations or []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def record(self, op, **params):
+        if op not in OPERATIONS:
+            raise ValueError("unknown operation: {}".format(op))
+        self.operations.append({"op": op, "params": {key: to_json_value(value) for key, value in params.items()}})
+
+    def truncate(self, length):
+        del self.operations[length:]
+
+    def clear(self, source=None):
+        self.source = source or {}
+        self.operations = []
+
+    def to_json(self):
+        return json.dumps({"format": OPLOG_FORMAT,
+                           "version": OPLOG_VERSION,
+                           "source": self.source,
+                           "operations": self.operations}, indent=1)
+
+    @classmethod
+    def from_json(cls, text):
+        content = json.loads(text)
+        if content.get("format") != OPLOG_FORMAT:
+            raise ValueError("not an xrftomo operation log")
+        if content.get("version", 0) > OPLOG_VERSION:
+            raise ValueError("operation log version {} is newer than this xrftomo".format(content["version"]))
+        operations = content.get("operations", [])
+        unknown = [operation["op"] for operation in operations if operation["op"] not in OPERATIONS]
+        if unknown:
+            raise ValueError("unknown operations: {}".format(", ".join(unknown)))
+        return cls(content.get("source", {}), operations)
+
+    def save(self, fname):
+        with open(fname, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname) as f:
+            return cls.from_json(f.read())
+
+
+def to_json_value(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    return value
+
+
+def replay_operations(oplog, data, elements, thetas, fnames, x_shifts=None, y_shifts=None, scale=1.0, progress=None, ncore=None):
+    """
+    Applies every operation of oplog to a dataset
+
+    Parameters
+    ----------
+    oplog : OperationLog
+        operations recorded in the gui
+    data : ndarray
+        4D array [elements, projection, y, x], modified in place where possible
+    elements : list
+        element names, used to find the elements an operation refers to
+    thetas : ndarray
+        projection angles in degrees
+    fnames : list
+        file names of the projections
+    x_shifts, y_shifts : ndarray, optional
+        alignment already applied to data, zeros by default
+    scale : float
+        ratio between the pixel size of the recorded dataset and of this one,
+        pixel shifts and regions are multiplied by it
+    progress : callable, optional
+        called as progress(operations_done, num_operations, op)
+    ncore : int, optional
+        threads used by tomopy and the alignment shifts, all cores by default
+
+    Returns
+    -------
+    state : dict
+        data, elements, thetas, fnames, x_shifts, y_shifts and recons, a dict
+        of reconstructed volumes by element name
+    """
+    num_projections = data.shape[1]
+    state = {"data": data,
+             "elements": list(elements),
+             "thetas": np.asarray(thetas),
+             "fnames": list(fnames),
+             "x_shifts": np.zeros(num_projections) if x_shifts is None else np.asarray(x_shifts, dtype=float),
+             "y_shifts": np.zeros(num_projections) if y_shifts is None else np.asarray(y_shifts, dtype=float),
+             "recons": {},
+             "ncore": ncore}
+    for i, operation in enumerate(oplog.operations):
+        OPERATIONS[operation["op"]](state, scale, **operation["params"])
+        if progress is not None:
+            progress(i + 1, len(oplog), operation["op"])
+    return state
+
+
+def shift(state, scale, index, x, y):
+    """
+    Keyboard shift of one projection, or of the whole stack when index is None
+    """
+    data = state["data"]
+    indexes = range(data.shape[1]) if index is None else [index]
+    for i in indexes:
+        shift_projection(data, x*scale, y*scale, i)
+        state["x_shifts"][i] += x*scale
+        state["y_shifts"][i] -= y*scale
+
+
+def align(state, scale, method, x_shifts, y_shifts=None, interpolation="spline"):
+    """
+    Shifts found by an alignment method. With spline interpolation they are
+    applied as SinogramActions.shift_all does, with linear interpolation as the
+    tomopy based methods apply them, one shiftProjection per projection.
+    """
+    data = state["data"]
+    x_shifts = np.asarray(x_shifts, dtype=float)*scale
+    y_shifts = np.zeros_like(x_shifts) if y_shifts is None else np.asarray(y_shifts, dtype=float)*scale
+    if len(x_shifts) != data.shape[1]:
+        raise ValueError("{} alignment has {} shifts for {} projections".format(method, len(x_shifts), data.shape[1]))
+    if interpolation == "linear":
+        shift_projections(data, x_shifts, y_shifts)
+    else:
+        shift_projections(data, x_shifts, -y_shifts, method="spline", workers=state["ncore"])
+    state["x_shifts"] += x_shifts
+    state["y_shifts"] += y_shifts
+
+
+def cut(state, scale, x_pos, y_pos, x_size, y_size):
+    """
+    Crop to a region given in plot coordinates, y measured from the bottom of the frame
+    """
+    data = state["data"]
+    frame_height = data.shape[2]
+    y0 = int(round(y_pos*scale))
+    y1 = y0 + int(round(y_size*scale))
+    x0 = int(round(x_pos*scale))
+    x1 = x0 + int(round(x_size*scale))
+    cropped = allocate_data([data.shape[0], data.shape[1], y1 - y0, x1 - x0])
+    cropped[:] = data[:, :, frame_height - y1:frame_height - y0, x0:x1]
+    state["data"] = cropped
+
+
+def pad(state, scale, x, y, clip_edges=0):
+    """
+    Zero padding on both sides of every projection, applied to the unaligned
+    data as ImageProcessActions.padData does. Shifts larger than the unpadded
+    frame are folded back by its size before they are reapplied, as
+    ImageProcessWidget.pad_params does.
+    """
+    data = state["data"]
+    x = int(round(x*scale))
+    y = int(round(y*scale))
+    clip = int(round(clip_edges*scale))
+    x_shifts = state["x_shifts"]
+    y_shifts = state["y_shifts"]
+    shift_projections(data, -x_shifts, -y_shifts)
+    padded = allocate_data([data.shape[0], data.shape[1], data.shape[2] + 2*y, data.shape[3] + 2*x])
+    padded[:, :, y:y + data.shape[2], x + clip:x + data.shape[3] - clip] = data[:, :, :, clip:data.shape[3] - clip]
+    x_shifts[x_shifts > data.shape[3]] -= data.shape[3]
+    y_shifts[y_shifts > data.shape[2]] -= data.shape[2]
+    shift_projections(padded, x_shifts, y_shifts)
+    state["data"] = padded
+
+
+def exclude(state, scale, index):
+    """
+    Drops one projection together with its angle, file name and shifts
+    """
+    state["data"] = np.delete(state["data"], index, 1)
+    state["thetas"] = np.delete(state["thetas"], index, 0)
+    state["x_shifts"] = np.delete(state["x_shifts"], index, 0)
+    state["y_shifts"] = np.delete(state["y_shifts"], index, 0)
+    state["fnames"].pop(index)
+
+
+def downsample(state, scale):
+    state["data"] = state["data"][:, :, ::2, ::2]
+
+
+def invert(state, scale, element):
+    data = state["data"]
+    element = element_index(state, element)
+    projection_stack = data[element]
+    max_val = projection_stack.max()
+    data[element] = abs(projection_stack + (projection_stack == 0)*max_val - max_val)
+
+
+def reconstruct(state, scale, elements, method, beta, delta, iters, top_row, bottom_row, center=None):
+    """
+    Reconstructs the rows between the top and bottom row fields of the
+    reconstruction tab into state["recons"], rows ordered as the tab does
+    """
+    data = state["data"]
+    frame_height = data.shape[2]
+    y0 = max(0, frame_height - int(round(bottom_row*scale)))
+    y1 = frame_height - int(round(top_row*scale))
+    if center is not None:
+        center = center*scale
+    for name in elements:
+        stack = data[element_index(state, name), :, y0:y1][:, ::-1]
+        state["recons"][name] = reconstruct_slices(stack, state["thetas"], method, beta, delta, iters, center, state["ncore"])
+
+
+def reconstruct_slices(stack, thetas, method, beta, delta, iters, center=None, ncore=None):
+    """
+    Reconstructs a block of rows with a method of the reconstruction tab. The
+    gui and replay both reconstruct through here, so a logged reconstruction
+    gives the same volume when it is replayed.
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, row, x]
+    thetas : ndarray
+        projection angles in degrees
+    method : int
+        index of the reconstruction method combo box, see RECON_METHODS
+    beta, delta : float
+        regularization parameters of pml_hybrid, pml_quad and tv
+    iters : int
+        iterations of the iterative methods, all run in a single tomopy call
+    center : float, optional
+        rotation axis, the middle of the rows by default
+    ncore : int, optional
+        threads used by tomopy, all cores by default
+
+    Returns
+    -------
+    ndarray: ndarray
+        3D array [row, x, x], float32
+    """
+    stack = np.array(stack, dtype=np.float32)
+    stack[~np.isfinite(stack)] = 1
+    if center is None:
+        center = stack.shape[2]/2
+    algorithm, options = RECON_METHODS[method]
+    kwargs = {'center': np.array(center, dtype=np.float32),
+              'num_iter': iters,
+              'reg_par': np.array([beta, delta], dtype=np.float32)}
+    kwargs = {key: kwargs[key] for key in options}
+    recon = tomopy.recon(stack, np.asarray(thetas)*np.pi/180, algorithm=algorithm, ncore=ncore, **kwargs)
+    recon = tomopy.remove_nan(recon)
+    if algorithm in ('gridrec', 'art'):
+        recon = recon/1.49
+    if np.isinf(recon).any():
+        print("WARNING: inf values found in reconstruction, consider reconstructing with less iterations")
+        print("inf values replaced with 0.001")
+        recon[recon == np.inf] = 0.001
+    return recon
+
+
+def element_index(state, element):
+    if isinstance(element, str):
+        if element not in state["elements"]:
+            raise ValueError("element {} is not in the dataset".format(element))
+        return state["elements"].index(element)
+    return element
+
+
+OPERATIONS = {'shift': shift,
+              'align': align,
+              'cut': cut,
+              'pad': pad,
+              'exclude': exclude,
+              'downsample': downsample,
+              'invert': invert,
+              'reconstruct': reconstruct}
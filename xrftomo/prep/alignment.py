@@ -40,19 +40,16 @@
 
 
 import numpy as np
-from scipy.fftpack import fft2, ifft2
-from scipy import optimize
 from skimage.feature import match_template
+from xrftomo.prep.register import correlate_neighbours
+from xrftomo.prep.sinusoid import fit_sinusoids, sinusoid
 
 
 
 
 def fitCenterOfMass(x, center_of_mass):
-    fit_func = lambda p, x: p[0] * np.sin(2 * np.pi / 360 * (x - p[1])) + p[2]
-    err_func = lambda p, x, y: fit_func(p, x) - y
-    p0 = [100, 100, 100]
-    p1, success = optimize.leastsq(err_func, p0[:], args=(x, center_of_mass))
-    ##centerOfMassDiff = fit_func(p1, x) - self.center_of_mass
+    p1 = fit_sinusoids(x, center_of_mass, robust=True)
+    ##centerOfMassDiff = sinusoid(p1, x) - self.center_of_mass
     return p1
 
 
@@ -60,7 +57,7 @@ def runCenterOfMass(projections, data, center_of_mass_element, theta, center_of_
     '''
     find center of mass with self.centerOfMass and fit the curve with self.fitCenterOfMass
     '''
-    centerOfMass(projections, data, center_of_mass_element)
+    center_of_mass = centerOfMass(projections, data, center_of_mass_element)
     return fitCenterOfMass(theta, center_of_mass)
 
 
@@ -83,11 +80,8 @@ def fitCenterOfMass2(x, center_of_mass):
     center_of_mass: ndarray
           The position of center of mass
     '''
-    fit_func = lambda p, x: p[0] * np.sin(2 * np.pi / 360 * (x - p[1])) + p[2]
-    err_func = lambda p, x, y: fit_func(p, x) - y
-    p0 = [100, 100]
-    p2, success = optimize.leastsq(err_func, p0[:], args=(x, center_of_mass))
-    centerOfMassDiff = fit_func(p2, x) - center_of_mass
+    p2 = fit_sinusoids(x, center_of_mass, robust=True)
+    centerOfMassDiff = sinusoid(p2, x) - center_of_mass
     return centerOfMassDiff
 
 
@@ -97,18 +91,12 @@ def runCenterOfMass2(projections, data, thickness, theta, sino_value, comelem):
     self.center_of_mass: center of mass vector
     self.comelem: the element chosen for center of mass
     '''
-    center_of_mass = np.zeros(projections)
-    temp = np.zeros(data.shape[3])
-    temp2 = np.zeros(data.shape[3])
-    for i in np.arange(projections):
-        temp = sum(data[comelem, i, sino_value - thickness / 2:sino_value + thickness / 2,:] - data[comelem, i, :10, :10].mean(), axis=0)
-        # temp=sum(self.data[self.comelem,i,:,:]-1, axis=0)
-        numb2 = sum(temp)
-        for j in np.arange(data.shape[3]):
-            temp2[j] = temp[j] * j
-        numb = float(sum(temp2)) / numb2
-        center_of_mass[i] = numb
-    return fitCenterOfMass(x=theta)
+    rows = slice(int(sino_value - thickness // 2), int(sino_value + thickness // 2))
+    stack = data[comelem, :projections]
+    # column profiles of the slab with the mean of the top left 10x10 corner taken as background
+    temp = (stack[:, rows] - stack[:, :10, :10].mean(axis=(1, 2))[:, None, None]).sum(axis=1)
+    center_of_mass = temp @ np.arange(data.shape[3]) / temp.sum(axis=1)
+    return fitCenterOfMass(theta, center_of_mass)
 
 
 def centerOfMass(projections, data, comelem):
@@ -116,17 +104,10 @@ def centerOfMass(projections, data, comelem):
     self.center_of_mass: center of mass vector
     self.comelem: the element chosen for center of mass
     '''
-    center_of_mass = np.zeros(projections)
-    temp = np.zeros(data.shape[3])
-    temp2 = np.zeros(data.shape[3])
-    for i in np.arange(projections):
-        temp = sum(data[comelem, i, :, :] - data[comelem, i, :10, :10].mean(), axis=0)
-        # temp=sum(self.data[self.comelem,i,:,:]-1, axis=0)
-        numb2 = sum(temp)
-        for j in np.arange(data.shape[3]):
-            temp2[j] = temp[j] * j
-        numb = float(sum(temp2)) / numb2
-        center_of_mass[i] = numb
+    stack = data[comelem, :projections]
+    # column profiles with the mean of the top left 10x10 corner taken as background
+    temp = (stack - stack[:, :10, :10].mean(axis=(1, 2))[:, None, None]).sum(axis=1)
+    center_of_mass = temp @ np.arange(data.shape[3]) / temp.sum(axis=1)
     return center_of_mass
 
 
@@ -237,18 +218,8 @@ def crossCorrelate(image1, image2):
         :param image2: 2d array
         :return:
     '''
-    fft_array1 = fft2(image1)
-    fft_array2 = fft2(image2)
-
-    shape = image1.shape
-    c = abs(ifft2(fft_array1 * fft_array2.conjugate()))
-    t0, t1 = np.unravel_index(np.argmax(c), image1.shape)
-    if t0 > shape[0] // 2:
-        t0 -= shape[0]
-    if t1 > shape[1] // 2:
-        t1 -= shape[1]
-
-    return t0, t1
+    t0, t1 = correlate_neighbours(np.stack((image1, image2)))
+    return t0[0], t1[0]
 
 
 def phaseCorrelate(image1, image2):
@@ -258,17 +229,8 @@ def phaseCorrelate(image1, image2):
     :param image2: 2d array
     :return:
     '''
-    fft_array1 = fft2(image1)
-    fft_array2 = fft2(image2)
-
-    shape = image1.shape
-    c = abs(ifft2(fft_array1 * fft_array2.conjugate() / (abs(fft_array1) * abs(fft_array2))))
-    t0, t1 = np.unravel_index(np.argmax(c), image1.shape)
-    if t0 > shape[0] // 2:
-        t0 -= shape[0]
-    if t1 > shape[1] // 2:
-        t1 -= shape[1]
-    return t0, t1
+    t0, t1 = correlate_neighbours(np.stack((image1, image2)), phase=True)
+    return t0[0], t1[0]
 
 
 def edgegauss(imagey, sigma=4):
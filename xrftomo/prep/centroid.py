@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+
+"""
+Stack level thresholding and centroids. Every function takes a [projection,
+y, x] stack and returns one value per projection, computed with a few array
+reductions instead of a Python loop over projections.
+"""
+
+import numpy as np
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['threshold_otsu_stack',
+           'weighted_centroids']
+
+
+def threshold_otsu_stack(stack, nbins=256):
+    """
+    Otsu threshold of every projection, as skimage.filters.threshold_otsu
+    computes it from a histogram spanning the projection's own value range
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x]
+    nbins : int
+        histogram bins per projection
+
+    Returns
+    -------
+    ndarray: ndarray
+        threshold of each projection; a constant projection returns its value
+    """
+    num_projections = stack.shape[0]
+    values = stack.reshape(num_projections, -1)
+    low = values.min(axis=1)
+    high = values.max(axis=1)
+    span = np.where(high > low, high - low, 1)
+    edges = low[:, None] + span[:, None]*np.linspace(0, 1, nbins + 1)[None]
+
+    # bin index of every pixel, corrected at the edges the way np.histogram does
+    index = ((values - low[:, None])*(nbins/span)[:, None]).astype(np.intp)
+    np.clip(index, 0, nbins - 1, out=index)
+    index -= values < np.take_along_axis(edges, index, axis=1)
+    index += (values >= np.take_along_axis(edges, index + 1, axis=1)) & (index != nbins - 1)
+    index += np.arange(num_projections)[:, None]*nbins
+    hist = np.bincount(index.ravel(), minlength=num_projections*nbins).reshape(num_projections, nbins).astype(float)
+
+    centers = (edges[:, :-1] + edges[:, 1:])/2
+    weight1 = np.cumsum(hist, axis=1)
+    weight2 = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean1 = np.cumsum(hist*centers, axis=1)/weight1
+        mean2 = (np.cumsum((hist*centers)[:, ::-1], axis=1)/weight2[:, ::-1])[:, ::-1]
+    variance = weight1[:, :-1]*weight2[:, 1:]*(mean1[:, :-1] - mean2[:, 1:])**2
+    thresholds = np.take_along_axis(centers, np.nanargmax(np.nan_to_num(variance, nan=-1), axis=1)[:, None], axis=1)[:, 0]
+    return np.where(high > low, thresholds, low)
+
+
+def weighted_centroids(stack, mask=None):
+    """
+    Intensity weighted centroid of every projection, optionally restricted to
+    a mask such as stack > threshold_otsu_stack(stack)[:, None, None]
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x]
+    mask : ndarray, optional
+        boolean array of the same shape, pixels taking part in the centroid
+
+    Returns
+    -------
+    ndarray: ndarray
+        y centroid of each projection, nan where the weights sum to zero
+    ndarray: ndarray
+        x centroid of each projection
+    """
+    weights = stack if mask is None else np.where(mask, stack, 0)
+    rows = weights.sum(axis=2, dtype=float)
+    total = rows.sum(axis=1)
+    columns = weights.sum(axis=1, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = rows @ np.arange(stack.shape[1])/total
+        x = columns @ np.arange(stack.shape[2])/total
+    return y, x
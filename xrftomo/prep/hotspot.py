@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+
+"""
+Hotspot localisation and tracking. The ROI patches of all projections are
+gathered with one fancy index and their sub-pixel centres estimated together;
+the iterative Gaussian fit is an opt-in refinement run on a thread pool.
+Tracking follows a hotspot clicked in one projection through the stack.
+"""
+
+import os
+import numpy as np
+from scipy import optimize
+from concurrent.futures import ThreadPoolExecutor
+from skimage.feature import match_template
+from xrftomo.prep.centroid import weighted_centroids
+from xrftomo.prep.sinusoid import fit_sinusoids, sinusoid
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['HOTSPOT_METHODS',
+           'extract_patches',
+           'locate_hotspots',
+           'track_hotspot']
+
+HOTSPOT_METHODS = ('parabola', 'moments', 'gaussian')
+
+
+def extract_patches(stack, x_pos, y_pos, x_size, y_size, indexes=None):
+    """
+    Gathers the ROI around every hotspot position
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x]
+    x_pos, y_pos : ndarray
+        ROI centre of each projection, y measured from the bottom of the frame
+        as the gui reports it; the ROI must lie inside the frame
+    x_size, y_size : int
+        ROI size, rounded down to even
+    indexes : array_like, optional
+        projections the positions belong to, every projection by default
+
+    Returns
+    -------
+    ndarray: ndarray
+        [projection, y_size//2*2, x_size//2*2] patches, float
+    """
+    num_y = stack.shape[1]
+    rows = (num_y - np.asarray(y_pos, dtype=int) - y_size//2)[:, None] + np.arange(y_size//2*2)
+    cols = (np.asarray(x_pos, dtype=int) - x_size//2)[:, None] + np.arange(x_size//2*2)
+    projections = np.arange(len(rows)) if indexes is None else np.asarray(indexes)
+    return stack[projections[:, None, None], rows[:, :, None], cols[:, None, :]].astype(float)
+
+
+def locate_hotspots(patches, method='parabola', workers=None):
+    """
+    Sub-pixel hotspot centre of every patch
+
+    Parameters
+    ----------
+    patches : ndarray
+        [projection, y, x] patches, see extract_patches
+    method : str
+        'parabola' fits a parabola to the log intensity of the brightest pixel
+        and its neighbours along each axis (exact for a Gaussian peak),
+        'moments' takes the intensity weighted centroid, 'gaussian' refines the
+        moments with an iterative 2D Gaussian least squares fit per patch
+    workers : int
+        threads for the 'gaussian' refinement, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        row of each centre in patch coordinates, nan for blank patches
+    ndarray: ndarray
+        column of each centre
+    """
+    if method not in HOTSPOT_METHODS:
+        raise ValueError("unknown hotspot method: {}".format(method))
+    if method == 'parabola':
+        return _log_parabola(patches)
+
+    rows, cols = weighted_centroids(patches)
+    if method == 'moments':
+        return rows, cols
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    fit = lambda i: _fit_gaussian(patches[i], rows[i], cols[i])
+    with ThreadPoolExecutor(workers) as pool:
+        centres = np.array(list(pool.map(fit, range(len(patches)))), dtype=float).reshape(len(patches), 2)
+    return centres[:, 0], centres[:, 1]
+
+
+def _log_parabola(patches):
+    num_patches, num_y, num_x = patches.shape
+    peaks = patches.reshape(num_patches, -1).argmax(axis=1)
+    row, col = np.unravel_index(peaks, (num_y, num_x))
+    index = np.arange(num_patches)
+    peak = patches[index, row, col]
+    tiny = np.finfo(float).tiny
+    log_peak = np.log(np.maximum(peak, tiny))
+
+    def offset(before, after, inside):
+        # vertex of the parabola through (-1, before), (0, peak), (1, after)
+        log_before = np.log(np.maximum(before, tiny))
+        log_after = np.log(np.maximum(after, tiny))
+        curvature = log_before - 2*log_peak + log_after
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = (log_before - log_after)/(2*curvature)
+        return np.where(inside & (curvature < 0) & (np.abs(delta) <= 0.5), delta, 0)
+
+    inside_y = (row > 0) & (row < num_y - 1)
+    inside_x = (col > 0) & (col < num_x - 1)
+    up = patches[index, np.clip(row - 1, 0, num_y - 1), col]
+    down = patches[index, np.clip(row + 1, 0, num_y - 1), col]
+    left = patches[index, row, np.clip(col - 1, 0, num_x - 1)]
+    right = patches[index, row, np.clip(col + 1, 0, num_x - 1)]
+    rows = row + offset(up, down, inside_y)
+    cols = col + offset(left, right, inside_x)
+    blank = peak <= 0
+    return np.where(blank, np.nan, rows), np.where(blank, np.nan, cols)
+
+
+def _fit_gaussian(patch, row, col):
+    if not np.isfinite(row) or not np.isfinite(col):
+        return np.nan, np.nan
+    y, x = np.indices(patch.shape)
+    width_y = np.sqrt(abs(((np.arange(patch.shape[0]) - row)**2*patch[:, int(col)]).sum()/max(patch[:, int(col)].sum(), 1e-12))) or 1.0
+    width_x = np.sqrt(abs(((np.arange(patch.shape[1]) - col)**2*patch[int(row), :]).sum()/max(patch[int(row), :].sum(), 1e-12))) or 1.0
+    gaussian = lambda p: p[0]*np.exp(-(((p[1] - y)/p[3])**2 + ((p[2] - x)/p[4])**2)/2)
+    errorfunction = lambda p: np.ravel(gaussian(p) - patch)
+    p, success = optimize.leastsq(errorfunction, [patch.max(), row, col, width_y, width_x])
+    return p[1], p[2]
+
+
+def track_hotspot(stack, thetas, index, x_pos, y_pos, x_size, y_size, search=None, chunk=8, workers=None):
+    """
+    Follows a hotspot from one projection through the whole stack by template
+    matching. The search window of each projection is centred on the position
+    predicted by a sinusoid fitted to the columns tracked so far (the last
+    tracked row and, until enough angles are covered, column otherwise).
+    Projections are tracked outwards from index in chunks whose windows are
+    matched concurrently; the fit is updated after every chunk.
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x]
+    thetas : ndarray
+        projection angles in degrees
+    index : int
+        projection the hotspot was selected in
+    x_pos, y_pos : int
+        lower left corner of the ROI around the hotspot in that projection, y
+        measured from the bottom of the frame as the gui reports it
+    x_size, y_size : int
+        ROI size, also the template size
+    search : int, optional
+        pixels searched beyond the ROI on every side, max(x_size, y_size) by default
+    chunk : int
+        projections matched per batch
+    workers : int
+        matching threads, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        x_pos of the ROI in every projection
+    ndarray: ndarray
+        y_pos of the ROI in every projection
+    """
+    num_projections, num_y, num_x = stack.shape
+    thetas = np.asarray(thetas, dtype=float)
+    if search is None:
+        search = max(x_size, y_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # top left corner of the ROI in array coordinates
+    rows = np.zeros(num_projections, dtype=int)
+    cols = np.zeros(num_projections, dtype=int)
+    rows[index] = num_y - y_pos - y_size
+    cols[index] = x_pos
+    template = stack[index, rows[index]:rows[index] + y_size, cols[index]:cols[index] + x_size].astype(float)
+    tracked = [index]
+
+    def match(args):
+        i, row, col = args
+        r0 = int(np.clip(row - search, 0, num_y - y_size))
+        r1 = int(np.clip(row + y_size + search, r0 + y_size, num_y))
+        c0 = int(np.clip(col - search, 0, num_x - x_size))
+        c1 = int(np.clip(col + x_size + search, c0 + x_size, num_x))
+        score = match_template(stack[i, r0:r1, c0:c1].astype(float), template)
+        peak_row, peak_col = np.unravel_index(np.argmax(score), score.shape)
+        return r0 + peak_row, c0 + peak_col
+
+    with ThreadPoolExecutor(workers) as pool:
+        for step in (1, -1):
+            order = np.arange(index + step, num_projections if step > 0 else -1, step)
+            recent = [index]
+            start = 0
+            while start < len(order):
+                # batches grow with the tracked run, predictions stay close to tracked angles
+                batch = order[start:start + min(chunk, len(recent))]
+                predicted_rows, predicted_cols = _predict(thetas, rows, cols, tracked, recent, batch)
+                for i, (row, col) in zip(batch, pool.map(match, zip(batch, predicted_rows, predicted_cols))):
+                    rows[i] = row
+                    cols[i] = col
+                tracked.extend(batch)
+                recent.extend(batch)
+                start += len(batch)
+    return cols, num_y - rows - y_size
+
+
+def _predict(thetas, rows, cols, tracked, recent, batch, min_points=5, min_span=20):
+    """
+    ROI corners predicted for the next batch. Rows follow the last projection
+    tracked in the current direction. Columns follow a robust sinusoid fitted to every
+    tracked column once they span min_span degrees, a line through the last
+    min_points columns of the current direction before that.
+    """
+    last = recent[-1]
+    predicted_rows = np.full(len(batch), rows[last])
+    predicted_cols = np.full(len(batch), cols[last], dtype=float)
+    angles = thetas[tracked]
+    if len(tracked) >= min_points and np.ptp(angles) >= min_span:
+        params = fit_sinusoids(angles, cols[tracked], robust=True)
+        predicted_cols = sinusoid(params, thetas[batch])
+    elif len(recent) >= 2 and np.ptp(thetas[recent[-min_points:]]) > 0:
+        slope, offset = np.polyfit(thetas[recent[-min_points:]], cols[recent[-min_points:]], 1)
+        predicted_cols = slope*thetas[batch] + offset
+    return predicted_rows, np.round(predicted_cols).astype(int)
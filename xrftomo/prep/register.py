@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+
+"""
+Registration of neighbouring projections. Spectra are computed once per
+projection with batched multi-threaded FFTs and shared by the two pairs each
+projection belongs to.
+"""
+
+import os
+import numpy as np
+import scipy.fft
+from concurrent.futures import ThreadPoolExecutor
+from skimage.registration import phase_cross_correlation
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['correlate_neighbours',
+           'register_pairs',
+           'register_stack',
+           'wrap_shifts']
+
+
+def wrap_shifts(shifts, size):
+    """
+    Folds circular shifts into (size//2 - size, size//2], the range used by
+    the correlation peak search
+
+    Parameters
+    ----------
+    shifts : array_like
+        integer shifts in pixels
+    size : int
+        length of the shifted axis
+
+    Returns
+    -------
+    ndarray: ndarray
+        wrapped shifts
+    """
+    shifts = np.mod(np.asarray(shifts), size)
+    shifts[shifts > size // 2] -= size
+    return shifts
+
+
+def correlate_neighbours(stack, phase=False, chunk=64, workers=None):
+    """
+    Integer shift between every pair of neighbouring projections, from the
+    peak of their circular cross correlation
+
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x] of one element
+    phase : bool
+        normalise the cross power spectrum (phase correlation)
+    chunk : int
+        projections transformed per batch, bounds the memory held by spectra
+    workers : int
+        FFT threads, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        y shift of projection i+1 relative to projection i, len(stack)-1 values
+    ndarray: ndarray
+        x shift of projection i+1 relative to projection i
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_projections, num_y, num_x = stack.shape
+    y_shifts = np.zeros(max(num_projections - 1, 0), dtype=int)
+    x_shifts = np.zeros_like(y_shifts)
+    previous = None
+    for start in range(0, num_projections, chunk):
+        spectra = scipy.fft.rfft2(stack[start:start + chunk], workers=workers)
+        if previous is None:
+            cross = spectra[:-1] * spectra[1:].conj()
+            first = 0
+        else:
+            cross = np.concatenate((previous[None], spectra[:-1])) * spectra.conj()
+            first = start - 1
+        previous = spectra[-1]
+        if not len(cross):
+            continue
+        if phase:
+            cross /= np.maximum(np.abs(cross), np.finfo(cross.real.dtype).tiny)
+        correlation = np.abs(scipy.fft.irfft2(cross, s=(num_y, num_x), workers=workers))
+        peaks = correlation.reshape(len(cross), -1).argmax(axis=1)
+        t0, t1 = np.unravel_index(peaks, (num_y, num_x))
+        y_shifts[first:first + len(cross)] = wrap_shifts(t0, num_y)
+        x_shifts[first:first + len(cross)] = wrap_shifts(t1, num_x)
+    return y_shifts, x_shifts
+
+
+def register_stack(stack, upsample_factor=100, reference=None, chunk=64, workers=None):
+    """
+    Sub-pixel shift registering every image of a stack to its predecessor, or
+    to one reference image, with skimage phase_cross_correlation
+
+    Images are Fourier transformed once, chunk at a time, and the pairs of
+    each chunk are registered concurrently on a thread pool.
+
+    Parameters
+    ----------
+    stack : ndarray
+        [image, ...] array, e.g. [projection, y, x] or the [projection, x] rows of a sinogram
+    upsample_factor : int
+        registration precision is 1/upsample_factor of a pixel
+    reference : int
+        index of the image every other one is registered to, None to register
+        each image to the previous one
+    chunk : int
+        images transformed per batch, bounds the memory held by spectra
+    workers : int
+        FFT and registration threads, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        [image, axis] shifts that register each image, as returned by
+        phase_cross_correlation, zero for the first (or reference) image
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_images = stack.shape[0]
+    shifts = np.zeros((num_images, stack.ndim - 1))
+    if num_images < 2:
+        return shifts
+    axes = tuple(range(1, stack.ndim))
+    transform = lambda images: scipy.fft.fftn(images, axes=axes, workers=workers)
+    if reference is not None:
+        reference_spectrum = transform(stack[reference:reference + 1])[0]
+    previous = None
+
+    def register(pair):
+        shift, error, diffphase = phase_cross_correlation(pair[0], pair[1], upsample_factor=upsample_factor, space="fourier")
+        return shift
+
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, num_images, chunk):
+            spectra = transform(stack[start:start + chunk])
+            if reference is None:
+                references = [previous] + list(spectra[:-1])
+                indexes = [i for i in range(len(spectra)) if start + i > 0]
+            else:
+                references = [reference_spectrum]*len(spectra)
+                indexes = [i for i in range(len(spectra)) if start + i != reference]
+            previous = spectra[-1]
+            pairs = [(references[i], spectra[i]) for i in indexes]
+            for i, shift in zip(indexes, pool.map(register, pairs)):
+                shifts[start + i] = shift
+    return shifts
+
+
+def register_pairs(references, images, upsample_factor=100, workers=None):
+    """
+    Sub-pixel shift registering images[i] to references[i] for every i, with
+    skimage phase_cross_correlation on a thread pool
+
+    Parameters
+    ----------
+    references, images : ndarray
+        [image, ...] arrays of the same shape
+    upsample_factor : int
+        registration precision is 1/upsample_factor of a pixel
+    workers : int
+        FFT and registration threads, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        [image, axis] shifts that register each image to its reference
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    axes = tuple(range(1, images.ndim))
+    reference_spectra = scipy.fft.fftn(references, axes=axes, workers=workers)
+    image_spectra = scipy.fft.fftn(images, axes=axes, workers=workers)
+
+    def register(i):
+        shift, error, diffphase = phase_cross_correlation(reference_spectra[i], image_spectra[i], upsample_factor=upsample_factor, space="fourier")
+        return shift
+
+    with ThreadPoolExecutor(workers) as pool:
+        return np.array(list(pool.map(register, range(len(images)))), dtype=float).reshape(len(images), images.ndim - 1)
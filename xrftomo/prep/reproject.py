@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+
+"""
+Re-projection alignment: reconstruct the aligned projections, project the
+reconstruction back and register every projection to its simulated
+counterpart, until the shift updates stop changing.
+"""
+
+import logging
+import time
+import numpy as np
+import tomopy
+from xrftomo.prep.shift import shift_projections
+from xrftomo.prep.register import register_pairs
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['ITERATIVE_ALGORITHMS',
+           'reprojection_align']
+
+LOG = logging.getLogger(__name__)
+
+# algorithms that accept num_iter and init_recon, and so can carry the
+# reconstruction over from one alignment iteration to the next
+ITERATIVE_ALGORITHMS = ('art', 'bart', 'mlem', 'osem', 'ospml_hybrid', 'ospml_quad',
+                        'pml_hybrid', 'pml_quad', 'sirt', 'tv', 'grad')
+
+
+def reprojection_align(prj, thetas, x_shifts=None, y_shifts=None, iters=10, tol=0.01,
+                       algorithm='sirt', center=None, pad=(0, 0), blur=None,
+                       upsample_factor=100, register=None, callback=None, ncore=None):
+    """
+    Joint re-projection alignment of one element
+
+    Parameters
+    ----------
+    prj : ndarray
+        3D projection stack [theta, y, x], left untouched
+    thetas : ndarray
+        projection angles in radians
+    x_shifts, y_shifts : ndarray, optional
+        initial shifts to start from, in the shift_projections convention
+    iters : int
+        maximum number of iterations
+    tol : float
+        stops once the rms shift update of an iteration, in pixels, is below tol
+    algorithm : str
+        tomopy reconstruction algorithm. Iterative algorithms run one
+        iteration per alignment iteration, warm started from the previous one
+    center : float, optional
+        rotation axis, the middle of the frame by default
+    pad : tuple
+        (x, y) zero padding added around every projection while aligning
+    blur : tuple, optional
+        (rin, rout) radii of tomopy.blur_edges applied before registering
+    upsample_factor : int
+        registration precision is 1/upsample_factor of a pixel
+    register : function, optional
+        register(simulated, projections) -> [theta, 2] (y, x) shifts moving the
+        projections onto the simulated ones, register_pairs by default
+    callback : function, optional
+        callback(iteration, x_shifts, y_shifts, update) after every iteration,
+        returning True stops the alignment
+    ncore : int, optional
+        cores used by tomopy
+
+    Returns
+    -------
+    ndarray: ndarray
+        x_shifts, total column shift of each projection
+    ndarray: ndarray
+        y_shifts, total row shift of each projection
+    list: list
+        rms shift update of every iteration run
+    """
+    num_projections = prj.shape[0]
+    x_shifts = np.zeros(num_projections) if x_shifts is None else np.array(x_shifts, dtype=float)
+    y_shifts = np.zeros(num_projections) if y_shifts is None else np.array(y_shifts, dtype=float)
+    if register is None:
+        register = lambda simulated, projections: register_pairs(simulated, projections, upsample_factor, ncore)
+    original = np.nan_to_num(np.asarray(prj, dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+    padding = ((0, 0), (pad[1], pad[1]), (pad[0], pad[0]))
+    if center is not None:
+        center = center + pad[0]
+    kwargs = {'num_iter': 1} if algorithm in ITERATIVE_ALGORITHMS else {}
+
+    rec = None
+    conv = []
+    for iteration in range(iters):
+        start = time.time()
+        # shifts are applied to the untouched projections every time, interpolation errors do not pile up
+        aligned = original.copy()
+        shift_projections(aligned[None], x_shifts, y_shifts, method='fourier', workers=ncore)
+        aligned = np.pad(aligned, padding, mode='constant')
+
+        init_recon = rec if kwargs else None
+        rec = tomopy.recon(aligned, thetas, center=center, algorithm=algorithm, init_recon=init_recon, ncore=ncore, **kwargs)
+        simulated = tomopy.project(rec, thetas, center=center, pad=False, ncore=ncore)
+        if blur is not None:
+            aligned = tomopy.blur_edges(aligned, blur[0], blur[1])
+            simulated = tomopy.blur_edges(simulated, blur[0], blur[1])
+
+        shifts = np.asarray(register(simulated, aligned), dtype=float)
+        y_shifts += shifts[:, 0]
+        x_shifts += shifts[:, 1]
+        update = np.sqrt(np.mean(shifts[:, 0]**2 + shifts[:, 1]**2))
+        conv.append(update)
+        LOG.info("re-projection alignment iteration %d: rms update %.4f px, %.1f s", iteration + 1, update, time.time() - start)
+
+        if callback is not None and callback(iteration, x_shifts, y_shifts, update):
+            break
+        if update < tol:
+            break
+    return x_shifts, y_shifts, conv
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+###########################################################################
+
+"""
+Shift kernel shared by the gui actions and the headless pipelines. Shifts are
+applied in place, one [element, y, x] projection slice at a time, so moving a
+single projection never touches, or copies, the rest of the data cube.
+
+Positive x moves the image towards higher columns and positive y towards higher
+rows; pixels leaving one edge wrap around to the other, as with np.roll.
+
+Batches of projections can be spread over a thread pool: the spline and
+Fourier kernels spend their time in scipy code that releases the GIL.
+"""
+
+import os
+import numpy as np
+import scipy.fft
+import scipy.ndimage
+from concurrent.futures import ThreadPoolExecutor
+from xrftomo.file_io.storage import get_data_dtype
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['SHIFT_METHODS',
+           'shift_projection',
+           'shift_projections',
+           'shift_stack',
+           'shift_image']
+
+SHIFT_METHODS = ('linear', 'fourier', 'spline')
+
+
+def shift_projection(data, x, y, index, method='linear'):
+    """
+    Shifts one projection of every element in place
+
+    Parameters
+    ----------
+    data : ndarray
+        4D array [elements, projection, y, x]
+    x, y : float
+        shift in pixels
+    index : int
+        projection index
+    method : str
+        'linear' rolls whole pixels and interpolates the fraction linearly
+        between neighbours, 'fourier' multiplies the spectrum by a phase ramp,
+        'spline' interpolates with periodic cubic splines as scipy.ndimage.shift
+        does with order=3 and mode='grid-wrap'
+
+    Returns
+    -------
+    ndarray: ndarray
+        data, shifted in place
+    """
+    return shift_projections(data, [x], [y], [index], method)
+
+
+def shift_projections(data, x_shifts, y_shifts, indexes=None, method='linear', workers=1):
+    """
+    Shifts many projections of every element in place, each by its own x, y
+
+    Parameters
+    ----------
+    data : ndarray
+        4D array [elements, projection, y, x]
+    x_shifts, y_shifts : array_like
+        shift in pixels of each projection in indexes
+    indexes : array_like
+        projection indexes, every projection by default
+    method : str
+        'linear', 'fourier' or 'spline', see shift_projection
+    workers : int
+        threads shifting projections concurrently, None for one per core
+
+    Returns
+    -------
+    ndarray: ndarray
+        data, shifted in place
+    """
+    if method not in SHIFT_METHODS:
+        raise ValueError("unknown shift method: {}".format(method))
+    if indexes is None:
+        indexes = range(data.shape[1])
+    jobs = [(index, x, y) for index, x, y in zip(indexes, x_shifts, y_shifts) if x != 0 or y != 0]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    def shift_chunk(chunk):
+        for index, x, y in chunk:
+            shift_image(data[:, index], x, y, method)
+
+    if workers == 1:
+        shift_chunk(jobs)
+        return data
+    # one contiguous run of projections per thread, each projection is written by a single thread
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(shift_chunk, np.array_split(np.array(jobs, dtype=object), workers)))
+    return data
+
+
+def shift_stack(data, x, y, method='linear', workers=1):
+    """
+    Shifts every projection of every element in place by the same x, y
+    """
+    num_projections = data.shape[1]
+    return shift_projections(data, np.full(num_projections, x, dtype=float), np.full(num_projections, y, dtype=float), None, method, workers)
+
+
+def shift_image(image, x, y, method='linear'):
+    """
+    Shifts the last two axes of an array in place
+
+    Parameters
+    ----------
+    image : ndarray
+        [..., y, x] array or view, typically the [element, y, x] slice of one projection
+    x, y : float
+        shift in pixels
+    method : str
+        'linear', 'fourier' or 'spline', see shift_projection
+    """
+    if method == 'spline':
+        # spline coefficients of every element at once, then one interpolation per element
+        coefficients = scipy.ndimage.spline_filter1d(image, 3, axis=-1, output=np.float64, mode='grid-wrap')
+        scipy.ndimage.spline_filter1d(coefficients, 3, axis=-2, output=coefficients, mode='grid-wrap')
+        for i in np.ndindex(image.shape[:-2]):
+            scipy.ndimage.shift(coefficients[i], (y, x), output=image[i], order=3, mode='grid-wrap', prefilter=False)
+        return image
+
+    if method == 'fourier':
+        num_y, num_x = image.shape[-2:]
+        ramp = np.exp(-2j*np.pi*(np.fft.fftfreq(num_y)[:, None]*y + np.fft.rfftfreq(num_x)[None, :]*x))
+        image[...] = scipy.fft.irfft2(scipy.fft.rfft2(image)*ramp, s=(num_y, num_x))
+        return image
+
+    X = int(np.floor(x))
+    Y = int(np.floor(y))
+    if (x != X or y != Y) and not np.issubdtype(image.dtype, np.inexact):
+        # fractions of integer data are blended in the data cube type and rounded back
+        image[...] = np.rint(shift_image(image.astype(get_data_dtype()), x, y))
+        return image
+    if X or Y:
+        image[...] = np.roll(image, (Y, X), axis=(-2, -1))
+    for fraction, axis in ((x - X, -1), (y - Y, -2)):
+        if fraction:
+            # (1-f)*image + f*(image moved by one pixel), one temporary of the slice
+            neighbour = np.roll(image, 1, axis=axis)
+            neighbour *= fraction
+            image *= 1 - fraction
+            image += neighbour
+    return image
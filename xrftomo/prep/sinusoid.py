@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright © 2020, UChicago Argonne, LLC. All Rights Reserved.        	  #
+#    																	  #
+#						Software Name: XRFtomo							  #
+#																		  #
+#					By: Argonne National Laboratory						  #
+#																		  #
+#						OPEN SOURCE LICENSE                               #
+#                                                                         #
+# Redistribution and use in source and binary forms, with or without      #
+# modification, are permitted provided that the following conditions      #
+# are met:                                                                #
+#                                                                         #
+# 1. Redistributions of source code must retain the above copyright       #
+#    notice, this list of conditions and the following disclaimer.        #
+#																		  #
+# 2. Redistributions in binary form must reproduce the above copyright    #
+#    notice, this list of conditions and the following disclaimer in      #
+#    the documentation and/or other materials provided with the 		  #
+#    distribution.														  #
+# 									                                      #
+# 3. Neither the name of the copyright holder nor the names of its 		  #
+#    contributors may be used to endorse or promote products derived 	  #
+#    from this software without specific prior written permission.		  #
+#																		  #
+#								DISCLAIMER								  #
+#							  											  #
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS 	  #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 	  #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR   #
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT 	  #
+# HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,  #
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT 		  #
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,   #
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY   #
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 	  #
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE   #
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
+
+"""
+Sinusoid fitting for center of mass and hotspot trajectories. The model
+A*sin(theta - phase) + offset is linear in a*sin(theta) + b*cos(theta) + offset,
+so every trajectory is a small weighted linear least squares problem and many
+of them are solved at once.
+"""
+
+import numpy as np
+
+__docformat__ = 'restructuredtext en'
+__all__ = ['fit_sinusoids',
+           'sinusoid']
+
+
+def sinusoid(params, thetas):
+    """
+    Evaluates amplitude*sin(theta - phase) + offset
+
+    Parameters
+    ----------
+    params : array_like
+        [..., 3] (amplitude, phase, offset), phase in degrees
+    thetas : array_like
+        angles in degrees
+
+    Returns
+    -------
+    ndarray: ndarray
+        [..., len(thetas)] curves
+    """
+    params = np.asarray(params, dtype=float)
+    radians = np.deg2rad(np.asarray(thetas, dtype=float) - params[..., 1:2])
+    return params[..., 0:1]*np.sin(radians) + params[..., 2:3]
+
+
+def fit_sinusoids(thetas, values, weights=None, offset=None, robust=False, iters=10, tuning=4.685):
+    """
+    Least squares fit of amplitude*sin(theta - phase) + offset to one or many
+    trajectories, in closed form
+
+    Parameters
+    ----------
+    thetas : array_like
+        angles in degrees, shared by all trajectories
+    values : array_like
+        [..., len(thetas)] trajectories, e.g. one per hotspot group, sinogram
+        row or element; nan marks a missing point
+    weights : array_like, optional
+        [..., len(thetas)] non negative weights of the points
+    offset : float or array_like, optional
+        fixed offset per trajectory, only amplitude and phase are fitted
+    robust : bool
+        iteratively reweighted least squares with Tukey's biweight, so that
+        outliers such as misplaced hotspot clicks stop pulling on the fit
+    iters : int
+        maximum number of reweighting iterations
+    tuning : float
+        biweight constant, in units of the median absolute deviation
+
+    Returns
+    -------
+    ndarray: ndarray
+        [..., 3] (amplitude, phase, offset), phase in degrees. Trajectories
+        with fewer points than parameters get nan
+    """
+    radians = np.deg2rad(np.asarray(thetas, dtype=float))
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    base = np.ones(values.shape) if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), values.shape).copy()
+    base[missing] = 0
+    values = np.where(missing, 0, values)
+
+    columns = [np.sin(radians), np.cos(radians)]
+    if offset is None:
+        columns.append(np.ones_like(radians))
+        target = values
+    else:
+        offset = np.broadcast_to(np.asarray(offset, dtype=float), values.shape[:-1])
+        target = values - offset[..., None]
+    design = np.stack(columns, axis=-1)
+    num_params = design.shape[-1]
+
+    weight = base
+    for iteration in range(iters if robust else 1):
+        normal = np.einsum('...n,ni,nj->...ij', weight, design, design)
+        rhs = np.einsum('...n,ni,...n->...i', weight, design, target)
+        solvable = (np.count_nonzero(weight, axis=-1) >= num_params) & (np.abs(np.linalg.det(normal)) > 1e-12)
+        normal[~solvable] = np.eye(num_params)
+        coefficients = np.linalg.solve(normal, rhs[..., None])[..., 0]
+        coefficients[~solvable] = np.nan
+        if not robust:
+            break
+        residuals = np.where(base > 0, target - coefficients @ design.T, np.nan)
+        scale = 1.4826*np.nanmedian(np.abs(residuals), axis=-1, keepdims=True)
+        scale = np.where(scale > 0, scale, np.inf)
+        ratio = np.nan_to_num(residuals/(tuning*scale), nan=np.inf)
+        updated = base*np.where(np.abs(ratio) < 1, (1 - ratio**2)**2, 0)
+        if np.allclose(updated, weight):
+            break
+        weight = updated
+
+    a = coefficients[..., 0]
+    b = coefficients[..., 1]
+    # a*sin + b*cos = amplitude*sin(theta - phase)
+    amplitude = np.hypot(a, b)
+    phase = np.rad2deg(np.arctan2(-b, a))
+    fitted_offset = coefficients[..., 2] if offset is None else np.where(np.isnan(a), np.nan, offset)
+    return np.stack((amplitude, phase, fitted_offset), axis=-1)
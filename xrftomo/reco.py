@@ -38,27 +38,269 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.	  #
 ###########################################################################
 
+"""
+Headless pipelines behind xrftomo rec and xrftomo replay: load a MAPS
+directory with the tags and selections saved by the gui, then either apply a
+saved alignment and reconstruct every selected element, writing slices to disk
+as they are computed, or replay an operation log recorded in the gui. Nothing
+here creates Qt objects, so both run on compute nodes without a display.
+"""
+
+import concurrent.futures
 import logging
+import os
+import re
 import numpy as np
 import tomopy
+from xrftomo.file_io.storage import bin_data, set_data_backend, set_data_dtype
+from xrftomo.file_io.reader import load_thetas, read_alignment, read_channel_names, read_mic_xrf
+from xrftomo.file_io.writer import export_images, write_image, write_session
+from xrftomo.oplog import OperationLog, replay_operations
+from xrftomo.prep.shift import shift_projections
 
 __author__ = "Francesco De Carlo"
 __copyright__ = "Copyright (c) 2019, UChicago Argonne, LLC."
 __version__ = "0.0.1"
 __docformat__ = 'restructuredtext en'
-__all__ = ['tomo']
+__all__ = ['tomo',
+           'replay',
+           'load_directory',
+           'apply_alignment',
+           'reconstruct_element']
 
 LOG = logging.getLogger(__name__)
 
-def tomo(params):
+ALGORITHMS = ('gridrec', 'fbp', 'mlem', 'sirt')
+THETA_IDXS = [663, 657, 691]
+
+
+def tomo(params, ncore=None):
+    """
+    Runs load, alignment and reconstruction for the directory in params.input_path
+
+    Parameters
+    ----------
+    params : argparse.Namespace
+        file-io and reconstruction options, see xrftomo.config
+    ncore : int, optional
+        threads used by tomopy, all cores by default
+    """
+    set_data_backend(params.data_backend, params.scratch_path)
+    set_data_dtype(params.data_dtype)
+    data, elements, thetas, fnames, num_elements = load_directory(params)
+    if params.alignment_file:
+        data = apply_alignment(data, fnames, params.alignment_file, ncore)
+    binning = int(params.binning)
+    if binning > 0:
+        data = bin_data(data, binning)
+    output_path = params.output_path or os.path.join(params.input_path, "xrftomo_rec")
+    # the scalers loaded after the elements are not reconstructed
+    for i in range(num_elements):
+        LOG.info("reconstructing %s", elements[i])
+        reconstruct_element(data[i], thetas, params, os.path.join(output_path, elements[i]), elements[i], ncore)
+    LOG.info("reconstructions written to %s", output_path)
+    return True
+
+
+def replay(params, ncore=None):
+    """
+    Loads params.input_path as tomo does and replays the operation log saved from
+    the gui on it. The processed dataset is written to <output-path>/replay.h5 and
+    every reconstruction in the log to <output-path>/<element>/.
+
+    Parameters
+    ----------
+    params : argparse.Namespace
+        file-io options, see xrftomo.config
+    ncore : int, optional
+        threads used by tomopy and the alignment shifts, all cores by default
+    """
+    if not params.operation_log:
+        raise RuntimeError("operation-log is not set")
+    try:
+        oplog = OperationLog.load(params.operation_log)
+    except (OSError, ValueError) as error:
+        raise RuntimeError("cannot read {}: {}".format(params.operation_log, error))
+    set_data_backend(params.data_backend, params.scratch_path)
+    set_data_dtype(params.data_dtype)
+    data, elements, thetas, fnames, num_elements = load_directory(params)
+
+    progress = lambda operations_done, num_operations, op: LOG.info("%d/%d %s", operations_done, num_operations, op)
+    try:
+        state = replay_operations(oplog, data, elements, thetas, fnames, scale=params.replay_scale, progress=progress, ncore=ncore)
+    except (ValueError, IndexError) as error:
+        raise RuntimeError("replay of {} failed: {}".format(params.operation_log, error))
+
+    output_path = params.output_path or os.path.join(params.input_path, "xrftomo_rec")
+    os.makedirs(output_path, exist_ok=True)
+    session = os.path.join(output_path, "replay.h5")
+    write_session(session, state["fnames"], state["data"], state["thetas"], state["elements"],
+                          state["recons"], state["x_shifts"], state["y_shifts"])
+    for name, recon in state["recons"].items():
+        os.makedirs(os.path.join(output_path, name), exist_ok=True)
+        export_images(("{}/{}/{}_recon_{}.tiff".format(output_path, name, name, str(i).zfill(4)), recon[i])
+                              for i in range(recon.shape[0]))
+    LOG.info("replayed %d operations, results written to %s", len(oplog), output_path)
+    return True
+
+
+def load_directory(params):
+    """
+    Loads the selected elements and scalers of every file in params.input_path
+
+    Returns
+    -------
+    data : ndarray
+        4D array [elements + scalers, projection, y, x]
+    elements : list
+        element names followed by scaler names
+    thetas : ndarray
+        projection angles in degrees
+    fnames : list
+        file names, in the order of the projections
+    num_elements : int
+        number of elements, the first entries of data and elements
+    """
+    path = params.input_path
+    ext = params.file_extension.split(".")[-1]
+    try:
+        fnames = sorted(os.path.join(path, fname) for fname in os.listdir(path)
+                        if fname.split(".")[-1] == ext and not fname.startswith("."))
+    except OSError as error:
+        raise RuntimeError(str(error))
+    if len(fnames) == 0:
+        raise RuntimeError("no {} files in {}".format(ext, path))
+
+    channel_names = read_channel_names(fnames[0], params.element_tag)
+    elements = read_selection(params.selected_elements, channel_names)
+    try:
+        scaler_names = read_channel_names(fnames[0], params.scaler_tag)
+        scalers = read_selection(params.selected_scalers, scaler_names)
+    except (KeyError, OSError):
+        scalers = []
+    if len(elements) == 0:
+        raise RuntimeError("no element selected")
+
+    thetas = load_thetas(fnames, params.theta_tag, workers=params.load_workers)
+    if thetas == []:
+        candidates = load_thetas(fnames, "dummy", idx=THETA_IDXS, workers=params.load_workers)
+        thetas = next((candidate for candidate in candidates if valid_thetas(candidate)), [])
+    if thetas == []:
+        raise RuntimeError("no angle information, check theta-tag")
+    thetas = np.asarray(thetas)
+    if str(params.sorted_angles) != 'False':
+        order = np.argsort(thetas, kind="stable")
+        thetas = thetas[order]
+        fnames = [fnames[j] for j in order]
+
+    LOG.info("loading %d files from %s", len(fnames), path)
+    progress = lambda files_done, num_files, fname: LOG.debug("%d/%d %s", files_done, num_files, fname)
+    data = read_mic_xrf(fnames, elements, params.data_tag, params.element_tag, scalers,
+                                params.scaler_tag, workers=params.load_workers, progress=progress)
+    return data, elements + scalers, thetas, fnames, len(elements)
+
+
+def read_selection(selection, names):
+    """
+    Names picked by a selected-elements/selected-scalers string such as '[0, 3]'
+    """
+    idxs = [int(idx) for idx in re.findall(r"(?<![\w.])\d+", selection)]
+    return [names[idx] for idx in idxs if idx < len(names)]
+
+
+def valid_thetas(thetas):
+    """
+    Same rule as the file table: angles within +-360 and at least one unique value per 3 files
+    """
+    if len(thetas) == 0:
+        return False
+    return max(thetas) <= 360 and min(thetas) >= -360 and len(thetas)/len(set(thetas)) <= 3
+
+
+def apply_alignment(data, fnames, alignment_file, ncore=None):
+    """
+    Shifts every projection by the alignment saved from the gui. Shifts are
+    matched to projections by file name when the alignment has names.
+
+    Parameters
+    ----------
+    data : ndarray
+        4D array [elements, projection, y, x], shifted in place
+    fnames : list
+        file names of the projections
+    alignment_file : str
+        .txt or .npy alignment
+    ncore : int, optional
+        threads used for the shifts, all cores by default
+
+    Returns
+    -------
+    ndarray: ndarray
+        the shifted data
+    """
+    names, x_shifts, y_shifts = read_alignment(alignment_file)
+    num_projections = data.shape[1]
+    if names:
+        shifts = dict(zip(names, zip(x_shifts, y_shifts)))
+        missing = [fname for fname in fnames if os.path.basename(fname) not in shifts]
+        if missing:
+            LOG.warning("%d projections have no shift in %s", len(missing), alignment_file)
+        x_shifts = np.array([shifts.get(os.path.basename(fname), (0, 0))[0] for fname in fnames])
+        y_shifts = np.array([shifts.get(os.path.basename(fname), (0, 0))[1] for fname in fnames])
+    elif len(x_shifts) != num_projections:
+        raise RuntimeError("{} has {} shifts for {} projections".format(alignment_file, len(x_shifts), num_projections))
+    # same convention as SinogramActions.shift_all
+    return shift_projections(data, x_shifts, -np.asarray(y_shifts, dtype=float), method='spline', workers=ncore)
+
 
-    # use https://github.com/tomography/ufot/blob/master/ufot/reco.py 
-    # as a template
-    # this module allows for batch reconstruction of multiple data set using
-    # the parameters selected/optimized with the xrftomo GUI
-    # to run it use bin/xrftomo rec
-    print ("do nothing for now ...")
+def reconstruct_element(stack, thetas, params, output_path, name, ncore=None):
+    """
+    Reconstructs one element params.recon_chunk slices at a time. Each batch of
+    slices is written by a pool of threads while the next batch is reconstructed;
+    at most two batches are held in memory.
 
-    rec = True
+    Parameters
+    ----------
+    stack : ndarray
+        3D array [projection, y, x]
+    thetas : ndarray
+        projection angles in degrees
+    params : argparse.Namespace
+        reconstruction options
+    output_path : str
+        directory the slices are written to as <name>_recon_<slice>.tiff
+    name : str
+        element name
+    ncore : int, optional
+        threads used by tomopy, all cores by default
+    """
+    algorithm = params.reconstruction_algorithm
+    if algorithm not in ALGORITHMS:
+        raise RuntimeError("reconstruction algorithm {} is not available in xrftomo rec".format(algorithm))
+    kwargs = {}
+    if algorithm in ('gridrec', 'fbp') and params.filter != 'none':
+        kwargs['filter_name'] = params.filter
+    if algorithm in ('mlem', 'sirt'):
+        kwargs['num_iter'] = params.iteration_count
+    width = stack.shape[2]
+    center = params.center / 2**int(params.binning)
+    if not 0 < center < width:
+        LOG.warning("center %s is outside the projection, using %s", center, width/2)
+        center = width/2
 
-    return rec
\ No newline at end of file
+    os.makedirs(output_path, exist_ok=True)
+    theta = np.deg2rad(thetas)
+    chunk = max(1, params.recon_chunk)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        pending = []
+        for start in range(0, stack.shape[1], chunk):
+            rows = np.ascontiguousarray(stack[:, start:start + chunk], dtype=np.float32)
+            recon = tomopy.recon(rows, theta, center=center, algorithm=algorithm, ncore=ncore, **kwargs)
+            recon = tomopy.remove_nan(recon)
+            for future in pending:
+                future.result()
+            pending = [executor.submit(write_image, "{}/{}_recon_{}.tiff".format(output_path, name, str(start + k).zfill(4)), recon[k])
+                       for k in range(recon.shape[0])]
+            LOG.debug("%s: %d/%d slices", name, min(start + chunk, stack.shape[1]), stack.shape[1])
+        for future in pending:
+            future.result()
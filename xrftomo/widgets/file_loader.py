@@ -45,8 +45,45 @@ import h5py
 import numpy as np
 import os
 import sys
+import traceback
+
+class LoadDataThread(QThread):
+    progressSig = pyqtSignal(int, int, str, name="progressSig")
+    loadedSig = pyqtSignal(object, name="loadedSig")
+
+    def __init__(self, reader, args, workers, binning=0):
+        super(LoadDataThread, self).__init__()
+        self.reader = reader
+        self.args = args
+        self.workers = workers
+        self.binning = binning
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def is_cancelled(self):
+        return self.cancel_requested
+
+    def run(self):
+        try:
+            data = self.reader.read_mic_xrf(*self.args, workers=self.workers, progress=self.progressSig.emit, cancelled=self.is_cancelled, binning=self.binning)
+        except (KeyError, ValueError, IndexError, OSError) as error:
+            print(error)
+            print("invalid image/data/element tag combination. Load failed")
+            data = None
+        except Exception:
+            # not a tag problem, show where it failed
+            print(traceback.format_exc())
+            print("Load failed")
+            data = None
+        self.loadedSig.emit(data)
+
 
 class FileTableWidget(QWidget):
+    dataAppendedSig = pyqtSignal(object, object, object, name="dataAppendedSig")
+    dataLoadedSig = pyqtSignal(object, object, object, object, name="dataLoadedSig")
+
     def __init__(self, parent):
         super(FileTableWidget, self).__init__()
         self.parent = parent
@@ -63,6 +100,14 @@ class FileTableWidget(QWidget):
         self.auto_selected_elements = eval(self.parent.params.selected_elements)
         self.auto_selected_scalers = eval(self.parent.params.selected_scalers)
         self.reader = self.parent.reader
+        self.load_thread = None
+        self.load_args = None
+        self.load_binning = 0
+        self.theta_args = None
+        self.watch_thread = None
+        self.watch_pending = {}
+        self.watch_timer = QTimer()
+        self.watch_timer.timeout.connect(self.poll_directory)
         self.initUI()
         sys.stdout = xrftomo.gui.Stream(newText=self.parent.onUpdateText)
 
@@ -146,6 +191,7 @@ class FileTableWidget(QWidget):
         item_dict["scaler_menu"] = [["label","menu"], "", None, None]
         item_dict["theta_menu"] = [["label","menu"], "", None, None]
         item_dict["saveDataBtn"] = [["button"], "", None, None]
+        item_dict["watchChkbx"] = [["checkbox"], "append new files in the directory to the loaded data as they are written", None, None]
 
         vb_files = QVBoxLayout()
         widgetsizes = [240, 115, 50]
@@ -179,6 +225,14 @@ class FileTableWidget(QWidget):
                     object.setFixedWidth(widgetsize)
                     object.setText("save data to memory")
                     line.addWidget(object)
+
+                elif widget == "checkbox":
+                    setattr(self, key, QCheckBox("watch directory"))
+                    object = self.__dict__[key]
+                    object.setFixedWidth(widgetsize)
+                    object.setToolTip(attrs[1])
+                    object.stateChanged.connect(self.watch_toggled)
+                    line.addWidget(object)
                 else:
                     pass
             vb_files.addLayout(line)
@@ -291,15 +345,19 @@ class FileTableWidget(QWidget):
     def try_theta(self):
         success = False
         path_files = self.fileTableModel.getAllFiles()
-        try_idxs = [663, 657, 691, 663]
-        for idx in try_idxs:
-            thetas = self.reader.load_thetas(files=path_files, theta_tag="dummy", idx=idx)
+        try_idxs = [663, 657, 691]
+        #all candidates are read in a single pass over the files
+        candidates = self.reader.load_thetas(files=path_files, theta_tag="dummy", idx=try_idxs, workers=self.parent.params.load_workers)
+        for idx, thetas in zip(try_idxs, candidates):
+            if thetas == []:
+                continue
             uniques = len(set(thetas))
             errflag = len(path_files)/uniques > 3
             try:
                 if max(thetas)<=360 and min(thetas)>=-360 and not errflag: #thetas valid if at least more than one unique value per every 3 files and range is within +-360
                     self.fileTableModel.update_thetas(thetas)
                     self.fileTableView.sortByColumn(1, 0)
+                    self.theta_args = {"theta_tag": "dummy", "idx": idx}
                     success = True
                     break
             except:
@@ -537,8 +595,7 @@ class FileTableWidget(QWidget):
     def element_tag_changed(self):
         try:
             element_tag = self.element_tag.title()
-            element_list = list(self.img[element_tag])
-            elements = [x.decode("utf-8") for x in element_list]
+            elements = self.reader.read_channel_names(self.img.filename, element_tag)
             self.elementTableModel.loadElementNames(elements)
             self.elementTableModel.setAllChecked(False)
             self.elementTableModel.setChecked(self.auto_selected_elements, (True))
@@ -553,8 +610,7 @@ class FileTableWidget(QWidget):
     def scaler_tag_changed(self):
         try:
             scaler_tag = self.scaler_tag.title()
-            scaler_list = list(self.img[scaler_tag])
-            scalers = [x.decode("utf-8") for x in scaler_list]
+            scalers = self.reader.read_channel_names(self.img.filename, scaler_tag)
             self.scalerTableModel.loadElementNames(scalers)
             self.scalerTableModel.setAllChecked(False)
             self.scalerTableModel.setChecked(self.auto_selected_scalers, (True))
@@ -581,7 +637,8 @@ class FileTableWidget(QWidget):
             path_files = self.fileTableModel.getAllFiles()
             theta_tag = self.theta_tag.title()
 
-            thetas = self.reader.load_thetas(path_files, theta_tag, 1)
+            thetas = self.reader.load_thetas(path_files, theta_tag, workers=self.parent.params.load_workers)
+            self.theta_args = {"theta_tag": theta_tag}
             print("")
             self.fileTableModel.update_thetas(thetas)
             self.fileTableView.sortByColumn(1, 0)
@@ -706,10 +763,14 @@ class FileTableWidget(QWidget):
         self.parent.sinogramWidget.sld.setValue(0)
 
     def onSaveDataInMemory(self):
+        if self.load_thread is not None and self.load_thread.isRunning():
+            self.load_thread.cancel()
+            print("cancelling, waiting for files being read to finish...")
+            return
         files = [i.filename for i in self.fileTableModel.arrayData]
         if len(files) == 0:
             print('Directory probably not mounted')
-            return [], [] , [], []
+            return
         thetas = [i.theta for i in self.fileTableModel.arrayData]
         elements = [i.element_name for i in self.elementTableModel.arrayData]
         scalers = [i.element_name for i in self.scalerTableModel.arrayData]
@@ -740,24 +801,162 @@ class FileTableWidget(QWidget):
 
         if len(elements) == 0:
             print('no element selected.')
-            return [], [] , [], []
+            return
         else:
             print('loading files...')
         if all(x==thetas[0] for x in thetas):           #check if all values in thetas are the same: no theta info.
             print('WARNING: No unique angle information. Double check Theta PV or current directory')
-            # return [], [] , [], []
+            # return
+
+        option, value = self.check_memory(path_files, len(elements)+len(scalers), data_tag, element_tag)
+        if option is False:
+            print("loading cancelled")
+            return
+        binning = 0
+        if option == 'dtype':
+            xrftomo.set_data_dtype(value)
+            self.parent.params.data_dtype = value
+        elif option == 'backend':
+            xrftomo.set_data_backend(value, self.parent.params.scratch_path)
+            self.parent.params.data_backend = value
+        elif option == 'binning':
+            binning = value
+        elif option == 'channels':
+            scalers = scalers[:max(0, value-len(elements))]
+            elements = elements[:value]
+        elif option == 'projections':
+            files = files[::value]
+            path_files = path_files[::value]
+            thetas = thetas[::value]
 
         self.parent.clear_all()
+        self.load_request = (elements+scalers, thetas, files)
+        args = (path_files, elements, data_tag, element_tag, scalers, scaler_tag)
+        self.load_args = args
+        self.load_binning = binning
+        self.load_thread = LoadDataThread(self.reader, args, self.parent.params.load_workers, binning)
+        self.load_thread.progressSig.connect(self.load_progress)
+        self.load_thread.loadedSig.connect(self.load_finished)
+        self.saveDataBtn.setText("cancel loading")
+        self.load_thread.start()
+
+    def check_memory(self, path_files, num_channels, data_tag, element_tag):
+        """
+        Compares the projected peak memory of the session with the available
+        memory and, when it does not fit, asks for a change to the load
+
+        Returns
+        -------
+        option, value : (None, None) to load as selected, (False, None) when
+            cancelled, otherwise one of the options of xrftomo.memory_options
+        """
+        available = xrftomo.available_memory()
+        if available is None:
+            return None, None
         try:
-            #TODO: add file upload status: n / total files uploaded
-            data = self.reader.read_mic_xrf(path_files, elements, data_tag, element_tag, scalers, scaler_tag)
-        except:
-            print("invalid image/data/element tag combination. Load failed")
-            return [], [], [], []
-
+            shape = xrftomo.read_frame_shape(path_files, data_tag, element_tag)
+        except Exception as error:
+            print(error)
+            return None, None
+        estimate = xrftomo.estimate_session_memory(num_channels, len(path_files), shape)
+        if estimate['ram'] <= available:
+            return None, None
+
+        GB = 2**30
+        labels = {'dtype': "load as {}",
+                  'backend': "keep data and undo history out-of-core",
+                  'binning': "bin {0}x{0}",
+                  'channels': "load the first {} channels only",
+                  'projections': "load one projection in {} only"}
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Warning)
+        box.setWindowTitle("not enough memory")
+        box.setText("This session needs about {:.1f} GB, {:.1f} GB is available.".format(estimate['ram']/GB, available/GB))
+        box.setInformativeText("data {:.1f} GB, restore copy {:.1f} GB, undo history {:.1f} GB, reconstructions {:.1f} GB".format(
+            estimate['data']/GB, estimate['original']/GB, estimate['history']/GB, estimate['recons']/GB))
+        buttons = {}
+        for option, value, option_estimate in xrftomo.memory_options(num_channels, len(path_files), shape, available):
+            label = labels[option].format(2**value if option == 'binning' else value)
+            button = box.addButton("{} ({:.1f} GB)".format(label, option_estimate['ram']/GB), QMessageBox.AcceptRole)
+            buttons[button] = (option, value)
+        load_button = box.addButton("load anyway", QMessageBox.DestructiveRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        if box.clickedButton() == load_button:
+            return None, None
+        return buttons.get(box.clickedButton(), (False, None))
+
+    def load_progress(self, files_done, num_files, fname):
+        print("{}/{} {}".format(files_done, num_files, fname.split("/")[-1]))
+
+    def load_finished(self, data):
+        self.saveDataBtn.setText("save data to memory")
         if data is None:
-            return [], [], [], []
+            return
         print('finished loading')
-        elements = elements+scalers
-        return data, elements, thetas, files
+        elements, thetas, files = self.load_request
+        self.dataLoadedSig.emit(data, elements, thetas, files)
+
+    def watch_toggled(self):
+        if self.watchChkbx.isChecked():
+            self.watch_pending = {}
+            self.watch_timer.start(int(self.parent.params.watch_interval*1000))
+            print("watching {} for new files".format(self.dirLineEdit.text()))
+        else:
+            self.watch_timer.stop()
+            print("stopped watching {}".format(self.dirLineEdit.text()))
+
+    def poll_directory(self):
+        #new files are only appended to data that has already been loaded
+        if self.load_args is None or getattr(self.parent, "data", None) is None:
+            return
+        for thread in (self.load_thread, self.watch_thread):
+            if thread is not None and thread.isRunning():
+                return
+        path = self.dirLineEdit.text()
+        ext = self.extLineEdit.text()
+        try:
+            fileNames = [x for x in os.listdir(path) if x.split(".")[-1] == ext and not x.startswith(".")]
+        except Exception as error:
+            print(error)
+            return
+        known = set(i.filename for i in self.fileTableModel.arrayData)
+        fnames = sorted(set(path+"/"+file for file in fileNames) - known)
+
+        #a file is read once its size and mtime are unchanged between two checks, so files still being written are skipped
+        ready = []
+        for fname in fnames:
+            try:
+                stat = os.stat(fname)
+            except OSError:
+                continue
+            if self.watch_pending.get(fname) == (stat.st_size, stat.st_mtime):
+                ready.append(fname)
+                del self.watch_pending[fname]
+            else:
+                self.watch_pending[fname] = (stat.st_size, stat.st_mtime)
+        if ready == []:
+            return
 
+        thetas = []
+        if self.theta_args is not None:
+            thetas = self.reader.load_thetas(ready, **self.theta_args)
+        if thetas == []:
+            print("no angle information for new files, added unchecked: {}".format(", ".join(ready)))
+            self.fileTableModel.append_fnames(ready, [-1]*len(ready), False)
+            return
+
+        self.watch_request = (thetas, ready)
+        args = (ready,) + tuple(self.load_args[1:])
+        self.watch_thread = LoadDataThread(self.reader, args, 1, self.load_binning)
+        self.watch_thread.progressSig.connect(self.load_progress)
+        self.watch_thread.loadedSig.connect(self.watch_finished)
+        self.watch_thread.start()
+
+    def watch_finished(self, data):
+        thetas, files = self.watch_request
+        if data is None:
+            self.fileTableModel.append_fnames(files, thetas, False)
+            return
+        self.fileTableModel.append_fnames(files, thetas)
+        self.dataAppendedSig.emit(data, np.asarray(thetas), files)
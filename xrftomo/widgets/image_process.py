@@ -332,41 +332,49 @@ class ImageProcessWidget(QtWidgets.QWidget):
             self.imageSliderChanged()
         if command == 'left':
             self.x_shifts[index] -=sps
+            self.parent.oplog.record("shift", index=index, x=-sps, y=0)
             data = self.actions.shiftProjection(self.data, -sps, 0, index)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'right':
             self.x_shifts[index] +=sps
+            self.parent.oplog.record("shift", index=index, x=sps, y=0)
             data = self.actions.shiftProjection(self.data, sps, 0, index)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'up':
             self.y_shifts[index] +=sps
+            self.parent.oplog.record("shift", index=index, x=0, y=-sps)
             data = self.actions.shiftProjection(self.data, 0, -sps, index)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'down':
             self.y_shifts[index] -=sps
+            self.parent.oplog.record("shift", index=index, x=0, y=sps)
             data = self.actions.shiftProjection(self.data, 0, sps, index) #image axis flipped
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'shiftLeft':
             self.x_shifts -=sps
+            self.parent.oplog.record("shift", index=None, x=-sps, y=0)
             data = self.actions.shiftStack(self.data, -sps, 0)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'shiftRight':
             self.x_shifts +=sps
+            self.parent.oplog.record("shift", index=None, x=sps, y=0)
             data = self.actions.shiftStack(self.data, sps, 0)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'shiftUp':
             self.y_shifts +=sps
+            self.parent.oplog.record("shift", index=None, x=0, y=-sps)
             data = self.actions.shiftStack(self.data, 0, -sps)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
         if command == 'shiftDown':
             self.y_shifts -=sps
+            self.parent.oplog.record("shift", index=None, x=0, y=sps)
             data = self.actions.shiftStack(self.data, 0, sps)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
@@ -415,6 +423,7 @@ class ImageProcessWidget(QtWidgets.QWidget):
 
     def downsample_params(self):
         data = self.data[:,:,::2,::2]
+        self.parent.oplog.record("downsample")
         self.dataChangedSig.emit(data)
         return
 
@@ -426,11 +435,13 @@ class ImageProcessWidget(QtWidgets.QWidget):
         element, projection, x_pos, y_pos, x_size, y_size, img = self.get_params()
         data = self.data
         data = self.actions.invert(data, element)
+        self.parent.oplog.record("invert", element=self.parent.elements[element])
         self.dataChangedSig.emit(data)
 
     def cut_params(self):
         element, projection, x_pos, y_pos, x_size, y_size, img = self.get_params()
         data = self.actions.cut(self.data, x_pos, y_pos, x_size, y_size)
+        self.parent.oplog.record("cut", x_pos=x_pos, y_pos=y_pos, x_size=x_size, y_size=y_size)
         self.ySizeChangedSig.emit(y_size)
         self.xSizeChangedSig.emit(x_size)
         self.dataChangedSig.emit(data)
@@ -463,6 +474,7 @@ class ImageProcessWidget(QtWidgets.QWidget):
 
         if valid:
             data = self.actions.padData(self.data, padding_x, padding_y, x_shifts, y_shifts, clip_x)
+            self.parent.oplog.record("pad", x=padding_x, y=padding_y, clip_edges=clip_x)
             for i in range(len(self.x_shifts)):
                 #TODO: if xy_shift exceeds xy dimension, then apply 2xy_padding_xy, else, dont.
                 if x_shifts[i] > x_dimension:
@@ -493,6 +505,7 @@ class ImageProcessWidget(QtWidgets.QWidget):
         x_shifts = self.x_shifts
         y_shifts = self.y_shifts
         #new = function(old)
+        self.parent.oplog.record("exclude", index=index)
         index, data, self.thetas, self.fnames, self.x_shifts, self.y_shifts = self.actions.exclude_projection(index, data, thetas, fnames, x_shifts, y_shifts)
         self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
         self.updateSldRange(index, self.thetas)
@@ -40,6 +40,7 @@
 
 
 from PyQt5 import QtWidgets, QtCore, QtGui
+import xrftomo
 from scipy import ndimage, optimize, signal
 import numpy as np
 
@@ -66,84 +67,10 @@ class ImageProcessActions(QtWidgets.QWidget):
 		self.centers = None
 
 	def shiftProjection(self, data, x, y, index):
-		X = int(x//1)
-		Y = int(y//1)
-		x = x - X
-		y = y - Y 
-
-		if x > 0: 
-			x_dir = 1
-		elif x < 0:
-			x_dir = -1
-		else:
-			x_dir = 0
-
-		if y > 0: 
-			y_dir = 1
-		elif x < 0:
-			y_dir = -1
-		else:
-			y_dir = 0
-
-		data[:,index] = np.roll(data[:, index], Y, axis=1)
-		data[:,index] = np.roll(data[:,index], X, axis=2)
-
-		if x_dir == 0 and y_dir == 0:
-			return data
-
-		else:
-			data_a = data*x
-			data_b = data*(1-x)
-			data_b = self.shiftProjection(data_b,x_dir,0, index)
-			data_c = data_a+data_b
-
-			data_a = data_c*y
-			data_b = data_c*(1-y)
-			data_b = self.shiftProjection(data_b,0,y_dir, index)
-			data = data_a+data_b
-
-			return data
+		return xrftomo.shift_projection(data, x, y, index)
 
 	def shiftStack(self, data, x, y):
-		X = int(x//1)
-		Y = int(y//1)
-		x = x - X
-		y = y - Y 
-
-		if x > 0: 
-			x_dir = 1
-		elif x < 0:
-			x_dir = -1
-		else:
-			x_dir = 0
-
-		if y > 0: 
-			y_dir = 1
-		elif x < 0:
-			y_dir = -1
-		else:
-			y_dir = 0
-
-		for i in range(data.shape[1]):
-			data[:,i] = np.roll(data[:,i],Y,axis=1) #negative because image coordinates are flipped
-		for i in range(data.shape[1]):
-			data[:,i] = np.roll(data[:,i],X, axis=2)
-
-		if x_dir == 0 and y_dir == 0:
-			return data
-
-		else:
-			data_a = data*x
-			data_b = data*(1-x)
-			data_b = self.shiftStack(data_b,x_dir,0)
-			data_c = data_a+data_b
-
-			data_a = data_c*y
-			data_b = data_c*(1-y)
-			data_b = self.shiftStack(data_b,0,y_dir)
-			data = data_a+data_b
-
-			return data
+		return xrftomo.shift_stack(data, x, y)
 
 	def normalize(self, data, sino):
 		intensities = np.sum(sino, axis=1)          #1D array;
@@ -175,9 +102,8 @@ class ImageProcessActions(QtWidgets.QWidget):
 		data_shape = data.shape
 
 		if len(data_shape) == 4 and clip_edges>=1:
-			new_data = np.zeros([data_shape[0], data_shape[1], data_shape[2]+y*2, data_shape[3]+x*2])
-			for i in range(data.shape[1]):
-				data = self.shiftProjection(data,-x_shifts[i],-y_shifts[i], i)
+			new_data = xrftomo.allocate_data([data_shape[0], data_shape[1], data_shape[2]+y*2, data_shape[3]+x*2])
+			data = xrftomo.shift_projections(data, -np.asarray(x_shifts), -np.asarray(y_shifts))
 
 			if x == 0:
 				new_data[:,:,y:-y,:] = data
@@ -186,13 +112,11 @@ class ImageProcessActions(QtWidgets.QWidget):
 			else:
 				new_data[:,:,y:-y,x+clip_edges:-x-clip_edges] = data[:,:,:,clip_edges:-clip_edges]
 
-			for i in range(data.shape[1]):
-				data = self.shiftProjection(data,x_shifts[i],y_shifts[i], i)
+			data = xrftomo.shift_projections(data, x_shifts, y_shifts)
 
 		elif len(data_shape) == 4 and clip_edges==0:
-			new_data = np.zeros([data_shape[0], data_shape[1], data_shape[2]+y*2, data_shape[3]+x*2])
-			for i in range(data.shape[1]):
-				data = self.shiftProjection(data,-x_shifts[i],-y_shifts[i], i)
+			new_data = xrftomo.allocate_data([data_shape[0], data_shape[1], data_shape[2]+y*2, data_shape[3]+x*2])
+			data = xrftomo.shift_projections(data, -np.asarray(x_shifts), -np.asarray(y_shifts))
 
 			if x == 0:
 				new_data[:,:,y:-y,:] = data
@@ -201,8 +125,7 @@ class ImageProcessActions(QtWidgets.QWidget):
 			else:
 				new_data[:,:,y:-y,x:-x] = data
 
-			for i in range(data.shape[1]):
-				data = self.shiftProjection(data,x_shifts[i],y_shifts[i], i)
+			data = xrftomo.shift_projections(data, x_shifts, y_shifts)
 
 		else: 
 			print("data not in [elment,projection,y,x] format")
@@ -346,15 +269,14 @@ class ImageProcessActions(QtWidgets.QWidget):
 		'''
 		num_elements = data.shape[0]
 		num_projections = data.shape[1]
-		temp_data = np.zeros([num_elements,num_projections, y_size, x_size])
+		temp_data = xrftomo.allocate_data([num_elements,num_projections, y_size, x_size])
 		frame_height = data.shape[2]
-		for i in range(num_projections):
-			for j in range(num_elements):
-				y0 = int(round(y_pos))
-				y1 = int(round(y0+y_size))
-				x0 = int(round(x_pos))
-				x1 = int(round(x_pos) + x_size)
-				temp_data[j,i,:,:] = data[j, i, frame_height-y1:frame_height-y0, x0:x1]
+		y0 = int(round(y_pos))
+		y1 = int(round(y0+y_size))
+		x0 = int(round(x_pos))
+		x1 = int(round(x_pos) + x_size)
+		for j in range(num_elements):
+			temp_data[j] = data[j, :, frame_height-y1:frame_height-y0, x0:x1]
 		print("done")
 		data = temp_data
 		return data
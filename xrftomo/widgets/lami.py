@@ -428,7 +428,7 @@ class LaminographyWidget(QtWidgets.QWidget):
         self.ViewControl.elem.clear()
         for j in self.elements:
             self.ViewControl.elem.addItem(j)
-            self.recon_dict[j] = np.zeros((self.y_range,self.data.shape[3],self.data.shape[3]))
+            self.recon_dict[j] = np.zeros((self.y_range,self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
 
         self.ViewControl.__dict__["fbp-filter"].setCurrentIndex(1)
         self.set_option_checked("fbp-filter")
@@ -464,12 +464,12 @@ class LaminographyWidget(QtWidgets.QWidget):
         self.sld.setValue(0)
         self.sld.setMaximum(ySize)
         for key in self.recon_dict.keys():
-            self.recon_dict[key] = np.zeros((ySize,self.data.shape[3],self.data.shape[3]))
+            self.recon_dict[key] = np.zeros((ySize,self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
         return
 
     def xSizeChanged(self, xSize):
         for key in self.recon_dict.keys():
-            self.recon_dict[key] = np.zeros((self.data.shape[2],xSize,xSize))
+            self.recon_dict[key] = np.zeros((self.data.shape[2],xSize,xSize), dtype=xrftomo.get_data_dtype())
         return
 
     def update_y_range(self):
@@ -568,7 +568,7 @@ class LaminographyWidget(QtWidgets.QWidget):
         for element_idx in elements:
             element = self.parent.elements[element_idx]
             self.ViewControl.elem.setCurrentIndex(element_idx)  # required to properly update recon_dict
-            empty_recon = np.zeros((data.shape[2], data.shape[3], data.shape[3]))  # empty array of size [y, x,x]
+            empty_recon = np.zeros((data.shape[2], data.shape[3], data.shape[3]), dtype=xrftomo.get_data_dtype())  # empty array of size [y, x,x]
             recon_dict[element] = empty_recon
             print("running reconstruction for:", element)
             if method == 0:
@@ -296,43 +296,7 @@ class LaminographyActions(QtWidgets.QWidget):
 		return recon
 
 	def shiftProjection(self, data, x, y, index):
-		X = int(x//1)
-		Y = int(y//1)
-		x = x - X
-		y = y - Y 
-
-		if x > 0: 
-			x_dir = 1
-		elif x < 0:
-			x_dir = -1
-		else:
-			x_dir = 0
-
-		if y > 0: 
-			y_dir = 1
-		elif x < 0:
-			y_dir = -1
-		else:
-			y_dir = 0
-
-		data[:,index] = np.roll(data[:,index], Y, axis=1)  #negative because image coordinates are flipped
-		data[:,index] = np.roll(data[:,index], X, axis=2)
-
-		if x_dir == 0 and y_dir == 0:
-			return data
-
-		else:
-			data_a = data*x
-			data_b = data*(1-x)
-			data_b = self.shiftProjection(data_b,x_dir,0, index)
-			data_c = data_a+data_b
-
-			data_a = data_c*y
-			data_b = data_c*(1-y)
-			data_b = self.shiftProjection(data_b,0,y_dir, index)
-			data = data_a+data_b
-
-			return data
+		return xrftomo.shift_projection(data, x, y, index)
 
 	def lam(self, stack, thetas, tiltangle, center_axis, interpolation="nearest_neighbor"):
 		# stack[theta,y,x]
@@ -343,7 +307,7 @@ class LaminographyActions(QtWidgets.QWidget):
 		n = stack.shape[2]
 		nz = stack.shape[1]
 		M = stack.shape[0]
-		reconstructed = np.zeros((nz, n, n))
+		reconstructed = np.zeros((nz, n, n), dtype=xrftomo.get_data_dtype())
 
 		for itheta in range(M):
 			data = stack[itheta]
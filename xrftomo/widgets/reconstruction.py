@@ -172,7 +172,7 @@ class ReconstructionWidget(QtWidgets.QWidget):
             self.ViewControl.method.addItem(methodname[k])
         for l in self.elements:
             # self.ViewControl.recon_set.addItem(l)
-            self.recon_dict[l] = np.zeros((self.y_range,self.data.shape[3],self.data.shape[3]))
+            self.recon_dict[l] = np.zeros((self.y_range,self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
 
         self.elementChanged()
         #TODO: recon_array will need to update with any changes to data dimensions as well as re-initialization
@@ -212,12 +212,12 @@ class ReconstructionWidget(QtWidgets.QWidget):
         self.sld.setValue(0)
         self.sld.setMaximum(ySize)
         for key in self.recon_dict.keys():
-            self.recon_dict[key] = np.zeros((ySize,self.data.shape[3],self.data.shape[3]))
+            self.recon_dict[key] = np.zeros((ySize,self.data.shape[3],self.data.shape[3]), dtype=xrftomo.get_data_dtype())
         return
 
     def xSizeChanged(self, xSize):
         for key in self.recon_dict.keys():
-            self.recon_dict[key] = np.zeros((self.data.shape[2],xSize,xSize))
+            self.recon_dict[key] = np.zeros((self.data.shape[2],xSize,xSize), dtype=xrftomo.get_data_dtype())
         return
 
     def update_y_range(self):
@@ -337,8 +337,7 @@ class ReconstructionWidget(QtWidgets.QWidget):
         data = self.data[:,:,top_row:bottom_row,:]
         show_stats = self.ViewControl.recon_stats.isChecked()
         num_xsections = data.shape[2]
-        recons = np.zeros((data.shape[2], data.shape[3], data.shape[3]))  # empty array of size [y, x,x]
-        xsection = np.zeros((1, data.shape[1], 1, data.shape[3]))  # empty array size [1(element), frames, 1(y), x]
+        recons = np.zeros((data.shape[2], data.shape[3], data.shape[3]), dtype=xrftomo.get_data_dtype())  # empty array of size [y, x,x]
         recon_dict = self.recon_dict.copy()
         if self.ViewControl.recon_save.isChecked():
             try: #promps for directory and subdir folder
@@ -364,7 +363,7 @@ class ReconstructionWidget(QtWidgets.QWidget):
 
         for element in elements:
             self.ViewControl.combo1.setCurrentIndex(element)    #required to properly update recon_dict
-            recons = np.zeros((data.shape[2], data.shape[3], data.shape[3]))  # empty array of size [y, x,x]
+            recons = np.zeros((data.shape[2], data.shape[3], data.shape[3]), dtype=xrftomo.get_data_dtype())  # empty array of size [y, x,x]
             if self.ViewControl.recon_save.isChecked():
                 #get list of element names from list of elemnt indices
                 element_names = [self.ViewControl.combo1.itemText(idx) for idx in elements]
@@ -377,34 +376,29 @@ class ReconstructionWidget(QtWidgets.QWidget):
                 os.makedirs(savepath)
 
             top_row = int(eval(self.ViewControl.top_row.text()))
-            print("working fine")
+            if method != 8:
+                print("reconstructing {} rows".format(num_xsections))
+                # rows from the top of the frame down, as replay reconstructs them
+                recons = self.actions.reconstruct(data[:, :, ::-1], element, center, method, beta, delta, iters, thetas)
             for i in range(num_xsections):
                 if method ==8:
                     break
                 j = num_xsections - i - 1
-                xsection[0, :, 0] = data[element, :, j]
-                cent = center
-
-                if method!= 1 and method !=8:  #all methods other than gridrec
-                    recon = self.actions.reconstruct(xsection, 0, cent, method, beta, delta, 1, thetas, None)
-                    for k in range(1, iters):
-                        recon = self.actions.reconstruct(xsection, 0, cent, method, beta, delta, 1, thetas, recon)
-                        print("reconstructing row {}/{} on iteration{}".format(i+1,num_xsections,k))
-
-                if method == 1:        #gridrec
-                    recon = self.actions.reconstruct(xsection, 0, cent, method, beta, delta, 1, thetas, None)
-                    print("reconstructing row{}/{}".format(i+1, num_xsections))
-
-                recons[i] = recon[0]
+                recon = recons[i:i+1]
                 if self.ViewControl.recon_save.isChecked():
                     self.writer.save_reconstruction(recon, savedir, top_row+i)
-                err, mse = self.actions.assessRecon(recon, xsection[0,:,0], thetas, show_plots=False)
+                err, mse = self.actions.assessRecon(recon, data[element, :, j], thetas, show_plots=False)
                 print("mse: ",mse)
 
             #TODO: Update recon_dict and recon display.
             recon_dict[self.ViewControl.combo1.itemText(element)] = np.array(recons)
             self.recon = np.array(recons)
 
+        if method != 8:
+            self.parent.oplog.record("reconstruct", elements=[self.ViewControl.combo1.itemText(idx) for idx in elements],
+                                     method=method, beta=beta, delta=delta, iters=iters,
+                                     top_row=int(eval(self.ViewControl.top_row.text())),
+                                     bottom_row=int(eval(self.ViewControl.bottom_row.text())))
         # self.ViewControl.mulBtn.setEnabled(True)
         # self.ViewControl.divBtn.setEnabled(True)
         self.update_recon_image()
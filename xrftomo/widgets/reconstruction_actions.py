@@ -43,7 +43,6 @@ from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import pyqtSignal
 import xrftomo
-import tomopy
 import os
 # from matplotlib.pyplot import *
 import matplotlib.pyplot as plt
@@ -66,49 +65,12 @@ class ReconstructionActions(QtWidgets.QWidget):
 		self.writer = xrftomo.SaveOptions(self)
 		sys.stdout = xrftomo.gui.Stream(newText=self.parent.parent.onUpdateText)
 
-	def reconstruct(self, data, element, center, method, beta, delta, iters, thetas, guess=None):
+	def reconstruct(self, data, element, center, method, beta, delta, iters, thetas):
 		'''
-		load data for reconstruction and load variables for reconstruction
-		make it sure that data doesn't have infinity or nan as one of
-		entries
+		reconstruct every row of data[element] with the selected method, the same
+		way xrftomo replay does; returns [row, x, x]
 		'''
-		recData = data[element, :, :, :]
-		recData[recData == np.inf] = True
-		recData[np.isnan(recData)] = True
-		recCenter = np.array(center, dtype=np.float32)
-
-
-		if method == 0:
-			recon = tomopy.recon(recData, thetas * np.pi / 180, algorithm='mlem', center=recCenter, num_iter=1, init_recon=guess, accelerated=False, device='cpu')
-		elif method == 1:
-			recon= tomopy.recon(recData, thetas * np.pi / 180, algorithm='gridrec',center=recCenter, init_recon=guess)
-			recon= recon/1.49
-		elif method == 2:
-			recon= tomopy.recon(recData, thetas * np.pi / 180, algorithm='art', num_iter=iters)
-			recon= recon/1.49
-		elif method == 3:
-			recon= tomopy.recon(recData, thetas * np.pi / 180, algorithm='pml_hybrid', center=recCenter, reg_par=np.array([beta, delta], dtype=np.float32), num_iter=iters)
-		elif method == 4:
-			recon = tomopy.recon(recData, thetas * np.pi / 180, algorithm='pml_quad', center=recCenter, reg_par=np.array([beta, delta], dtype=np.float32), num_iter=iters)
-		elif method == 5:
-			recon= tomopy.recon(recData, thetas * np.pi / 180, algorithm='fbp')
-		elif method == 6:
-			recon= tomopy.recon(recData, thetas * np.pi / 180, algorithm='sirt', num_iter=iters)
-		elif method == 7:
-			recon = tomopy.recon(recData, thetas * np.pi / 180, algorithm='tv', center=recCenter, reg_par=np.array([beta, delta], dtype=np.float32), num_iter=iters)
-		# elif method == 8:
-		# 	recon = self.FBP(recData, thetas, 30, bpfilter=1, tau=1.0)
-
-		# recon[recon<0] = 0
-		#tomopy.remove_nan() does not remove inf values
-		recon = tomopy.remove_nan(recon)
-
-		if np.isinf(recon).max():
-			print("WARNING: inf values found in reconstruction, consider reconstructing with less iterations")
-			print("inf values replaced with 0.001")
-			recon[recon == np.inf] = 0.001
-
-		return recon
+		return xrftomo.reconstruct_slices(data[element], thetas, method, beta, delta, iters, center)
 
 	def reconstructAll(self, data, element_names, center, method, beta, delta, iters, thetas,start_idx):
 		print("This will take a while")
@@ -119,19 +81,10 @@ class ReconstructionActions(QtWidgets.QWidget):
 			savepath = save_path+'/'+element_names[i]
 			savedir = savepath+'/'+element_names[i]
 			os.makedirs(savepath)
-			num_xsections = data.shape[2]
-			recons = np.zeros((data.shape[2], data.shape[3], data.shape[3]))  # empty array of size [y, x,x]
-			xsection = np.zeros((1, data.shape[1], 1, data.shape[3]))  # empty array size [1(element), frames, 1(y), x]
-			for l in range(num_xsections):
-				j = num_xsections - l - 1
-				xsection[0, :, 0] = data[i, :, j]
-				guess = self.reconstruct(xsection, 0, center, method, beta, delta, 5, thetas, 0, False, None)
-				for k in range(5, iters):
-					guess = self.reconstruct(xsection, 0, center, method, beta, delta, 1, thetas, 0, False,guess)
-					recons[i] = guess[0]
-					print("reconstructing row {} on iteration{}".format(l, k))
-				self.writer.save_reconstruction(guess, savedir, start_idx + l)
-		return np.array(recons)
+			recons = self.reconstruct(data[:, :, ::-1], i, center, method, beta, delta, iters, thetas)
+			for l in range(recons.shape[0]):
+				self.writer.save_reconstruction(recons[l:l+1], savedir, start_idx + l)
+		return recons
 
 	def lam(self, stack, thetas, tiltangle, interpolation="nearest_neighbor"):
 		# stack[theta,y,x]
@@ -141,7 +94,7 @@ class ReconstructionActions(QtWidgets.QWidget):
 		n = stack.shape[2]
 		nz = stack.shape[1]
 		M = stack.shape[0]
-		reconstructed = np.zeros((nz, n, n))
+		reconstructed = np.zeros((nz, n, n), dtype=xrftomo.get_data_dtype())
 
 		for itheta in range(M):
 			data = stack[itheta]
@@ -334,43 +287,7 @@ class ReconstructionActions(QtWidgets.QWidget):
 		return mask
 
 	def shiftProjection(self, data, x, y, index):
-		X = int(x//1)
-		Y = int(y//1)
-		x = x - X
-		y = y - Y 
-
-		if x > 0: 
-			x_dir = 1
-		elif x < 0:
-			x_dir = -1
-		else:
-			x_dir = 0
-
-		if y > 0: 
-			y_dir = 1
-		elif x < 0:
-			y_dir = -1
-		else:
-			y_dir = 0
-
-		data[:,index] = np.roll(data[:,index], Y, axis=1)  #negative because image coordinates are flipped
-		data[:,index] = np.roll(data[:,index], X, axis=2)
-
-		if x_dir == 0 and y_dir == 0:
-			return data
-
-		else:
-			data_a = data*x
-			data_b = data*(1-x)
-			data_b = self.shiftProjection(data_b,x_dir,0, index)
-			data_c = data_a+data_b
-
-			data_a = data_c*y
-			data_b = data_c*(1-y)
-			data_b = self.shiftProjection(data_b,0,y_dir, index)
-			data = data_a+data_b
-
-			return data
+		return xrftomo.shift_projection(data, x, y, index)
 
 	def reconMultiply(self, recon):
 		'''
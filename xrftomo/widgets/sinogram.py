@@ -44,7 +44,6 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import pyqtSignal
 import pyqtgraph
 import numpy as np
-import scipy.ndimage
 import sys
 
 class SinogramWidget(QtWidgets.QWidget):
@@ -75,6 +74,7 @@ class SinogramWidget(QtWidgets.QWidget):
         self.y_padding_hist = [0]
         self.sub_pixel_shift = 1
         self.fnames = None
+        self.hs_seeds = {}
 
         self.view_options = QtWidgets.QComboBox()
         self.view_options.setFixedWidth(button2size)
@@ -148,6 +148,7 @@ class SinogramWidget(QtWidgets.QWidget):
         self.ViewControl.phase.returnPressed.connect(self.updateSinoPlot)
         self.ViewControl.offst.returnPressed.connect(self.updateSinoPlot)
         self.ViewControl.set2line.clicked.connect(self.fit_curve)
+        self.ViewControl.track.clicked.connect(self.track_hotspot_params)
         self.ViewControl.fit_line.clicked.connect(self.fitLine_params)
         self.ViewControl.fit_sine.clicked.connect(self.fitSine_params)
         self.ViewControl.fit_y.clicked.connect(self.fitY_params)
@@ -251,47 +252,55 @@ class SinogramWidget(QtWidgets.QWidget):
         sps = self.sub_pixel_shift
         if command == 'left':
             self.x_shifts[index] -= sps
+            self.parent.oplog.record("shift", index=index, x=-sps, y=0)
             data = self.actions.shiftProjection(self.data, -sps, 0, index)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'right':
             self.x_shifts[index] +=sps
+            self.parent.oplog.record("shift", index=index, x=sps, y=0)
             data = self.actions.shiftProjection(self.data, sps, 0, index)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'up':
             self.y_shifts[index] +=sps
+            self.parent.oplog.record("shift", index=index, x=0, y=-sps)
             data = self.actions.shiftProjection(self.data, 0, -sps, index)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'down':
             self.y_shifts[index] -=sps
+            self.parent.oplog.record("shift", index=index, x=0, y=sps)
             data = self.actions.shiftProjection(self.data, 0, sps, index)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
         if command == 'shiftLeft':
             self.x_shifts -=sps
+            self.parent.oplog.record("shift", index=None, x=-sps, y=0)
             data = self.actions.shiftStack(self.data, -sps, 0)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'shiftRight':
             self.x_shifts +=sps
+            self.parent.oplog.record("shift", index=None, x=sps, y=0)
             data = self.actions.shiftStack(self.data, sps, 0)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'shiftUp':
             self.y_shifts +=sps
+            self.parent.oplog.record("shift", index=None, x=0, y=-sps)
             data = self.actions.shiftStack(self.data, 0, -sps)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
             return
         if command == 'shiftDown':
             self.y_shifts -=sps
+            self.parent.oplog.record("shift", index=None, x=0, y=sps)
             data = self.actions.shiftStack(self.data, 0, sps)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
@@ -303,6 +312,7 @@ class SinogramWidget(QtWidgets.QWidget):
     def showImgProcess(self):
         self.posMat = np.zeros((5,int(self.data.shape[1]),2))
         self.imageView.hotSpotNumb = 0
+        self.hs_seeds = {}
         num_projections  = self.data.shape[1]
         self.sld2.setRange(0, num_projections - 1)
 
@@ -415,9 +425,8 @@ class SinogramWidget(QtWidgets.QWidget):
             shifts = middl - curve
             x_shifts, y_shifts = self.actions.validate_alignment(data, shifts, self.y_shifts)
 
-            for i in range(data.shape[0]):
-                for j in range(len(x_shifts)):
-                    data[i,j] = scipy.ndimage.shift(data[i,j], (0,x_shifts[j]), output=None, order=3, mode='grid-wrap', cval=0.0, prefilter=True)
+            data = self.actions.shift_all(data, x_shifts)
+            self.parent.oplog.record("align", method="fit_curve", x_shifts=x_shifts)
             self.alignmentChangedSig.emit(self.x_shifts + shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
             return
@@ -460,6 +469,7 @@ class SinogramWidget(QtWidgets.QWidget):
         self.sld2.setValue(index)
         self.imageChanged()
         self.posMat = np.zeros((5,int(self.data.shape[1]), 2))
+        self.hs_seeds = {}
 
     def updateDiffSldRange(self, index, thetas):
         element = self.ViewControl.combo1.currentIndex()
@@ -551,6 +561,7 @@ class SinogramWidget(QtWidgets.QWidget):
         if self.ViewControl.constrain_y.isChecked():
             y_shifts =np.zeros_like(y_shifts)
 
+        self.parent.oplog.record("align", method="fitLine", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts - y_shifts)
@@ -574,6 +585,7 @@ class SinogramWidget(QtWidgets.QWidget):
         if self.ViewControl.constrain_y.isChecked():
             y_shifts =np.zeros_like(y_shifts)
 
+        self.parent.oplog.record("align", method="fitSine", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts +y_shifts)
@@ -595,6 +607,7 @@ class SinogramWidget(QtWidgets.QWidget):
             y_shifts = np.zeros_like(y_shifts)
 
         x_shifts = np.zeros_like(self.x_shifts)
+        self.parent.oplog.record("align", method="fitY", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts + y_shifts)
@@ -614,6 +627,7 @@ class SinogramWidget(QtWidgets.QWidget):
 
         if mouse_button == 1:
             self.posMat[int(hs_group), int(hs_number)-1] = [x_pos, y_pos]
+            self.hs_seeds[int(hs_group)] = (hs_number, x_pos, y_pos)
             if hs_number < self.posMat.shape[1]:
                 print("Total projections", self.posMat.shape[1], "current position", hs_number+1, "group number", hs_group + 1)
                 hs_number += 1
@@ -635,8 +649,30 @@ class SinogramWidget(QtWidgets.QWidget):
                 self.sld2.setValue(self.sld2.value() + 1)
                 self.imageSliderChanged()
 
+    def track_hotspot_params(self):
+        '''
+        follows the last hotspot clicked in every group through all projections
+        and fills posMat with the tracked ROI positions
+        '''
+        if not self.hs_seeds:
+            print("select a hotspot in one projection first")
+            return
+        element = self.ViewControl.combo1.currentIndex()
+        x_size = self.imageView.xSize
+        y_size = self.imageView.ySize
+        for hs_group, (index, x_pos, y_pos) in sorted(self.hs_seeds.items()):
+            x_pos, y_pos = xrftomo.track_hotspot(self.data[element], self.thetas, index, x_pos, y_pos, x_size, y_size)
+            self.posMat[hs_group, :, 0] = x_pos
+            self.posMat[hs_group, :, 1] = y_pos
+            print("tracked hotspot group", hs_group + 1, "through", len(x_pos), "projections")
+        self.ViewControl.clear_data.setEnabled(True)
+        self.ViewControl.fit_y.setEnabled(True)
+        self.ViewControl.fit_sine.setEnabled(True)
+        self.ViewControl.fit_line.setEnabled(True)
+
     def clrHotspot_params(self):
         self.posMat = self.actions.clrHotspot(self.posMat)
+        self.hs_seeds = {}
         self.ViewControl.clear_data.setEnabled(False)
         self.ViewControl.fit_y.setEnabled(False)
         self.ViewControl.fit_sine.setEnabled(False)
@@ -654,6 +690,7 @@ class SinogramWidget(QtWidgets.QWidget):
 
         for i in range(num_projections):
             data[:,i] = np.roll(data[:,i],int(shift_arr[i]),axis=2)
+        self.parent.oplog.record("align", method="rot_axis", x_shifts=shift_arr)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + shift_arr, self.y_shifts)
         return
@@ -701,6 +738,7 @@ class SinogramWidget(QtWidgets.QWidget):
         x_shifts = data.shape[3]//2 - rot_center
 
         if x_shifts !=0:
+            self.parent.oplog.record("shift", index=None, x=x_shifts, y=0)
             data = self.actions.shiftStack(data, x_shifts, 0)
             self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts)
             self.dataChangedSig.emit(data)
@@ -767,6 +805,7 @@ class SinogramWidget(QtWidgets.QWidget):
         if self.ViewControl.constrain_y.isChecked():
             y_shifts =np.zeros_like(y_shifts)
 
+        self.parent.oplog.record("align", method="centerOfMass", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -809,6 +848,7 @@ class SinogramWidget(QtWidgets.QWidget):
         if self.ViewControl.constrain_y.isChecked():
             y_shifts =np.zeros_like(y_shifts)
 
+        self.parent.oplog.record("align", method="fit_peaks", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -820,6 +860,7 @@ class SinogramWidget(QtWidgets.QWidget):
         thetas = self.thetas
 
         data, self.sinogramData = self.actions.shift(sinoData, data, shift_dir, col_number)
+        self.parent.oplog.record("shift", index=col_number, x=shift_dir, y=0)
         self.x_shifts[col_number] += shift_dir
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts)
@@ -844,6 +885,7 @@ class SinogramWidget(QtWidgets.QWidget):
         if self.ViewControl.constrain_y.isChecked():
             y_shifts =np.zeros_like(y_shifts)
 
+        self.parent.oplog.record("align", method="crossCorrelate", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data, x_shifts, y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -867,6 +909,7 @@ class SinogramWidget(QtWidgets.QWidget):
             if self.ViewControl.constrain_y.isChecked():
                 y_shifts =np.zeros_like(y_shifts)
 
+            self.parent.oplog.record("align", method="xcorrdy", x_shifts=x_shifts, y_shifts=y_shifts)
             data = self.actions.shift_all(data, x_shifts, y_shifts)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -894,6 +937,7 @@ class SinogramWidget(QtWidgets.QWidget):
             if self.ViewControl.constrain_y.isChecked():
                 y_shifts = np.zeros_like(y_shifts)
 
+            self.parent.oplog.record("align", method="xcorry", x_shifts=x_shifts, y_shifts=y_shifts)
             data = self.actions.shift_all(data,x_shifts,y_shifts)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -913,6 +957,7 @@ class SinogramWidget(QtWidgets.QWidget):
 
         x_shifts = self.actions.validate_alignment(data, x_shifts)
         y_shifts = np.zeros_like(self.y_shifts)
+        self.parent.oplog.record("align", method="xcorsino", x_shifts=x_shifts, y_shifts=y_shifts)
         data = self.actions.shift_all(data,x_shifts,y_shifts)
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts)
@@ -942,6 +987,7 @@ class SinogramWidget(QtWidgets.QWidget):
             if self.ViewControl.constrain_y.isChecked():
                 y_shifts =np.zeros_like(y_shifts)
             x_shifts = np.zeros_like(self.x_shifts)
+            self.parent.oplog.record("align", method="move2edge", x_shifts=x_shifts, y_shifts=y_shifts)
             data = self.actions.shift_all(data,x_shifts,y_shifts)
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts, self.y_shifts+y_shifts)
@@ -968,6 +1014,8 @@ class SinogramWidget(QtWidgets.QWidget):
                 self.ViewControl.center_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
                 return
         iters = int(self.ViewControl.iter_textbox.text())
+        levels = int(self.ViewControl.levels_textbox.text())
+        tol = float(self.ViewControl.tol_textbox.text())
         blur_bool = self.ViewControl.blur_checkbox.isChecked()
         save_bool = self.ViewControl.save_checkbox.isChecked()
         debug_bool = self.ViewControl.debug_checkbox.isChecked()
@@ -985,15 +1033,24 @@ class SinogramWidget(QtWidgets.QWidget):
             rout = None
 
         #TODO: if sender from seq, run seq_align, else run iter_align
+        if self.ViewControl.native_btn.isChecked():
+            x_shifts, y_shifts, data = self.actions.reprojection_align(element, data, thetas, pad, blur_bool, rin, rout,
+                                                                    center, algorithm, upsample_factor, iters, tol)
+            self.parent.oplog.record("align", method="reprojection_align", x_shifts=x_shifts, y_shifts=y_shifts)
+            self.dataChangedSig.emit(data)
+            self.alignmentChangedSig.emit(self.x_shifts+x_shifts, self.y_shifts+y_shifts)
+            return
+
         if self.ViewControl.seq_btn.isChecked():
             x_shifts, y_shifts, data = self.actions.sequential_align(element, data, thetas, pad, blur_bool, rin, rout,
                                                                     center, algorithm, upsample_factor, save_bool,
-                                                                    debug_bool, iters)
+                                                                    debug_bool, iters, levels, tol)
 
         else:
             x_shifts, y_shifts, data = self.actions.iterative_align(element, data, thetas, pad, blur_bool, rin, rout,
                                                                     center, algorithm, upsample_factor, save_bool,
-                                                                    debug_bool, iters)
+                                                                    debug_bool, iters, levels, tol)
+        self.parent.oplog.record("align", method="iter_align", x_shifts=x_shifts, y_shifts=y_shifts, interpolation="linear")
         self.dataChangedSig.emit(data)
         self.alignmentChangedSig.emit(self.x_shifts+x_shifts, self.y_shifts+y_shifts)
         return
@@ -1009,6 +1066,7 @@ class SinogramWidget(QtWidgets.QWidget):
         x_padding = self.x_padding_hist[-1]
         try:
             data, x_shifts, y_shifts = self.actions.alignFromText1(fileName, data, data_fnames, x_padding)
+            self.parent.oplog.record("align", method="alignFromText", x_shifts=x_shifts, y_shifts=y_shifts)
             # self.restoreSig.emit() #DO not restore this must be done manually else error occur.
             self.dataChangedSig.emit(data)
             self.alignmentChangedSig.emit(self.x_shifts + x_shifts, self.y_shifts + y_shifts)
@@ -1029,5 +1087,6 @@ class SinogramWidget(QtWidgets.QWidget):
         data = self.data
         hs_group = self.ViewControl.hs_group.currentIndex()
         posMat = self.posMat
+        self.actions.hotspot_method = self.ViewControl.hs_fit.currentText()
 
         return element, x_size, y_size, hs_group, posMat, data
\ No newline at end of file
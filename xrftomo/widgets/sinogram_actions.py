@@ -39,12 +39,13 @@
 ###########################################################################
 
 from PyQt5 import QtGui, QtCore, QtWidgets
+import logging
+import time
 import scipy.fftpack as spf
 from scipy import ndimage, optimize, signal
 import tomopy
-from skimage import filters
-from skimage.measure import regionprops
 import numpy as np
+import xrftomo
 from matplotlib import pyplot as plt
 from skimage.color import rgb2gray
 from skimage.transform import warp
@@ -54,6 +55,8 @@ from skimage.registration import phase_cross_correlation
 from scipy.signal import find_peaks
 import matplotlib; matplotlib.use('Agg')
 
+LOG = logging.getLogger(__name__)
+
 class SinogramActions(QtWidgets.QWidget):
     def __init__(self):
         super(SinogramActions, self).__init__()
@@ -61,6 +64,7 @@ class SinogramActions(QtWidgets.QWidget):
         self.y_shifts = None
         self.original_data = None
         self.padding = None
+        self.hotspot_method = 'parabola'
 
     def run_fit_peaks(self,element,data):
         stack = data[element]
@@ -126,119 +130,34 @@ class SinogramActions(QtWidgets.QWidget):
         thetas: ndarray
             sorted projection angle list
         '''
-        num_projections = data.shape[1]
         view_center_x = data.shape[3]//2
         view_center_y = data.shape[2]//2
 
-        w_x_shifts = []
-        w_y_shifts = []
-        for i in range(num_projections):
-            image = data[element, i]
-            threshold_value = filters.threshold_otsu(image)
-            labeled_foreground = (image > threshold_value).astype(int)
-            properties = regionprops(labeled_foreground, image)
-            #TODO: if input image is blank, WCoM will fail, create an exception case.
-            weighted_center_of_mass = properties[0].weighted_centroid
-            w_x_shifts.append(int(round(view_center_x - weighted_center_of_mass[1])))
-            w_y_shifts.append(int(round(view_center_y - weighted_center_of_mass[0])))
-            data = self.shiftProjection(data, w_x_shifts[i], 0, i)
-            data = self.shiftProjection(data, 0, w_y_shifts[i], i)
+        stack = data[element]
+        thresholds = xrftomo.threshold_otsu_stack(stack)
+        center_y, center_x = xrftomo.weighted_centroids(stack, stack > thresholds[:, None, None])
+        # blank projections have no centroid and are left in place
+        w_x_shifts = np.nan_to_num(np.round(view_center_x - center_x)).astype(int)
+        w_y_shifts = np.nan_to_num(np.round(view_center_y - center_y)).astype(int)
+        data = xrftomo.shift_projections(data, w_x_shifts, w_y_shifts)
 
         return data, np.asarray(w_x_shifts), -np.asarray(w_y_shifts)
 
 
     def shift_all(self, data, x_shifts, y_shifts = None):
-        num_elements = data.shape[0]
-        num_projections = data.shape[1]
+        '''
+        applies one (x, y) shift per projection to every element, cubic spline
+        interpolation with wrap-around; positive y moves the image up.
+        '''
         if y_shifts is None:
-            for i in range(num_elements):
-                for j in range(num_projections):
-                    data[i,j] = scipy.ndimage.shift(data[i,j], (np.zeros_like(x_shifts)[j],x_shifts[j]), output=None, order=3, mode='grid-wrap', cval=0.0, prefilter=True)
-        else:
-            for i in range(num_elements):
-                for j in range(num_projections):
-                    data[i,j] = scipy.ndimage.shift(data[i,j],(-y_shifts[j],x_shifts[j]), output=None, order=3, mode='grid-wrap', cval=0.0, prefilter=True)
+            y_shifts = np.zeros(len(x_shifts))
+        return xrftomo.shift_projections(data, x_shifts, -np.asarray(y_shifts, dtype=float), method='spline', workers=None)
 
-        return data
     def shiftProjection(self, data, x, y, index):
-        X = int(x//1)
-        Y = int(y//1)
-        x = x - X
-        y = y - Y
-
-        if x > 0:
-            x_dir = 1
-        elif x < 0:
-            x_dir = -1
-        else:
-            x_dir = 0
-
-        if y > 0:
-            y_dir = 1
-        elif x < 0:
-            y_dir = -1
-        else:
-            y_dir = 0
-
-        data[:,index] = np.roll(data[:,index], Y, axis=1)  #negative because image coordinates are flipped
-        data[:,index] = np.roll(data[:,index], X, axis=2)
-
-        if x_dir == 0 and y_dir == 0:
-            return data
-
-        else:
-            data_a = data*x
-            data_b = data*(1-x)
-            data_b = self.shiftProjection(data_b,x_dir,0, index)
-            data_c = data_a+data_b
-
-            data_a = data_c*y
-            data_b = data_c*(1-y)
-            data_b = self.shiftProjection(data_b,0,y_dir, index)
-            data = data_a+data_b
-
-            return data
+        return xrftomo.shift_projection(data, x, y, index)
 
     def shiftStack(self, data, x, y):
-        X = int(x//1)
-        Y = int(y//1)
-        x = x - X
-        y = y - Y
-
-        if x > 0:
-            x_dir = 1
-        elif x < 0:
-            x_dir = -1
-        else:
-            x_dir = 0
-
-        if y > 0:
-            y_dir = 1
-        elif x < 0:
-            y_dir = -1
-        else:
-            y_dir = 0
-
-        for i in range(data.shape[1]):
-            data[:,i] = np.roll(data[:,i],Y,axis=1)
-        for i in range(data.shape[1]):
-            data[:,i] = np.roll(data[:,i],X, axis=2)
-
-        if x_dir == 0 and y_dir == 0:
-            return data
-
-        else:
-            data_a = data*x
-            data_b = data*(1-x)
-            data_b = self.shiftStack(data_b,x_dir,0)
-            data_c = data_a+data_b
-
-            data_a = data_c*y
-            data_b = data_c*(1-y)
-            data_b = self.shiftStack(data_b,0,y_dir)
-            data = data_a+data_b
-
-            return data
+        return xrftomo.shift_stack(data, x, y)
 
     def shift(self, sinogramData, data, shift_number, col_number):
         '''
@@ -253,13 +172,10 @@ class SinogramActions(QtWidgets.QWidget):
             amount of pixel shifting done per column
         col_number: int
         '''
-        num_projections = data.shape[1]
         regShift = np.zeros(sinogramData.shape[0], dtype="int")
         sinogramData[col_number * 10:col_number * 10 + 10, :] = np.roll(sinogramData[col_number * 10:col_number * 10 + 10, :], shift_number, axis=1)
         regShift[col_number] += shift_number
-        for i in range(num_projections):
-            # data[:,i,:,:] = np.roll(data[:,i,:,:], regShift[i], axis=2)
-            data = self.shiftProjection(data, regShift[i],0,i)
+        data = xrftomo.shift_projections(data, regShift, np.zeros_like(regShift))
         return data, sinogramData
 
     def slope_adjust(self, sinogramData, data, shift, delta):
@@ -305,23 +221,9 @@ class SinogramActions(QtWidgets.QWidget):
         num_projections = data.shape[1]
         x_shifts = np.zeros(num_projections)
         y_shifts = np.zeros(num_projections)
-        for i in range(num_projections - 1):
-            a = data[element, i, :, :]
-            b = data[element, i + 1, :, :]
-
-            fa = spf.fft2(a)
-            fb = spf.fft2(b)
-            shape = a.shape
-            c = abs(spf.ifft2(fa * fb.conjugate()))
-            t0, t1 = np.unravel_index(np.argmax(c), a.shape)
-
-            if t0 > shape[0] // 2:
-                t0 -= shape[0]
-            if t1 > shape[1] // 2:
-                t1 -= shape[1]
-
-            x_shifts[i + 1] += t1
-            y_shifts[i + 1] += t0
+        t0, t1 = xrftomo.correlate_neighbours(data[element])
+        x_shifts[1:] += t1
+        y_shifts[1:] += t0
 
         self.alignmentDone()
         return x_shifts, -y_shifts
@@ -335,16 +237,13 @@ class SinogramActions(QtWidgets.QWidget):
         data: ndarray
             4D xrf dataset ndarray [elements, theta, y,x]
         '''
-        num_projections = data.shape[1]
-        x_shifts = np.zeros(num_projections)
-        y_shifts = np.zeros(num_projections)
-        for i in range(1, num_projections):
-            shift, error, diffphase = phase_cross_correlation(data[element,i-1], data[element,i],upsample_factor=100)
-            x_shifts[i] += round(shift[1],2)
-            y_shifts[i] += round(shift[0],2)
-            # data[:,i] = scipy.ndimage.shift(data[:,i],(y_shifts[i],x_shifts[i]), output=None, order=3, mode='grid-wrap', cval=0.0, prefilter=True)
-            for j in range(data.shape[0]):
-                data[j,i] = scipy.ndimage.shift(data[j,i], (y_shifts[i], x_shifts[i]), output=None, order=3, mode='grid-wrap', cval=0.0, prefilter=True)
+        # projection i used to be registered to projection i-1 after the latter
+        # had been shifted, so its shift is the running sum of the pair shifts,
+        # folded into the frame as crossCorrelate does
+        shifts = np.round(xrftomo.register_stack(data[element], upsample_factor=100), 2)
+        y_shifts = np.round(xrftomo.wrap_shifts(np.cumsum(shifts[:, 0]), data.shape[2]), 2)
+        x_shifts = np.round(xrftomo.wrap_shifts(np.cumsum(shifts[:, 1]), data.shape[3]), 2)
+        data = self.shift_all(data, x_shifts, -y_shifts)
 
         self.alignmentDone()
         return data, x_shifts, -y_shifts
@@ -699,11 +598,7 @@ class SinogramActions(QtWidgets.QWidget):
                 sino = data[element, :, i, :]
 
         sino = data[element,:,layer,:] #TODO: IndexError when contrained to ROI
-        x_shifts = np.zeros(data.shape[1])
-        for i in range(1,sino.shape[0]):
-            shift, error, diffphase = phase_cross_correlation(sino[0], sino[i], upsample_factor=100)
-            x_shifts[i] = shift[0]
-
+        x_shifts = xrftomo.register_stack(sino, upsample_factor=100, reference=0)[:, 0]
 
         return x_shifts
 
@@ -720,28 +615,13 @@ class SinogramActions(QtWidgets.QWidget):
         num_projections = data.shape[1]
         x_shifts = np.zeros(num_projections)
         y_shifts = np.zeros(num_projections)
-        for i in range(num_projections - 1):
-            # onlyfilenameIndex=self.fileNames[i+1].rfind("/")
-            a = data[element, i, :, :]
-            b = data[element, i + 1, :, :]
-
-            fa = spf.fft2(a)
-            fb = spf.fft2(b)
-
-            shape = a.shape
-            c = abs(spf.ifft2(fa * fb.conjugate() / (abs(fa) * abs(fb))))
-            t0, t1 = np.unravel_index(np.argmax(c), a.shape)
-            if t0 > shape[0] // 2:
-                t0 -= shape[0]
-            if t1 > shape[1] // 2:
-                t1 -= shape[1]
-
-            # data[:, i + 1] = np.roll(data[:, i + 1], t0, axis=1)
-            # data[:, i + 1] = np.roll(data[:, i + 1], t1, axis=2)
-            data = self.shiftProjection(data,t1,t0,i+1)
-
-            x_shifts[i + 1] += t1
-            y_shifts[i + 1] += -t0
+        # each projection is correlated against its already shifted neighbour,
+        # so the shift of projection i+1 is the running sum of the pair shifts
+        t0, t1 = xrftomo.correlate_neighbours(data[element], phase=True)
+        x_shifts[1:] += xrftomo.wrap_shifts(np.cumsum(t1), data.shape[3])
+        y_shifts[1:] += xrftomo.wrap_shifts(np.cumsum(t0), data.shape[2])
+        data = xrftomo.shift_projections(data, x_shifts, y_shifts)
+        y_shifts = -y_shifts
         self.alignmentDone()
         return data, x_shifts, y_shifts
     # def align_y_top(self, element, data):
@@ -802,59 +682,38 @@ class SinogramActions(QtWidgets.QWidget):
     def get_boundaries(self, data, coeff):
         '''
         Identifies the saple's envelope and creates a rectangular boundary over each projection, then return a dictionary containing the
-        left, right, top, and bottom boundary positions.
+        left, right, top, and bottom boundary positions, one array per side. All projections are processed at once.
         Variables
         -----------
         data: ndarray
-            4D xrf dataset ndarray [elements, theta, y,x]
-        coeff: int
-            element index
+            3D element stack ndarray [theta, y,x]
+        coeff: float
+            threshold, percent of the way from the noise floor to the profile maximum
         '''
+        data = np.asarray(data)
+        num_y, num_x = data.shape[1], data.shape[2]
+        col_sum = data.sum(axis=1) / num_x
+        row_sum = data.sum(axis=2) / num_y
+
+        # noise is the smallest positive profile value, column or row
+        positive = np.where(col_sum > 0, col_sum, np.inf).min(axis=1)
+        positive = np.minimum(positive, np.where(row_sum > 0, row_sum, np.inf).min(axis=1))
+        noise = np.where(np.isfinite(positive), positive, 0)
+
+        y_thresh = (col_sum.max(axis=1) - noise) * coeff / 100 + noise
+        x_thresh = (row_sum.max(axis=1) - noise) * coeff / 100 + noise
+        cols = col_sum >= y_thresh[:, None]
+        rows = row_sum >= x_thresh[:, None]
+
+        # first and last crossing; a profile that never crosses spans the whole frame
         bounds = {}
-        bounds[0] = []  # x_left
-        bounds[1] = []  # x_right
-        bounds[2] = []  # y_top
-        bounds[3] = []  # y_bottom
-
-        num_proj = len(data)
-        for i in range(num_proj):
-            col_sum = np.sum(data[i], axis=0) / data[i].shape[1]
-            row_sum = np.sum(data[i], axis=1) / data[i].shape[0]
-            noise_col = np.sort(col_sum[col_sum > 0])[:1]
-            noise_row = np.sort(row_sum[row_sum > 0])[:1]
-
-            if noise_col <= noise_row:
-                noise = noise_col
-            else:
-                noise = noise_row
-
-            upper_thresh_col = np.sort(col_sum)[::-1][:1]
-            diffcol = upper_thresh_col - noise
-            y_thresh = diffcol * coeff / 100 + noise
-
-            upper_thresh_row = np.sort(row_sum)[::-1][:1]
-            diffrow = upper_thresh_row - noise
-            x_thresh = diffrow * coeff / 100 + noise
-
-            for j in range(len(col_sum)):
-                if col_sum[j] >= y_thresh:
-                    bounds[0].append(j)
-                    break
-            for j in range(len(col_sum)):
-                if col_sum[len(col_sum) - j - 1] >= y_thresh:
-                    bounds[1].append(len(col_sum) - j - 1)
-                    break
-            for j in range(len(row_sum)):
-                if row_sum[len(row_sum) - j - 1] >= x_thresh:
-                    bounds[2].append(len(row_sum) - j - 1)
-                    break
-            for j in range(len(row_sum)):
-                if row_sum[j] >= x_thresh:
-                    bounds[3].append(j)
-                    break
+        bounds[0] = np.where(cols.any(axis=1), cols.argmax(axis=1), 0)  # x_left
+        bounds[1] = np.where(cols.any(axis=1), num_x - 1 - cols[:, ::-1].argmax(axis=1), num_x - 1)  # x_right
+        bounds[2] = np.where(rows.any(axis=1), num_y - 1 - rows[:, ::-1].argmax(axis=1), num_y - 1)  # y_top
+        bounds[3] = np.where(rows.any(axis=1), rows.argmax(axis=1), 0)  # y_bottom
         return bounds
 
-    def iterative_align(self, element, data, thetas, pad, blur_bool, rin, rout, center, algorithm, upsample_factor, save_bool, debug_bool, iters=5):
+    def iterative_align(self, element, data, thetas, pad, blur_bool, rin, rout, center, algorithm, upsample_factor, save_bool, debug_bool, iters=5, levels=0, tol=0):
         '''
         iterative alignment method from TomoPy
         Variables
@@ -866,7 +725,11 @@ class SinogramActions(QtWidgets.QWidget):
         thetas: ndarray
             sorted projection angle list
         iters: int
-            number of iterations
+            number of iterations per pyramid level
+        levels: int
+            number of binned levels run before the full resolution one, level l bins 2**l x 2**l pixels
+        tol: float
+            rms shift update, in pixels of the level, below which a level stops early; 0 runs every iteration
         '''
         num_projections = data.shape[1]
         x_shifts = np.zeros(num_projections)
@@ -877,17 +740,17 @@ class SinogramActions(QtWidgets.QWidget):
 
         thetas = thetas*np.pi/180
 
-        prj, sx, sy, conv = tomopy.align_joint(prj, thetas, iters=iters, pad=pad,
+        schedule = [(level, iters, tol) for level in range(levels, -1, -1)]
+        sx, sy, conv = self.pyramid_align(tomopy.align_joint, prj, thetas, schedule, pad=pad,
                             blur=blur_bool, rin=rin, rout=rout, center=center, algorithm=algorithm,
                             upsample_factor=upsample_factor, save=save_bool, debug=debug_bool)
         x_shifts = np.round(sx,2)
         y_shifts = np.round(sy,2)
 
-        for i in range(num_projections):
-            data = self.shiftProjection(data, x_shifts[i], y_shifts[i], i)
+        data = xrftomo.shift_projections(data, x_shifts, y_shifts)
 
         return x_shifts, y_shifts, data
-    def sequential_align(self, element, data, thetas, pad, blur_bool, rin, rout, center, algorithm, upsample_factor, save_bool, debug_bool, iters=5):
+    def sequential_align(self, element, data, thetas, pad, blur_bool, rin, rout, center, algorithm, upsample_factor, save_bool, debug_bool, iters=5, levels=0, tol=0):
         '''
         sequential re-projection algorithm from TomoPy
         Variables
@@ -899,7 +762,11 @@ class SinogramActions(QtWidgets.QWidget):
         thetas: ndarray
             sorted projection angle list
         iters: int
-            number of iterations
+            number of iterations per pyramid level
+        levels: int
+            number of binned levels run before the full resolution one, level l bins 2**l x 2**l pixels
+        tol: float
+            rms shift update, in pixels of the level, below which a level stops early; 0 runs every iteration
         '''
         num_projections = data.shape[1]
         x_shifts = np.zeros(num_projections)
@@ -910,17 +777,105 @@ class SinogramActions(QtWidgets.QWidget):
 
         thetas = thetas*np.pi/180
 
-        prj, sx, sy, conv = tomopy.align_seq(prj, thetas, iters=iters, pad=pad,
+        schedule = [(level, iters, tol) for level in range(levels, -1, -1)]
+        sx, sy, conv = self.pyramid_align(tomopy.align_seq, prj, thetas, schedule, pad=pad,
                             blur=blur_bool, rin=rin, rout=rout, center=center, algorithm=algorithm,
                             upsample_factor=upsample_factor, save=save_bool, debug=debug_bool)
         x_shifts = np.round(sx,2)
         y_shifts = np.round(sy,2)
 
-        for i in range(num_projections):
-            data = self.shiftProjection(data, x_shifts[i], y_shifts[i], i)
+        data = xrftomo.shift_projections(data, x_shifts, y_shifts)
+
+        return x_shifts, y_shifts, data
+
+    def reprojection_align(self, element, data, thetas, pad, blur_bool, rin, rout, center, algorithm, upsample_factor, iters=5, tol=0):
+        '''
+        re-projection alignment with xrftomo.reprojection_align, stops early once
+        the rms shift update falls below tol pixels
+        Variables
+        -----------
+        element: int
+            element index
+        data: ndarray
+            4D xrf dataset ndarray [elements, theta, y,x]
+        thetas: ndarray
+            sorted projection angle list
+        iters: int
+            maximum number of iterations
+        '''
+        thetas = thetas*np.pi/180
+        blur = (rin, rout) if blur_bool else None
+        # keep the gui responsive between iterations
+        callback = lambda iteration, x_shifts, y_shifts, update: QtWidgets.QApplication.processEvents()
+        x_shifts, y_shifts, conv = xrftomo.reprojection_align(data[element], thetas, iters=iters, tol=tol,
+                            algorithm=algorithm, center=center, pad=pad, blur=blur,
+                            upsample_factor=upsample_factor, callback=callback)
+        x_shifts = np.round(x_shifts,2)
+        y_shifts = -np.round(y_shifts,2)
+        data = self.shift_all(data, x_shifts, y_shifts)
 
         return x_shifts, y_shifts, data
 
+    def pyramid_align(self, align, prj, thetas, schedule, pad=(0,0), center=None, **kwargs):
+        '''
+        runs a TomoPy re-projection alignment coarse to fine. Each level aligns
+        the binned projections, its shifts are scaled up and applied to the full
+        resolution stack, which the next level starts from.
+        Variables
+        -----------
+        align: function
+            tomopy.align_joint or tomopy.align_seq
+        prj: ndarray
+            3D projection stack [theta, y, x]
+        thetas: ndarray
+            projection angles in radians
+        schedule: list
+            (level, iters, tol) per level, coarsest first. level l bins 2**l x 2**l pixels;
+            with tol > 0 the level runs one iteration per call and stops once the rms
+            shift update falls below tol pixels of that level. Iterative algorithms then
+            restart their reconstruction at every iteration, tol = 0 runs all iterations
+            in a single call.
+        pad, center, kwargs:
+            passed to align, pad and center in full resolution pixels
+        Returns
+        -----------
+        sx, sy: ndarray
+            total shifts in full resolution pixels, as returned by align
+        conv: list
+            convergence error of every iteration run, per level
+        '''
+        num_projections = prj.shape[0]
+        prj = np.array(prj, dtype=np.float32)
+        sx = np.zeros(num_projections)
+        sy = np.zeros(num_projections)
+        conv = []
+        for level, iters, tol in schedule:
+            start = time.time()
+            factor = 2**level
+            level_prj = xrftomo.bin_data(prj, level) if level else prj.copy()
+            level_pad = (pad[0]//factor, pad[1]//factor)
+            level_center = None if center is None else center/factor
+            level_sx = np.zeros(num_projections)
+            level_sy = np.zeros(num_projections)
+            level_conv = []
+            calls = [1]*iters if tol > 0 else [iters]
+            for call_iters in calls:
+                level_prj, call_sx, call_sy, call_conv = align(level_prj, thetas, iters=call_iters, pad=level_pad, center=level_center, **kwargs)
+                level_prj = level_prj[:, level_pad[1]:level_prj.shape[1]-level_pad[1], level_pad[0]:level_prj.shape[2]-level_pad[0]]
+                level_sx += call_sx
+                level_sy += call_sy
+                level_conv.extend(call_conv)
+                if tol > 0 and call_conv[-1]/np.sqrt(num_projections) < tol:
+                    break
+            # align returns row shifts in sx and column shifts in sy
+            xrftomo.shift_projections(prj[None], level_sy*factor, level_sx*factor, method='fourier')
+            sx += level_sx*factor
+            sy += level_sy*factor
+            conv.append(np.asarray(level_conv))
+            LOG.info("alignment level %d (%dx%d binned): %d iterations, rms update %.3f px, %.1f s",
+                     level, factor, factor, len(level_conv), level_conv[-1]/np.sqrt(num_projections) if level_conv else 0, time.time() - start)
+        return sx, sy, conv
+
     def alignFromText1(self, fileName, data, data_fnames, x_padding=0):
         '''
         align by reading text file in following format: name of the file, xshift, yshift
@@ -937,8 +892,6 @@ class SinogramActions(QtWidgets.QWidget):
             file = np.load(fileName[0])
             x_shifts = np.array([eval(item) for item in file[1]])
             y_shifts = np.array([eval(item) for item in file[2]])
-            datacopy = np.zeros(data.shape)
-            datacopy[...] = data[...]
             data[np.isnan(data)] = 1
             data = self.shift_all(data, x_shifts, y_shifts)
             self.alignmentDone()
@@ -969,8 +922,6 @@ class SinogramActions(QtWidgets.QWidget):
             fnames = []
             file = open(fileName[0], 'r')
             read = file.readlines()
-            datacopy = np.zeros(data.shape)
-            datacopy[...] = data[...]
             data[np.isnan(data)] = 1
             num_projections = data.shape[1]
             y_shifts = np.zeros(num_projections)
@@ -1035,9 +986,7 @@ class SinogramActions(QtWidgets.QWidget):
         if dim > 4:
             print("ERR: array dimensions too big, expected dim <=4")
         if dim == 4:
-            for i in range(data.shape[0]):
-                for j in range(data.shape[1]):
-                    data[i,j] = scipy.ndimage.shift(data[i,j], (-y_shifts[j], x_shifts[j]), output=None, order=3, mode='wrap', cval=0.0, prefilter=True)
+            data = self.shift_all(data, x_shifts, y_shifts)
         return data
 
 
@@ -1215,23 +1164,13 @@ class SinogramActions(QtWidgets.QWidget):
         self.posMat[1] = posMat[1] + y_size//2
         hs_x_pos, hs_y_pos, firstPosOfHotSpot, hotSpotX, hotSpotY, data = self.alignment_parameters(element, x_size, y_size, hs_group, posMat, data)
         #****************
-        num_projections = data.shape[1]
-        y_shifts = np.zeros(num_projections)
-        x_shifts = np.zeros(num_projections)
-        for j in range(num_projections):
-
-            if hs_x_pos[j] != 0 and hs_y_pos[j] != 0:
-                yyshift = int(round(y_size//2 - hotSpotY[j] - hs_y_pos[j] + hs_y_pos[firstPosOfHotSpot]))
-                xxshift = int(round(x_size//2 - hotSpotX[j] - hs_x_pos[j] + hs_x_pos[firstPosOfHotSpot]))
-                # data[:, j, :, :] = np.roll(np.roll(data[:, j, :, :], xxshift, axis=2), yyshift, axis=1)
-                data = self.shiftProjection(data, xxshift,yyshift,j)
-            if hs_x_pos[j] == 0:
-                xxshift = 0
-            if hs_y_pos[j] == 0:
-                yyshift = 0
-
-            x_shifts[j] = xxshift
-            y_shifts[j] = yyshift
+        clicked = (hs_x_pos != 0) & (hs_y_pos != 0)
+        if not clicked.any():
+            print("no hotspot positions in group", hs_group + 1)
+            return data, np.zeros(data.shape[1]), np.zeros(data.shape[1])
+        y_shifts = np.where(clicked, np.round(y_size//2 - hotSpotY - hs_y_pos + hs_y_pos[firstPosOfHotSpot]), 0).astype(int)
+        x_shifts = np.where(clicked, np.round(x_size//2 - hotSpotX - hs_x_pos + hs_x_pos[firstPosOfHotSpot]), 0).astype(int)
+        data = xrftomo.shift_projections(data, x_shifts, y_shifts)
 
         print("align done")
         return data, x_shifts, y_shifts
@@ -1262,28 +1201,13 @@ class SinogramActions(QtWidgets.QWidget):
         self.posMat[1] = posMat[1] + y_size//2
 
         hs_x_pos, hs_y_pos, firstPosOfHotSpot, hotSpotX, hotSpotY, data = self.alignment_parameters(element, x_size, y_size, hs_group, self.posMat, data)
-        num_projections = data.shape[1]
-        y_shifts = np.zeros(num_projections)
-        x_shifts = np.zeros(num_projections)
         thetas  = np.asarray(thetas)
-        for j in range(num_projections):
+        clicked = (hs_x_pos != 0) & (hs_y_pos != 0)
+        x_shifts = np.where(clicked, np.round(x_size//2 - hotSpotX), 0).astype(int)
+        y_shifts = np.where(clicked, np.round(y_size//2 - hotSpotY), 0).astype(int)
 
-            if hs_x_pos[j] != 0 and hs_y_pos[j] != 0:
-                xxshift = int(round(x_size//2 - hotSpotX[j]))
-                yyshift = int(round(y_size//2 - hotSpotY[j]))
-            if hs_x_pos[j] == 0:
-                xxshift = 0
-            if hs_y_pos[j] == 0:
-                yyshift = 0
-
-            x_shifts[j] = xxshift
-            y_shifts[j] = yyshift
-
-        hotspotXPos = np.zeros(num_projections, dtype="int")
-        hotspotYPos = np.zeros(num_projections, dtype="int")
-        for i in range(num_projections):
-            hotspotYPos[i] = int(round(hs_y_pos[i]))
-            hotspotXPos[i] = int(round(hs_x_pos[i]))
+        hotspotXPos = hs_x_pos
+        hotspotYPos = hs_y_pos
         hotspotProj = np.where(hotspotXPos != 0)[0]
 
         theta_tmp = thetas[hotspotProj]
@@ -1292,14 +1216,12 @@ class SinogramActions(QtWidgets.QWidget):
         if hs_group == 0:
             self.fitCenterOfMass(com, x=theta_tmp)
         else:
-            self.fitCenterOfMass2(com, self.centers, x=theta_tmp)
+            self.fitCenterOfMass2(com, x=theta_tmp)
         self.alignCenterOfMass2(hotspotProj, data)
 
         ## yfit
-        for i in hotspotProj:
-            y_shifts[i] = int(hotspotYPos[hotspotProj[0]]) - int(hotspotYPos[i])
-            # data[:, i] = np.roll(data[:, i], y_shifts[i], axis=1)
-            data = self.shiftProjection(data, 0,y_shifts[i],i)
+        y_shifts[hotspotProj] = hotspotYPos[hotspotProj[0]] - hotspotYPos[hotspotProj]
+        data = xrftomo.shift_projections(data, np.zeros(len(hotspotProj)), y_shifts[hotspotProj], hotspotProj)
 
         #update reconstruction slider value
         # self.recon.sld.setValue(self.centers[2])
@@ -1332,18 +1254,13 @@ class SinogramActions(QtWidgets.QWidget):
         self.posMat[1] = posMat[1] + y_size//2
 
         hs_x_pos, hs_y_pos, firstPosOfHotSpot, hotSpotX, hotSpotY, data = self.alignment_parameters(element, x_size, y_size, hs_group, self.posMat, data)
-        num_projections = data.shape[1]
-        y_shifts = np.zeros(num_projections)
-        for j in range(num_projections):
-            if hs_x_pos[j] != 0 and hs_y_pos[j] != 0:
-                yyshift = int(round(y_size//2 - hotSpotY[j] - hs_y_pos[j] + hs_y_pos[firstPosOfHotSpot]))
-                # data[:, j] = np.roll(data[:, j], yyshift, axis=1)
-                data = self.shiftProjection(data,0, yyshift,j)
-
-            if hs_y_pos[j] == 0:
-                yyshift = 0
-
-            y_shifts[j] = -yyshift
+        clicked = (hs_x_pos != 0) & (hs_y_pos != 0)
+        if not clicked.any():
+            print("no hotspot positions in group", hs_group + 1)
+            return data, np.zeros(data.shape[1])
+        yyshift = np.where(clicked, np.round(y_size//2 - hotSpotY - hs_y_pos + hs_y_pos[firstPosOfHotSpot]), 0).astype(int)
+        data = xrftomo.shift_projections(data, np.zeros(len(yyshift)), yyshift)
+        y_shifts = -yyshift
 
         print("align done")
 
@@ -1370,78 +1287,46 @@ class SinogramActions(QtWidgets.QWidget):
         self.posMat = posMat
 
         num_projections = data.shape[1]
-        hs_x_pos = np.zeros(num_projections, dtype="int")
-        hs_y_pos = np.zeros(num_projections, dtype="int")
-        hs_array = np.zeros([num_projections, y_size//2*2, x_size//2*2], dtype="int")
-
-        for i in range(num_projections):
-            hs_x_pos[i] = int(round(self.posMat[hs_group, i, 0]))
-            hs_y_pos[i] = int(abs(round(self.posMat[hs_group, i, 1])))
-
-            if hs_x_pos[i] != 0 and hs_y_pos[i] != 0:
-                if hs_y_pos[i] > (data.shape[2] - y_size//2):   # if ROI is past top edge of projection
-                    hs_y_pos[i] = data.shape[2] - y_size//2
-                if hs_y_pos[i] < y_size//2: # if ROI is past bottom of projection
-                    hs_y_pos[i] = y_size//2
-                if hs_x_pos[i] < x_size//2: # if ROI is past left edge of projection
-                    hs_x_pos[i] = x_size//2
-                if hs_x_pos[i] > (data.shape[3] - x_size//2): # if ROI is past right edge of projection
-                    hs_x_pos[i] = data.shape[3] - x_size//2
-                y0 = hs_y_pos[i] - y_size//2
-                y1 = hs_y_pos[i] + y_size//2
-                x0 = hs_x_pos[i] - x_size//2
-                x1 = hs_x_pos[i] + x_size//2
-                hs_array[i, :, :] = data[element, i, (data.shape[2] - y1):(data.shape[2] - y0), x0:x1]
-
-        hotSpotX = np.zeros(num_projections, dtype="int")
-        hotSpotY = np.zeros(num_projections, dtype="int")
-        new_hs_array = np.zeros(hs_array.shape, dtype="int")
-        new_hs_array[...] = hs_array[...]
-        firstPosOfHotSpot = 0
-
-        add = 1
-        for i in range(num_projections):
-            if hs_x_pos[i] == 0 and hs_y_pos[i] == 0:
-                firstPosOfHotSpot += add
-            if hs_x_pos[i] != 0 or hs_y_pos[i] != 0:
-                img = hs_array[i, :, :]
-                a, x, y, b, c = self.fitgaussian(img)
-                hotSpotY[i] = x
-                hotSpotX[i] = y
-                yshift_tmp = int(round(y_size - hotSpotY[i]))
-                xshift_tmp = int(round(x_size - hotSpotX[i]))
-                new_hs_array[i, :, :] = np.roll(new_hs_array[i, :, :], xshift_tmp, axis=1)
-                new_hs_array[i, :, :] = np.roll(new_hs_array[i, :, :], yshift_tmp, axis=0)
-                add = 0
+        hs_x_pos = np.round(self.posMat[hs_group, :, 0]).astype(int)
+        hs_y_pos = np.abs(np.round(self.posMat[hs_group, :, 1])).astype(int)
+        clicked = (hs_x_pos != 0) & (hs_y_pos != 0)
+
+        # keep every ROI inside the projection
+        hs_y_pos[clicked] = np.clip(hs_y_pos[clicked], y_size//2, data.shape[2] - y_size//2)
+        hs_x_pos[clicked] = np.clip(hs_x_pos[clicked], x_size//2, data.shape[3] - x_size//2)
+
+        hotSpotX = np.zeros(num_projections)
+        hotSpotY = np.zeros(num_projections)
+        indexes = np.where(clicked)[0]
+        if len(indexes):
+            patches = xrftomo.extract_patches(data[element], hs_x_pos[indexes], hs_y_pos[indexes], x_size, y_size, indexes)
+            rows, cols = xrftomo.locate_hotspots(patches, self.hotspot_method)
+            hotSpotY[indexes] = np.nan_to_num(rows)
+            hotSpotX[indexes] = np.nan_to_num(cols)
+
+        marked = (hs_x_pos != 0) | (hs_y_pos != 0)
+        firstPosOfHotSpot = int(np.argmax(marked)) if marked.any() else num_projections
 
         return hs_x_pos, hs_y_pos, firstPosOfHotSpot, hotSpotX, hotSpotY, data
 
     def fitCenterOfMass(self, com, x):
-        fitfunc = lambda p, x: p[0] * np.sin(2 * np.pi / 360 * (x - p[1])) + p[2]
-        errfunc = lambda p, x, y: fitfunc(p, x) - y
-        p0 = [100, 100, 100]
-        self.centers, success = optimize.leastsq(errfunc, np.asarray(p0), args=(x, com))
-        self.centerOfMassDiff = fitfunc(p0, x) - com
+        # robust closed form fit, misplaced hotspots do not drag the curve
+        self.centers = xrftomo.fit_sinusoids(x, com, robust=True)
+        self.centerOfMassDiff = xrftomo.sinusoid(self.centers, x) - com
         print(self.centerOfMassDiff)
 
     def alignCenterOfMass2(self, hotspotProj, data):
-        j = 0
-        for i in hotspotProj:
-            self.x_shifts[i] += int(self.centerOfMassDiff[j])
-
-            # data[:, i] = np.roll(data[:, i], int(round(self.x_shifts[i])), axis=2)
-
-            data = self.shiftProjection(data, self.x_shifts[i],0,i)
-            j += 1
+        if self.x_shifts is None:
+            self.x_shifts = np.zeros(data.shape[1])
+        self.x_shifts[hotspotProj] += np.asarray(self.centerOfMassDiff).astype(int)
+        data = xrftomo.shift_projections(data, self.x_shifts[hotspotProj], np.zeros(len(hotspotProj)), hotspotProj)
 
       #set some label to be show that the alignment has completed. perhaps print this in a logbox
 
     def fitCenterOfMass2(self, com, x):
-        fitfunc = lambda p, x: p[0] * np.sin(2 * np.pi / 360 * (x - p[1])) + self.centers[2]
-        errfunc = lambda p, x, y: fitfunc(p, x) - y
-        p0 = [100, 100]
-        p2, success = optimize.leastsq(errfunc, np.asarray(p0), args=(x, com))
-        self.centerOfMassDiff = fitfunc(p2, x) - com
+        # amplitude and phase only, the rotation center found for group 0 is kept
+        p2 = xrftomo.fit_sinusoids(x, com, offset=self.centers[2], robust=True)
+        self.centerOfMassDiff = xrftomo.sinusoid(p2, x) - com
         print(self.centerOfMassDiff)
 
     def fitgaussian(self, data):
@@ -87,6 +87,18 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         self.iter_textbox.setFixedWidth(button2size)
         self.iter_textbox.returnPressed.connect(self.validate_parameters)
 
+        levels_label = QtWidgets.QLabel("binned levels")
+        levels_label.setFixedWidth(button2size)
+        self.levels_textbox = QtWidgets.QLineEdit("0")
+        self.levels_textbox.setFixedWidth(button2size)
+        self.levels_textbox.returnPressed.connect(self.validate_parameters)
+
+        tol_label = QtWidgets.QLabel("tolerance")
+        tol_label.setFixedWidth(button2size)
+        self.tol_textbox = QtWidgets.QLineEdit("0")
+        self.tol_textbox.setFixedWidth(button2size)
+        self.tol_textbox.returnPressed.connect(self.validate_parameters)
+
         padding_label = QtWidgets.QLabel("padding")
         padding_label.setFixedWidth(button2size)
         self.paddingX_textbox = QtWidgets.QLineEdit("0")
@@ -130,6 +142,9 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         self.seq_btn = QtWidgets.QPushButton("seq")
         self.seq_btn.setFixedWidth(button3size)
         self.seq_btn.setCheckable(True)
+        self.native_btn = QtWidgets.QPushButton("native")
+        self.native_btn.setFixedWidth(button3size)
+        self.native_btn.setCheckable(True)
 
         methodname = ["mlem", "art", "pml_hybrid", "pml_quad", "sirt", "tv"]
         self.recon_alg = QtWidgets.QComboBox()
@@ -138,6 +153,7 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         iter_group = QtWidgets.QButtonGroup(self)
         iter_group.addButton(self.joint_btn)
         iter_group.addButton(self.seq_btn)
+        iter_group.addButton(self.native_btn)
         iter_group.setExclusive(True)
 
         for j in methodname:
@@ -163,6 +179,14 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         hb00.addWidget(iter_label)
         hb00.addWidget(self.iter_textbox)
 
+        hb08 = QtWidgets.QHBoxLayout()
+        hb08.addWidget(levels_label)
+        hb08.addWidget(self.levels_textbox)
+
+        hb09 = QtWidgets.QHBoxLayout()
+        hb09.addWidget(tol_label)
+        hb09.addWidget(self.tol_textbox)
+
         hb01 = QtWidgets.QHBoxLayout()
         hb01.addWidget(padding_label)
         hb01.addWidget(self.paddingX_textbox)
@@ -192,9 +216,12 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         hb07.addWidget(align_alg_label)
         hb07.addWidget(self.joint_btn)
         hb07.addWidget(self.seq_btn)
+        hb07.addWidget(self.native_btn)
 
         vb00 = QtWidgets.QVBoxLayout()
         vb00.addLayout(hb00)
+        vb00.addLayout(hb08)
+        vb00.addLayout(hb09)
         vb00.addLayout(hb01)
         vb00.addWidget(self.blur_checkbox)
         vb00.addLayout(hb02)
@@ -433,6 +460,8 @@ class SinogramControlsWidget(QtWidgets.QWidget):
         line_dict = {}
         line_dict["hotspot_mode_chbx"] = ["checkbox","enable hotspot selection"]
         line_dict["hs_group"] = ["dropdown", "hotspot group", 5]
+        line_dict["hs_fit"] = ["dropdown", "hotspot fit", ["parabola", "moments", "gaussian"]]
+        line_dict["track"] = ["button","track hotspots"]
         line_dict["fit_line"] = ["button","fit to line"]
         line_dict["fit_sine"] = ["button","fit to sine"]
         line_dict["fit_y"] = ["button", "fit along Y"]
@@ -442,8 +471,9 @@ class SinogramControlsWidget(QtWidgets.QWidget):
             attrs = line_dict[key]
             if attrs[0] == "dropdown":
                 setattr(self, key, QComboBox())
-                for i in range(5):
-                    self.__dict__[key].addItem(str(i + 1))
+                items = attrs[2] if isinstance(attrs[2], list) else [str(i + 1) for i in range(attrs[2])]
+                for item in items:
+                    self.__dict__[key].addItem(item)
                 vb_hs.addWidget(self.__dict__[key])
             elif attrs[0] == "checkbox":
                 setattr(self, key, QCheckBox(attrs[1]))
@@ -881,6 +911,28 @@ class SinogramControlsWidget(QtWidgets.QWidget):
             valid = False
             self.iter_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
         
+        try: #check pyramid levels
+            levels = int(self.levels_textbox.text())
+            if levels >= 0:
+                self.levels_textbox.setStyleSheet('* {background-color: }')
+            else:
+                self.levels_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
+                valid = False
+        except ValueError:
+            valid = False
+            self.levels_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
+
+        try: #check tolerance
+            tol = float(self.tol_textbox.text())
+            if tol >= 0:
+                self.tol_textbox.setStyleSheet('* {background-color: }')
+            else:
+                self.tol_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
+                valid = False
+        except ValueError:
+            valid = False
+            self.tol_textbox.setStyleSheet('* {background-color: rgb(255,200,200) }')
+
         try: #check padding value
             padX = int(self.paddingX_textbox.text())
             padY = int(self.paddingY_textbox.text())